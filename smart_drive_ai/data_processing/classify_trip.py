@@ -1,9 +1,11 @@
 from __future__ import annotations
 from pathlib import Path
 
-import joblib
+import numpy as np
 import pandas as pd
 
+from .model_registry import DEFAULT_MODEL_PATH, get_model
+
 
 FEATURE_COLS = [
     "pct_event_jerk", "pct_event_jerk_accel", "pct_event_jerk_brake",
@@ -31,10 +33,21 @@ def _csv_to_row(stats, debug: bool) -> pd.DataFrame:
     return row
 
 
+def predict_with_proba(model, X) -> tuple[np.ndarray, np.ndarray]:
+    """Метки и их вероятности за один вызов `predict_proba`.
+
+    Для RandomForestClassifier `predict` — это `classes_[argmax(proba)]`,
+    поэтому результат совпадает с отдельным вызовом `predict`.
+    """
+    proba = model.predict_proba(X)
+    best = np.argmax(proba, axis=1)
+    return model.classes_.take(best), proba[np.arange(len(best)), best]
+
+
 def classify_trip(
     stats,
     *,
-    model_path: str | Path = "data_processing/rf_v1.joblib",
+    model_path: str | Path = DEFAULT_MODEL_PATH,
     debug: bool = False
 ) -> str:
     """Классифицирует поездку; возвращает 'smooth'/'moderate'/'aggressive'.
@@ -47,11 +60,48 @@ def classify_trip(
 
     X = _csv_to_row(stats, debug)
 
-    _debug(f"Загружаю модель: {model_path}", debug)
-    pipe = joblib.load(model_path)
+    _debug(f"Модель из реестра: {model_path}", debug)
+    pipe = get_model(model_path)
 
-    label = pipe.predict(X)[0]
-    prob = pipe.predict_proba(X).max()
+    labels, probs = predict_with_proba(pipe, X)
+    label, prob = labels[0], probs[0]
     _debug(f"Прогноз: {label}  (p={prob:.2f})", debug)
 
     return str(label)
+
+
+def feature_vector(stats) -> np.ndarray:
+    """Вектор признаков модели (порядок FEATURE_COLS, float64)."""
+    missing = [c for c in FEATURE_COLS if c not in stats]
+    if missing:
+        raise ValueError(f"В вычисленных признаках отсутствуют: {missing}")
+    return np.array([stats[k] for k in FEATURE_COLS], dtype=np.float64)
+
+
+def classify_matrix(
+    X: np.ndarray,
+    *,
+    model_path: str | Path = DEFAULT_MODEL_PATH,
+) -> list[str]:
+    """Классификация матрицы признаков (строка — поездка) одним `predict`."""
+    if not len(X):
+        return []
+    model_path = Path(model_path)
+    if not model_path.exists():
+        raise FileNotFoundError(model_path)
+
+    X = pd.DataFrame(X, columns=FEATURE_COLS)
+    labels, _ = predict_with_proba(get_model(model_path), X)
+    return [str(label) for label in labels]
+
+
+def classify_trips(
+    stats_list,
+    *,
+    model_path: str | Path = DEFAULT_MODEL_PATH,
+) -> list[str]:
+    """Классификация пачки поездок одним вызовом `predict`."""
+    if not stats_list:
+        return []
+    X = np.vstack([feature_vector(stats) for stats in stats_list])
+    return classify_matrix(X, model_path=model_path)
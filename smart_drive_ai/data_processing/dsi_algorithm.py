@@ -12,7 +12,7 @@ import enum
 import math
 from dataclasses import dataclass
 from datetime import timedelta
-from typing import List, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence
 
 
 # ────────────────── Коды категорий поездок ──────────────────
@@ -81,6 +81,45 @@ def _categorize(dsi: float, p: DSIParams) -> TripClass:
 
 # ─────────────────── Основной алгоритм ──────────────────────
 
+def _build_result(
+    dsi: float,
+    sigma_c: float,
+    M: int,
+    previous_class: Optional[TripClass],
+    params: DSIParams,
+) -> DSIResult:
+    """Коэффициент доверия D, проверка устойчивости и итоговая категория."""
+
+    # --- коэффициент доверия D ---------------------------------------------
+    D = min(1.0, M / params.n_ref)  # базовый D; <1, если поездок < n_ref
+    preliminary = D < 1.0
+
+    category_by_dsi = _categorize(dsi, params)
+    final_class = category_by_dsi
+
+    # --- проверка устойчивости ---------------------------------------------
+    if D == 1.0 and sigma_c > params.sigma_max:
+        # устойчивость нарушена
+        if previous_class is None:
+            # первый расчёт → всё-таки задаём категорию, но D=0.5
+            D = 0.5
+            preliminary = True
+        else:
+            # категория уже существует → сохраняем её, D=0.8
+            D = 0.8
+            preliminary = True
+            final_class = previous_class
+
+    return DSIResult(
+        dsi=round(dsi, 3),
+        sigma=round(sigma_c, 3),
+        trust=round(D, 2),
+        profile_class=final_class,
+        trips_used=M,
+        preliminary=preliminary,
+    )
+
+
 def compute_driver_style(
     trips: Sequence[Trip],
     *,
@@ -123,35 +162,7 @@ def compute_driver_style(
     var = sum(w * (c - dsi) ** 2 for w, c, _ in recent) / sum_w
     sigma_c = math.sqrt(var)
 
-    # --- коэффициент доверия D ---------------------------------------------
-    M = len(recent)
-    D = min(1.0, M / params.n_ref)  # базовый D; <1, если поездок < n_ref
-    preliminary = D < 1.0
-
-    category_by_dsi = _categorize(dsi, params)
-    final_class = category_by_dsi
-
-    # --- проверка устойчивости ---------------------------------------------
-    if D == 1.0 and sigma_c > params.sigma_max:
-        # устойчивость нарушена
-        if previous_class is None:
-            # первый расчёт → всё-таки задаём категорию, но D=0.5
-            D = 0.5
-            preliminary = True
-        else:
-            # категория уже существует → сохраняем её, D=0.8
-            D = 0.8
-            preliminary = True
-            final_class = previous_class
-
-    return DSIResult(
-        dsi=round(dsi, 3),
-        sigma=round(sigma_c, 3),
-        trust=round(D, 2),
-        profile_class=final_class,
-        trips_used=M,
-        preliminary=preliminary,
-    )
+    return _build_result(dsi, sigma_c, len(recent), previous_class, params)
 
 
 def get_overall_category(trips: list[tuple]) -> str | None:
@@ -169,6 +180,183 @@ def get_overall_category(trips: list[tuple]) -> str | None:
     return None
 
 
+# ──────────────── Инкрементальное состояние DSI ─────────────
+
+class DSIState:
+    """
+    Инкрементальный расчёт DSI за O(1) на поездку.
+
+    Веса w_i = e^{−λ·age_i} пересчитываются сдвигом опорного момента:
+    хранятся суммы Σw, Σw·c, Σw·c² относительно `anchor`, и при появлении
+    более поздней поездки они домножаются на e^{−λ·Δt}. Так как DSI и σ_c —
+    отношения сумм, общий множитель e^{−λ(now − anchor)} при чтении
+    сокращается.
+
+    Отсечение по T_cut — через кольцо корзин шириной `bucket_seconds`;
+    корзина исключается целиком, когда её конец старше `now − T_cut`
+    (погрешность границы — не более одной корзины).
+    """
+
+    def __init__(
+        self,
+        params: DSIParams = DSIParams(),
+        *,
+        bucket_seconds: int = 86_400,
+    ) -> None:
+        self.params = params
+        self.bucket_seconds = bucket_seconds
+        self._lam = math.log(2) / (params.t_half * 86_400)  # в секундах
+        self._n_slots = -(-params.t_cut * 86_400 // bucket_seconds) + 1
+        # слот → [index, s0, s1, s2, count]; суммы относительно начала корзины
+        self._ring: Dict[int, List[float]] = {}
+        self._tail: Optional[int] = None    # самая старая живая корзина
+        self._anchor: Optional[float] = None
+        self._sums = [0.0, 0.0, 0.0]
+        self._count = 0
+
+    # --- обновление ---------------------------------------------------------
+
+    def update(self, trip: Trip) -> None:
+        """Учитывает новую поездку."""
+        t = trip.timestamp.timestamp()
+        c = int(trip.category)
+        index = int(t // self.bucket_seconds)
+
+        if self._anchor is not None:
+            newest = max(self._anchor, t)
+            if index <= int(newest // self.bucket_seconds) - self._n_slots:
+                return  # поездка старше горизонта — не учитывается
+        self._expire_before(index - self._n_slots + 1)
+
+        if self._anchor is None:
+            self._anchor = t
+        elif t > self._anchor:
+            scale = math.exp(-self._lam * (t - self._anchor))
+            self._sums = [x * scale for x in self._sums]
+            self._anchor = t
+
+        w = math.exp(self._lam * (t - self._anchor))
+        self._sums[0] += w
+        self._sums[1] += w * c
+        self._sums[2] += w * c * c
+        self._count += 1
+
+        slot = index % self._n_slots
+        bucket = self._ring.get(slot)
+        if bucket is None or bucket[0] != index:
+            bucket = [index, 0.0, 0.0, 0.0, 0]
+            self._ring[slot] = bucket
+        wb = math.exp(self._lam * (t - index * self.bucket_seconds))
+        bucket[1] += wb
+        bucket[2] += wb * c
+        bucket[3] += wb * c * c
+        bucket[4] += 1
+        if self._tail is None or index < self._tail:
+            self._tail = index
+
+    def _expire_before(self, index: int) -> None:
+        """Исключает корзины с номером меньше `index`."""
+        if self._tail is None or self._tail >= index:
+            return
+        if index - self._tail >= self._n_slots:
+            # все корзины вышли за горизонт
+            for bucket in list(self._ring.values()):
+                if bucket[0] < index:
+                    self._drop(bucket)
+        else:
+            for i in range(self._tail, index):
+                bucket = self._ring.get(i % self._n_slots)
+                if bucket is not None and bucket[0] == i:
+                    self._drop(bucket)
+        self._tail = min((b[0] for b in self._ring.values()), default=None)
+        if self._count == 0:
+            self._sums = [0.0, 0.0, 0.0]
+
+    def _drop(self, bucket: List[float]) -> None:
+        index = bucket[0]
+        shift = math.exp(
+            self._lam * (index * self.bucket_seconds - self._anchor)
+        )
+        for k in range(3):
+            self._sums[k] -= bucket[k + 1] * shift
+        self._count -= bucket[4]
+        del self._ring[index % self._n_slots]
+
+    # --- чтение -------------------------------------------------------------
+
+    def result(
+        self,
+        now: Optional[datetime.datetime] = None,
+        *,
+        previous_class: Optional[TripClass] = None,
+    ) -> Optional[DSIResult]:
+        """DSIResult на момент `now`.
+
+        None, если нет поездок в пределах T_cut.
+        """
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        cutoff = now.timestamp() - self.params.t_cut * 86_400
+        # корзина живёт, пока её конец не старше cutoff
+        self._expire_before(int(cutoff // self.bucket_seconds))
+        if self._count == 0 or self._sums[0] <= 0:
+            return None
+
+        s0, s1, s2 = self._sums
+        dsi = s1 / s0
+        var = max(s2 / s0 - dsi * dsi, 0.0)
+        return _build_result(
+            dsi, math.sqrt(var), self._count, previous_class, self.params
+        )
+
+    # --- сериализация -------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "t_half": self.params.t_half,
+            "t_cut": self.params.t_cut,
+            "bucket_seconds": self.bucket_seconds,
+            "anchor": self._anchor,
+            "sums": list(self._sums),
+            "count": self._count,
+            "buckets": sorted(self._ring.values()),
+        }
+
+    @classmethod
+    def from_dict(
+        cls, data: Dict[str, Any], params: DSIParams = DSIParams()
+    ) -> "DSIState":
+        """Восстанавливает состояние.
+
+        ValueError, если параметры не совпадают.
+        """
+        if (
+            data.get("t_half") != params.t_half
+            or data.get("t_cut") != params.t_cut
+        ):
+            raise ValueError("Состояние DSI построено с другими параметрами")
+        state = cls(params, bucket_seconds=data["bucket_seconds"])
+        state._anchor = data["anchor"]
+        state._sums = [float(x) for x in data["sums"]]
+        state._count = int(data["count"])
+        for index, s0, s1, s2, count in data["buckets"]:
+            index = int(index)
+            state._ring[index % state._n_slots] = [
+                index, s0, s1, s2, int(count)
+            ]
+        state._tail = min((b[0] for b in state._ring.values()), default=None)
+        return state
+
+    @classmethod
+    def from_trips(
+        cls, trips: Sequence[Trip], params: DSIParams = DSIParams()
+    ) -> "DSIState":
+        state = cls(params)
+        for trip in sorted(trips, key=lambda tr: tr.timestamp):
+            state.update(trip)
+        return state
+
+
 # ───────────────────────── Демонстрация ─────────────────────
 
 # if __name__ == "__main__":
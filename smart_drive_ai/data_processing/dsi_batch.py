@@ -0,0 +1,127 @@
+"""
+Пакетный (векторизованный) расчёт DSI сразу для многих пользователей.
+
+Вход — плоские массивы (user_id, timestamp, category), например прямо из
+`values_list`; суммы по пользователям считаются через `np.bincount`.
+Результат совпадает с `compute_driver_style` для каждого пользователя.
+"""
+
+from __future__ import annotations
+
+import datetime
+import math
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .dsi_algorithm import DSIParams, DSIResult, TripClass
+
+
+_LABELS = {cls.name.lower(): int(cls) for cls in TripClass}
+
+
+def _to_microseconds(timestamps) -> np.ndarray:
+    ts = pd.to_datetime(pd.Index(timestamps), utc=True)
+    return ts.as_unit("us").asi8
+
+
+def _to_codes(categories) -> np.ndarray:
+    cats = np.asarray(categories)
+    if cats.dtype.kind in "iu":
+        return cats.astype(np.int64)
+    labels, inverse = np.unique(cats.astype(str), return_inverse=True)
+    try:
+        codes = np.array([_LABELS[label.lower()] for label in labels])
+    except KeyError as exc:
+        raise ValueError(
+            f"Неизвестная категория поездки: {exc.args[0]}"
+        ) from exc
+    return codes[inverse]
+
+
+def compute_driver_styles(
+    user_ids: Sequence[Any],
+    timestamps: Sequence[Any],
+    categories: Sequence[Any],
+    *,
+    previous_classes: Optional[Mapping[Any, Optional[TripClass]]] = None,
+    params: DSIParams = DSIParams(),
+    now: Optional[datetime.datetime] = None,
+) -> Dict[Any, DSIResult]:
+    """
+    Рассчитывает DSIResult для всех пользователей за один проход.
+
+    • `categories` — метки ('smooth'/'moderate'/'aggressive') или коды
+      TripClass.
+    • `previous_classes` — сохранённые категории по user_id
+      (см. compute_driver_style).
+    • Пользователи без поездок в пределах T_cut в результат не попадают.
+    """
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    if not len(user_ids):
+        return {}
+
+    users, inverse = np.unique(np.asarray(user_ids), return_inverse=True)
+    ts_us = _to_microseconds(timestamps)
+    codes = _to_codes(categories)
+
+    now_us = _to_microseconds([now])[0]
+    cutoff_us = now_us - params.t_cut * 86_400 * 1_000_000
+    keep = ts_us >= cutoff_us
+    inverse, ts_us, codes = inverse[keep], ts_us[keep], codes[keep]
+
+    # возраст как в compute_driver_style: days + seconds/86400 (без мкс)
+    age_days = np.floor_divide(now_us - ts_us, 1_000_000) / 86_400
+    lam = math.log(2) / params.t_half
+    w = np.exp(-lam * age_days)
+    c = codes.astype(np.float64)
+
+    n_users = len(users)
+    count = np.bincount(inverse, minlength=n_users)
+    sum_w = np.bincount(inverse, weights=w, minlength=n_users)
+    present = count > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dsi = np.bincount(inverse, weights=w * c, minlength=n_users) / sum_w
+        dev = c - dsi[inverse]
+        var = np.bincount(
+            inverse, weights=w * dev * dev, minlength=n_users
+        ) / sum_w
+    sigma = np.sqrt(var)
+
+    # --- коэффициент доверия и категория (как в _build_result) -------------
+    trust = np.minimum(1.0, count / params.n_ref)
+    preliminary = trust < 1.0
+    profile_class = np.where(
+        dsi < params.smooth_thresh, int(TripClass.SMOOTH),
+        np.where(dsi < params.moderate_thresh,
+                 int(TripClass.MODERATE), int(TripClass.AGGRESSIVE)),
+    )
+
+    previous = np.full(n_users, -1)
+    if previous_classes:
+        for i, user in enumerate(users.tolist()):
+            prev = previous_classes.get(user)
+            if prev is not None:
+                previous[i] = int(prev)
+
+    unstable = (trust == 1.0) & (sigma > params.sigma_max)
+    first = unstable & (previous < 0)
+    known = unstable & (previous >= 0)
+    trust[first] = 0.5
+    trust[known] = 0.8
+    preliminary |= unstable
+    profile_class[known] = previous[known]
+
+    results: Dict[Any, DSIResult] = {}
+    for i in np.flatnonzero(present):
+        results[users[i].item()] = DSIResult(
+            dsi=round(float(dsi[i]), 3),
+            sigma=round(float(sigma[i]), 3),
+            trust=round(float(trust[i]), 2),
+            profile_class=TripClass(int(profile_class[i])),
+            trips_used=int(count[i]),
+            preliminary=bool(preliminary[i]),
+        )
+    return results
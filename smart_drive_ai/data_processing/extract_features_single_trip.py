@@ -1,6 +1,12 @@
 import numpy as np
 import pandas as pd
 
+from .track import TrackBuilder
+
+
+# Версия алгоритма признаков: увеличивается при любом изменении порогов
+# или расчёта, чтобы сохранённые векторы признаков считались устаревшими
+FEATURE_EXTRACTOR_VERSION = 1
 
 # === Пороговые значения ===
 GYRO_THRESHOLD = 20
@@ -13,94 +19,267 @@ URBAN_LIMIT = 60
 HIGHWAY_LIMIT = 120
 JERK_RESET_STEPS = 3
 
+# === Окна скользящих средних (отсчёты) ===
+STD_WINDOW = 10
+STD_THRESH = 0.15
+TRIM_PADDING = 3
+GYRO_SMOOTH_WINDOW = 5
+SPEED_CONTEXT_WINDOW = 60
+
+SENSOR_COLS = (
+    'speed_kmh', 'acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z',
+)
+
+_PERIODS_PER_SECOND = {'s': 1, 'ms': 10**3, 'us': 10**6, 'ns': 10**9}
+
+
+# === Скользящие окна на кумулятивных суммах ===
+
+def _window_sums(x: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """Суммы по всем полным окнам [j, j + window) и число NaN в каждом."""
+    finite = ~np.isnan(x)
+    csum = np.empty(len(x) + 1)
+    csum[0] = 0.0
+    np.cumsum(np.where(finite, x, 0.0), out=csum[1:])
+    cnan = np.empty(len(x) + 1, dtype=np.int64)
+    cnan[0] = 0
+    np.cumsum(~finite, out=cnan[1:])
+    return csum[window:] - csum[:-window], cnan[window:] - cnan[:-window]
+
+
+def _centered(values: np.ndarray, n: int, window: int) -> np.ndarray:
+    """Раскладка по центру окна как в `rolling(window, center=True)`."""
+    out = np.full(n, np.nan)
+    if n >= window:
+        offset = window // 2
+        out[offset:offset + len(values)] = values
+    return out
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Аналог `Series.rolling(window, center=True).mean()`."""
+    n = len(x)
+    if n < window:
+        return np.full(n, np.nan)
+    sums, nans = _window_sums(x, window)
+    mean = sums / window
+    mean[nans > 0] = np.nan
+    return _centered(mean, n, window)
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """Аналог `Series.rolling(window, center=True).std()` (ddof=1)."""
+    n = len(x)
+    if n < window:
+        return np.full(n, np.nan)
+    # сдвиг к среднему уменьшает потерю точности в S2 − S1²/w
+    shift = np.nanmean(x) if np.isfinite(x).any() else 0.0
+    xc = x - shift
+    s1, nans = _window_sums(xc, window)
+    s2, _ = _window_sums(xc * xc, window)
+    var = np.maximum((s2 - s1 * s1 / window) / (window - 1), 0.0)
+    std = np.sqrt(var)
+    std[nans > 0] = np.nan
+    return _centered(std, n, window)
+
+
+def _magnitude(x: np.ndarray, y: np.ndarray, z: np.ndarray) -> np.ndarray:
+    out = np.square(x)
+    out += np.square(y)
+    out += np.square(z)
+    return np.sqrt(out, out=out)
+
+
+def stable_bounds(
+    acc_mag: np.ndarray, std_window=STD_WINDOW, std_thresh=STD_THRESH,
+    padding=TRIM_PADDING
+) -> tuple[int, int]:
+    """Границы [start, end) участка без «нестабильных» краёв поездки."""
+    acc_std = np.nan_to_num(rolling_std(acc_mag, std_window), nan=0.0)
+    stable_idx = np.flatnonzero(acc_std < std_thresh)
+    if len(stable_idx) == 0:
+        return 0, len(acc_mag)
+    # семантика среза iloc[start:end], включая отрицательный end
+    start, end, _ = slice(
+        int(stable_idx[0] + padding), int(stable_idx[-1] - padding)
+    ).indices(len(acc_mag))
+    return start, max(end, start)
+
 
 def trim_instability(
     df: pd.DataFrame, std_window=10, std_thresh=0.15, padding=3
 ) -> pd.DataFrame:
-    df = df.copy()
-    df['acc_mag'] = np.sqrt(df['acc_x']**2 + df['acc_y']**2 + df['acc_z']**2)
-    df['acc_std'] = df['acc_mag'].rolling(std_window, center=True).std().fillna(0)
-    stable_mask = df['acc_std'] < std_thresh
-    stable_idx = np.where(stable_mask)[0]
-    if len(stable_idx) == 0:
-        return df.drop(columns='acc_std')
-    start_idx = stable_idx[0] + padding
-    end_idx = stable_idx[-1] - padding
-    return df.iloc[start_idx:end_idx].reset_index(drop=True).drop(columns='acc_std')
+    acc_mag = _magnitude(*(
+        np.asarray(df[c], dtype=np.float64) for c in ('acc_x', 'acc_y', 'acc_z')
+    ))
+    start, end = stable_bounds(acc_mag, std_window, std_thresh, padding)
+    df = df.iloc[start:end].reset_index(drop=True)
+    df['acc_mag'] = acc_mag[start:end]
+    return df
 
 
-def extract_trip_features(
-    df: pd.DataFrame, filename: str = "trip.csv"
-) -> tuple[dict, dict]:
-    if df.empty or 'speed_kmh' not in df.columns:
-        raise ValueError("Некорректный файл: отсутствует колонка 'speed_kmh'")
+# === Временные метки ===
 
-    df = df[df['speed_kmh'] >= 0].copy()
-    df = trim_instability(df)
+def parse_timestamps(values) -> tuple[np.ndarray, np.ndarray, int] | None:
+    """Разбор меток времени как `pd.to_datetime`.
 
-    if 'timestamp' in df.columns:
-        try:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['delta_sec'] = df['timestamp'].diff().dt.total_seconds().fillna(1.0)
-        except Exception:
-            df['delta_sec'] = 1.0
-    else:
-        df['delta_sec'] = 1.0
-
-    df['speed_ms'] = df['speed_kmh'] / 3.6
-    df['acc_mag'] = np.sqrt(df['acc_x']**2 + df['acc_y']**2 + df['acc_z']**2)
-    df['gyro_mag'] = np.sqrt(df['gyro_x']**2 + df['gyro_y']**2 + df['gyro_z']**2)
-    df['jerk'] = df['speed_ms'].diff().fillna(0) / df['delta_sec']
-    df['jerk_ratio'] = df['jerk'].abs() / (df['speed_ms'] + 0.1)
-    df['gyro_mag_smooth'] = df['gyro_mag'].rolling(window=5, center=True).mean()
-
-    if df['speed_ms'].iloc[0] > MIN_SPEED_FOR_RATIO:
-        df.loc[0:JERK_RESET_STEPS - 1, ['jerk', 'jerk_ratio']] = 0
-
-    df['mean_speed_60s'] = df['speed_kmh'].rolling(window=60, center=True).mean()
-    df['context'] = np.where(df['mean_speed_60s'] > URBAN_THRESHOLD, 'highway', 'urban')
-    df['speed_threshold'] = np.where(df['context'] == 'highway', HIGHWAY_LIMIT, URBAN_LIMIT)
-
-    df['event_gyro'] = df['gyro_mag_smooth'] > GYRO_THRESHOLD
-    df['event_acc'] = df['acc_mag'] > ACC_MAG_THRESHOLD
-    df['event_jerk'] = df['jerk'].abs() > JERK_THRESHOLD
-    df['event_jerk_accel'] = df['jerk'] > JERK_THRESHOLD
-    df['event_jerk_brake'] = df['jerk'] < -JERK_THRESHOLD
-    df['event_jerk_relative'] = (df['jerk_ratio'] > JERK_RATIO_THRESHOLD) & (df['speed_ms'] > MIN_SPEED_FOR_RATIO)
-    df['event_speed'] = df['speed_kmh'] > df['speed_threshold']
-    df['event_any'] = df[['event_gyro', 'event_acc', 'event_jerk', 'event_jerk_relative', 'event_speed']].any(axis=1)
-
-    if 'timestamp' in df.columns:
-        try:
-            trip_duration_sec = (df['timestamp'].iloc[-1] - df['timestamp'].iloc[0]).total_seconds()
-        except Exception:
-            trip_duration_sec = df['delta_sec'].sum()
+    Возвращает (отсчёты в исходных единицах, маска NaT, отсчётов в секунде)
+    или None, если метки не распознаны.
+    """
+    try:
+        parsed = pd.to_datetime(pd.Series(values, copy=False))
+        unit = parsed.dt.unit
+        ticks = parsed.array.asi8
+        return ticks, parsed.isna().to_numpy(), _PERIODS_PER_SECOND[unit]
+    except Exception:
+        return None
+
+
+def _delta_seconds(ts, n: int) -> np.ndarray:
+    delta = np.ones(n)
+    if ts is not None and n > 1:
+        ticks, nat, pps = ts
+        diff = (ticks[1:] - ticks[:-1]) / pps
+        diff[nat[1:] | nat[:-1]] = 1.0
+        delta[1:] = diff
+    return delta
+
+
+def _duration_seconds(ts, delta: np.ndarray) -> float:
+    if ts is None:
+        return delta.sum()
+    ticks, nat, pps = ts
+    if nat[0] or nat[-1]:
+        return float('nan')
+    unit = {v: k for k, v in _PERIODS_PER_SECOND.items()}[pps]
+    return pd.Timedelta(int(ticks[-1] - ticks[0]), unit=unit).total_seconds()
+
+
+# === Признаки поездки ===
+
+def compute_trip_features(
+    columns, timestamps=None, filename: str = "trip.csv"
+) -> tuple[dict, dict]:
+    """Признаки поездки по массивам датчиков.
+
+    `columns` — отображение имени колонки из SENSOR_COLS в одномерный
+    массив; `timestamps` — сырые метки времени (или None).
+    """
+    speed_kmh = np.asarray(columns['speed_kmh'], dtype=np.float64)
+    valid = speed_kmh >= 0
+    if valid.all():
+        keep = slice(None)   # без копирования колонок
+        rows = np.arange(len(speed_kmh))
     else:
-        trip_duration_sec = df['delta_sec'].sum()
+        keep = rows = np.flatnonzero(valid)
+    del valid
+
+    def column(name):
+        return np.asarray(columns[name], dtype=np.float64)[keep]
+
+    speed_kmh = speed_kmh[keep]
+    acc_mag = _magnitude(column('acc_x'), column('acc_y'), column('acc_z'))
+    gyro_mag = _magnitude(column('gyro_x'), column('gyro_y'), column('gyro_z'))
+
+    start, end = stable_bounds(acc_mag)
+    n = end - start
+    if n == 0:
+        raise ValueError("Некорректный файл: нет данных после фильтрации")
+
+    speed_kmh = speed_kmh[start:end]
+    acc_mag = acc_mag[start:end]
+    gyro_mag = gyro_mag[start:end]
+
+    ts = None
+    if timestamps is not None:
+        rows = rows[start:end]
+        ts = parse_timestamps(
+            timestamps.iloc[rows] if isinstance(timestamps, pd.Series)
+            else np.asarray(timestamps)[rows]
+        )
+    delta_sec = _delta_seconds(ts, n)
+
+    speed_ms = speed_kmh / 3.6
+    jerk = np.zeros(n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jerk[1:] = np.diff(speed_ms)
+        jerk /= delta_sec
+    abs_jerk = np.abs(jerk)
+    jerk_ratio = abs_jerk / (speed_ms + 0.1)
+    if speed_ms[0] > MIN_SPEED_FOR_RATIO:
+        jerk[:JERK_RESET_STEPS] = 0
+        abs_jerk[:JERK_RESET_STEPS] = 0
+        jerk_ratio[:JERK_RESET_STEPS] = 0
+
+    gyro_mag_smooth = rolling_mean(gyro_mag, GYRO_SMOOTH_WINDOW)
+    mean_speed_60s = rolling_mean(speed_kmh, SPEED_CONTEXT_WINDOW)
+    speed_threshold = np.where(
+        mean_speed_60s > URBAN_THRESHOLD, HIGHWAY_LIMIT, URBAN_LIMIT
+    )
+
+    event_gyro = gyro_mag_smooth > GYRO_THRESHOLD
+    event_acc = acc_mag > ACC_MAG_THRESHOLD
+    event_jerk = abs_jerk > JERK_THRESHOLD
+    event_jerk_accel = jerk > JERK_THRESHOLD
+    event_jerk_brake = jerk < -JERK_THRESHOLD
+    event_jerk_relative = (
+        (jerk_ratio > JERK_RATIO_THRESHOLD) & (speed_ms > MIN_SPEED_FOR_RATIO)
+    )
+    event_speed = speed_kmh > speed_threshold
+    event_any = (
+        event_gyro | event_acc | event_jerk | event_jerk_relative | event_speed
+    )
+
+    track = TrackBuilder()
+    track.push(
+        delta_sec,
+        {'speed_kmh': speed_kmh, 'jerk': jerk, 'acc_mag': acc_mag,
+         'gyro_mag': gyro_mag},
+        {'hard_brakes': event_jerk_brake, 'hard_accels': event_jerk_accel,
+         'sharp_turns': event_gyro},
+    )
+
+    trip_duration_sec = _duration_seconds(ts, delta_sec)
+    mean_speed = speed_kmh.mean()
+    finite_gyro = not np.isnan(gyro_mag).all()
+    avg_gyro_mag = np.nanmean(gyro_mag) if finite_gyro else np.nan
 
     user_stats = {
-        'avg_speed': df['speed_kmh'].mean(),
-        'distance': (df['speed_kmh'] * df['delta_sec']).sum() / 3600,
-        'hard_brakes': int(df['event_jerk_brake'].sum()),
-        'hard_accels': int(df['event_jerk_accel'].sum()),
-        'sharp_turns': int(df['event_gyro'].sum()),
-        'avg_gyro_mag': df['gyro_mag'].mean(),
+        'avg_speed': mean_speed,
+        'distance': np.nansum(speed_kmh * delta_sec) / 3600,
+        'hard_brakes': int(event_jerk_brake.sum()),
+        'hard_accels': int(event_jerk_accel.sum()),
+        'sharp_turns': int(event_gyro.sum()),
+        'avg_gyro_mag': avg_gyro_mag,
         'trip_duration': trip_duration_sec
     }
 
     stats = {
         'file': filename,
-        'pct_event_jerk': df['event_jerk'].mean(),
-        'pct_event_jerk_accel': df['event_jerk_accel'].mean(),
-        'pct_event_jerk_brake': df['event_jerk_brake'].mean(),
-        'pct_event_jerk_relative': df['event_jerk_relative'].mean(),
-        'pct_event_acc': df['event_acc'].mean(),
-        'pct_event_gyro': df['event_gyro'].mean(),
-        'pct_event_speed': df['event_speed'].mean(),
-        'pct_event_any': df['event_any'].mean(),
-        'mean_speed_kmh': df['speed_kmh'].mean(),
-        'max_speed_kmh': df['speed_kmh'].max(),
-        'trip_duration_sec': trip_duration_sec
+        'pct_event_jerk': event_jerk.mean(),
+        'pct_event_jerk_accel': event_jerk_accel.mean(),
+        'pct_event_jerk_brake': event_jerk_brake.mean(),
+        'pct_event_jerk_relative': event_jerk_relative.mean(),
+        'pct_event_acc': event_acc.mean(),
+        'pct_event_gyro': event_gyro.mean(),
+        'pct_event_speed': event_speed.mean(),
+        'pct_event_any': event_any.mean(),
+        'mean_speed_kmh': mean_speed,
+        'max_speed_kmh': speed_kmh.max(),
+        'trip_duration_sec': trip_duration_sec,
+        'samples': n,
+        'track': track.build(),
     }
 
     return stats, user_stats
+
+
+def extract_trip_features(
+    df: pd.DataFrame, filename: str = "trip.csv"
+) -> tuple[dict, dict]:
+    if df.empty or 'speed_kmh' not in df.columns:
+        raise ValueError("Некорректный файл: отсутствует колонка 'speed_kmh'")
+
+    columns = {c: df[c].to_numpy() for c in SENSOR_COLS}
+    timestamps = df['timestamp'] if 'timestamp' in df.columns else None
+    return compute_trip_features(columns, timestamps, filename)
@@ -0,0 +1,205 @@
+"""
+Пул процессов для извлечения признаков поездок.
+
+Расчёт признаков почти целиком держит GIL (pandas, разбор CSV), поэтому
+потоки не дают выигрыша на многоядерной машине. `FeatureExecutor`
+выполняет расчёт в отдельных процессах (контекст `spawn`), которые при
+старте импортируют numpy/pandas/sklearn.
+
+Данные в процесс не сериализуются: файл передаётся путём — процесс
+читает CSV сам, а бинарную телеметрию отображает в память.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Optional
+
+import pandas as pd
+
+from .extract_features_single_trip import extract_trip_features
+from .streaming_features import (
+    DEFAULT_CHUNKSIZE, extract_trip_features_streaming
+)
+from .telemetry_io import (
+    FORMAT_CSV, detect_format, extract_features_binary, should_stream
+)
+
+
+DEFAULT_STREAMING_MIN_BYTES = 50 * 1024 * 1024
+
+
+def extract_features_file(
+    path: str,
+    filename: Optional[str] = None,
+    *,
+    streaming_min_bytes: int = DEFAULT_STREAMING_MIN_BYTES,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> tuple[dict, dict]:
+    """Признаки поездки из файла на диске (CSV или бинарная телеметрия)."""
+    filename = filename or path
+    fmt = detect_format(path)
+    if fmt not in (None, FORMAT_CSV):
+        return extract_features_binary(path, fmt, filename=filename)
+    if should_stream(path, streaming_min_bytes):
+        return extract_trip_features_streaming(
+            path, filename=filename, chunksize=chunksize
+        )
+    return extract_trip_features(df=pd.read_csv(path), filename=filename)
+
+
+# === Пул процессов ===
+
+# очередь процесса пула: (номер задачи, pid) при старте задачи
+_started = None
+
+
+def _warm_up(started) -> None:
+    """Инициализатор процесса: тяжёлые импорты до первой задачи."""
+    global _started
+    _started = started
+    import sklearn.ensemble  # noqa: F401
+
+    from . import classify_trip  # noqa: F401
+
+
+def _tracked(task_id: int, fn, *args, **kwargs):
+    # сообщает, в каком процессе выполняется задача (см. FeatureExecutor)
+    _started.put((task_id, os.getpid()))
+    return fn(*args, **kwargs)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class FeatureExecutor:
+    """Общий пул процессов для расчёта признаков с таймаутом на задачу.
+
+    Если процесс пула погиб (OOM, SIGKILL), пул создаётся заново,
+    а задача повторяется один раз. Задачу, не уложившуюся
+    в `task_timeout`, нельзя отменить: завершается только выполняющий
+    её процесс (его pid задача сообщает при старте), для вызывающего
+    кода это `TimeoutError`. ProcessPoolExecutor после гибели процесса
+    непригоден целиком, поэтому задачи других запросов в этом пуле
+    получают BrokenProcessPool и повторяются в новом пуле.
+    """
+
+    def __init__(self, max_workers: int, task_timeout: Optional[float] = None):
+        self.max_workers = max_workers
+        self.task_timeout = task_timeout
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._started = None
+        self._pids: dict[int, int] = {}
+        self._task_ids = itertools.count()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                context = get_context('spawn')
+                self._started = context.Queue()
+                self._pids = {}
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_warm_up,
+                    initargs=(self._started,),
+                )
+            return self._pool, self._started
+
+    def _restart(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        # процессы сломанного пула завершает сам ProcessPoolExecutor
+        pool.shutdown(wait=False)
+
+    def _pid(self, started, task_id: int) -> Optional[int]:
+        """pid процесса задачи, если она стартовала; запись удаляется."""
+        with self._lock:
+            if started is not self._started:
+                return None
+            while True:
+                try:
+                    started_id, pid = started.get_nowait()
+                except queue.Empty:
+                    break
+                self._pids[started_id] = pid
+            return self._pids.pop(task_id, None)
+
+    def _run(self, fn, *args, retry=True, **kwargs):
+        pool, started = self._get_pool()
+        task_id = next(self._task_ids)
+        future = None
+        try:
+            future = pool.submit(_tracked, task_id, fn, *args, **kwargs)
+            return future.result(timeout=self.task_timeout)
+        except FutureTimeoutError:
+            pid = self._pid(started, task_id)
+            if not future.cancel() and pid is not None:
+                os.kill(pid, signal.SIGKILL)
+                self._restart(pool)
+            raise TimeoutError(
+                f"Расчёт признаков не уложился в {self.task_timeout} с"
+            ) from None
+        except BrokenProcessPool:
+            self._restart(pool)
+            if not retry:
+                raise
+        finally:
+            if future is not None and future.done():
+                self._pid(started, task_id)
+        return self._run(fn, *args, retry=False, **kwargs)
+
+    def warm(self) -> None:
+        """Запуск всех процессов пула заранее, до первого запроса."""
+        pool, _ = self._get_pool()
+        futures = [pool.submit(_ping) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def extract_file(
+        self, path: str, filename: Optional[str] = None, **kwargs
+    ):
+        """Признаки из файла на диске; в процесс передаётся только путь."""
+        return self._run(extract_features_file, str(path), filename, **kwargs)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+_executor: Optional[FeatureExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(
+    max_workers: int, task_timeout: Optional[float] = None
+) -> FeatureExecutor:
+    """Пул процесса (один на процесс; создаётся при первом вызове)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = FeatureExecutor(max_workers, task_timeout)
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """Остановка пула процесса, если он был создан."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
@@ -0,0 +1,150 @@
+"""
+Скомпилированный случайный лес: предсказание на чистом NumPy.
+
+`export_forest` переносит обученный Pipeline(StandardScaler,
+RandomForestClassifier) в плоские массивы узлов всех деревьев и
+сохраняет их в `.npz`. `ForestPredictor` загружает такой файл без
+scikit-learn и считает `predict_proba` векторно: все деревья и все
+строки обходятся одновременно, по одному шагу глубины за итерацию.
+
+Арифметика повторяет sklearn: масштабирование в float64, затем
+приведение к float32 и сравнение `x <= threshold` с порогом float64.
+Пропуск (NaN) идёт в потомка из `missing_go_to_left` узла, как в
+sklearn; бесконечность, как и в StandardScaler, — ошибка.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+FORMAT_VERSION = 2
+
+
+def export_forest(pipeline, path: str | Path,
+                  feature_names: Optional[Sequence[str]] = None) -> Path:
+    """Сохранение Pipeline(StandardScaler, RandomForestClassifier) в `.npz`."""
+    scaler, forest = pipeline[0], pipeline[-1]
+    if getattr(forest, 'n_outputs_', 1) != 1:
+        raise ValueError("Поддерживается только лес с одним выходом")
+
+    n_features = forest.n_features_in_
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    if len(pipeline) > 1:
+        if scaler.with_mean:
+            mean = scaler.mean_
+        if scaler.with_std:
+            scale = scaler.scale_
+
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+    leaf = np.concatenate([tree.children_left == -1 for tree in trees])
+    nodes = np.arange(offsets[-1], dtype=np.int32)
+
+    def children(name):
+        # потомки — глобальные индексы; лист ссылается сам на себя
+        child = np.concatenate([
+            getattr(tree, name) + offset
+            for tree, offset in zip(trees, offsets[:-1])
+        ]).astype(np.int32)
+        return np.where(leaf, nodes, child)
+
+    value = np.concatenate([tree.value[:, 0, :] for tree in trees])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        value = value / value.sum(axis=1, keepdims=True)
+    value[~leaf] = 0.0
+
+    path = Path(path)
+    np.savez(
+        path,
+        format_version=np.int64(FORMAT_VERSION),
+        classes=np.asarray(forest.classes_).astype(str),
+        feature_names=np.asarray(feature_names or [], dtype=str),
+        mean=mean.astype(np.float64),
+        scale=scale.astype(np.float64),
+        roots=offsets[:-1].astype(np.int32),
+        feature=np.where(
+            leaf, 0, np.concatenate([tree.feature for tree in trees])
+        ).astype(np.int32),
+        threshold=np.concatenate([tree.threshold for tree in trees]),
+        missing_left=np.concatenate([
+            tree.missing_go_to_left for tree in trees
+        ]).astype(bool) & ~leaf,
+        left=children('children_left'),
+        right=children('children_right'),
+        value=value,
+        max_depth=np.int64(max(tree.max_depth for tree in trees)),
+    )
+    return path
+
+
+class ForestPredictor:
+    """Предсказание по массивам, сохранённым `export_forest`."""
+
+    CHUNK_ROWS = 256
+
+    def __init__(self, arrays) -> None:
+        if int(arrays['format_version']) != FORMAT_VERSION:
+            raise ValueError("Неподдерживаемая версия файла модели")
+        self.classes_ = arrays['classes']
+        self.feature_names = [str(name) for name in arrays['feature_names']]
+        self.mean = arrays['mean']
+        self.scale = arrays['scale']
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.missing_left = arrays['missing_left']
+        self.value = arrays['value']
+        self.max_depth = int(arrays['max_depth'])
+        # потомки узла i: [2i] — правый, [2i + 1] — левый (индекс по x <= t)
+        self.children = np.stack(
+            (arrays['right'], arrays['left']), axis=1
+        ).ravel()
+
+    @classmethod
+    def load(cls, path: str | Path) -> 'ForestPredictor':
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    @property
+    def n_features_in_(self) -> int:
+        return len(self.mean)
+
+    def _as_array(self, X) -> np.ndarray:
+        if hasattr(X, 'columns') and self.feature_names:
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Ожидается матрица с {self.n_features_in_} признаками"
+            )
+        if np.isinf(X).any():
+            raise ValueError("Признаки содержат бесконечность")
+        return X
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = self._as_array(X)
+        Xs = ((X - self.mean) / self.scale).astype(np.float32)
+        n_features = Xs.shape[1]
+        proba = np.empty((len(Xs), len(self.classes_)))
+        # блоки строк, чтобы рабочие массивы (строки × деревья)
+        # помещались в кэш
+        for start in range(0, len(Xs), self.CHUNK_ROWS):
+            flat = Xs[start:start + self.CHUNK_ROWS].ravel()
+            base = np.arange(0, len(flat), n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (len(base), len(self.roots)))
+            for _ in range(self.max_depth):
+                x = flat[base + self.feature[nodes]]
+                go_left = (x <= self.threshold[nodes]) | (
+                    np.isnan(x) & self.missing_left[nodes]
+                )
+                nodes = self.children[2 * nodes + go_left]
+            proba[start:start + len(base)] = self.value[nodes].sum(axis=1)
+        return proba / len(self.roots)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
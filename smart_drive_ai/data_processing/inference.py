@@ -0,0 +1,202 @@
+"""
+Классификация поездок с микробатчингом.
+
+Одна строка признаков в лесу из сотен деревьев — в основном накладные
+расходы на вызов. `MicroBatcher` собирает параллельные запросы на
+классификацию в течение короткого окна (`max_wait` секунд или
+`max_batch_size` запросов) и выполняет один `predict_proba` на всю пачку.
+Метка и уверенность берутся из одного прохода по лесу.
+
+Батчинг имеет смысл, только когда процесс обслуживает запросы
+параллельно: под ASGI или в gthread-воркерах gunicorn. В синхронном
+воркере запрос в процессе всегда один — пачка из одного вектора лишь
+ждёт `max_wait` и переходит в другой поток (см. INFERENCE_BATCHING
+в настройках).
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .classify_trip import FEATURE_COLS, predict_with_proba
+from .model_registry import DEFAULT_MODEL_PATH, get_model
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class InferenceMetrics:
+    """Счётчики микробатчинга: размеры пачек и время ожидания в очереди."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.batch_size_max = 0
+        self.batch_size_buckets = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_seconds_sum = 0.0
+        self.queue_wait_seconds_max = 0.0
+        self.inference_seconds_sum = 0.0
+        self.failed_batches = 0
+
+    def observe(
+        self, waits, inference_seconds: float, failed: bool = False
+    ) -> None:
+        size = len(waits)
+        bucket = next(
+            (i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if size <= bound),
+            len(BATCH_SIZE_BUCKETS),
+        )
+        with self._lock:
+            self.batches += 1
+            self.requests += size
+            self.batch_size_max = max(self.batch_size_max, size)
+            self.batch_size_buckets[bucket] += 1
+            self.queue_wait_seconds_sum += sum(waits)
+            self.queue_wait_seconds_max = max(
+                self.queue_wait_seconds_max, max(waits)
+            )
+            self.inference_seconds_sum += inference_seconds
+            self.failed_batches += failed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            batches = self.batches or 1
+            requests = self.requests or 1
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'batch_size_avg': self.requests / batches,
+                'batch_size_max': self.batch_size_max,
+                'batch_size_buckets': dict(zip(
+                    [str(b) for b in BATCH_SIZE_BUCKETS] + ['+Inf'],
+                    self.batch_size_buckets,
+                )),
+                'queue_wait_seconds_avg': (
+                    self.queue_wait_seconds_sum / requests
+                ),
+                'queue_wait_seconds_max': self.queue_wait_seconds_max,
+                'inference_seconds_avg': self.inference_seconds_sum / batches,
+                'failed_batches': self.failed_batches,
+            }
+
+
+class MicroBatcher:
+    """Фоновый поток, классифицирующий запросы пачками.
+
+    Только для ASGI и gthread-воркеров (см. описание модуля).
+    """
+
+    def __init__(
+        self,
+        model_path: str | Path = DEFAULT_MODEL_PATH,
+        *,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+        feature_cols=FEATURE_COLS,
+    ) -> None:
+        self.model_path = Path(model_path)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.feature_cols = list(feature_cols)
+        self.metrics = InferenceMetrics()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._loop, name='inference-batcher', daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, vector: np.ndarray) -> Future:
+        """Постановка вектора признаков в очередь; результат — (метка, p)."""
+        future: Future = Future()
+        self._queue.put((vector, future, time.monotonic()))
+        return future
+
+    def classify(
+        self, vector: np.ndarray, timeout: Optional[float] = None
+    ) -> Tuple[str, float]:
+        return self.submit(vector).result(timeout=timeout)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # остановка после обработки собранной пачки
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._run(self._collect(first))
+
+    def _run(self, batch) -> None:
+        started = time.monotonic()
+        futures = [future for _, future, _ in batch]
+        failed = True
+        try:
+            X = pd.DataFrame(
+                np.vstack([vector for vector, _, _ in batch]),
+                columns=self.feature_cols,
+            )
+            labels, probs = predict_with_proba(get_model(self.model_path), X)
+            failed = False
+        except Exception as error:
+            for future in futures:
+                future.set_exception(error)
+            return
+        finally:
+            # пачки с ошибкой тоже учитываются
+            self.metrics.observe(
+                [started - enqueued for _, _, enqueued in batch],
+                time.monotonic() - started,
+                failed,
+            )
+        for future, label, prob in zip(futures, labels, probs):
+            future.set_result((str(label), float(prob)))
+
+
+_batcher: Optional[MicroBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher(
+    max_batch_size: int = 64, max_wait: float = 0.005
+) -> MicroBatcher:
+    """Сервис классификации процесса (создаётся при первом вызове)."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(
+                max_batch_size=max_batch_size, max_wait=max_wait
+            )
+        return _batcher
+
+
+def batcher_metrics() -> Optional[dict]:
+    """Метрики сервиса классификации или None, если он не запущен."""
+    return _batcher.metrics.snapshot() if _batcher is not None else None
@@ -0,0 +1,125 @@
+"""
+Реестр моделей: каждая модель загружается один раз на процесс
+и перечитывается только при изменении файла на диске.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import joblib
+
+
+# `.joblib` — исходный sklearn Pipeline, `.npz` — скомпилированный лес
+# (manage.py export_forest), загружается без scikit-learn
+DEFAULT_MODEL_PATH = Path(
+    os.getenv("MODEL_PATH") or "data_processing/rf_v1.joblib"
+)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    model: Any
+    signature: Tuple[int, int]      # (mtime_ns, size)
+    sha256: str
+    mmap_mode: Optional[str]
+
+
+def _signature(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load(path: Path, mmap_mode: Optional[str]) -> Any:
+    if path.suffix == ".npz":
+        from .forest_predictor import ForestPredictor
+        return ForestPredictor.load(path)
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+class ModelRegistry:
+    """Потокобезопасный кэш загруженных моделей.
+
+    Проверка актуальности — один `stat()` на вызов. Если изменился mtime
+    или размер, файл перехэшируется: при совпадении sha256 модель
+    остаётся в памяти, иначе загружается заново.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Tuple[Path, Optional[str]], _Entry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str | Path, *, mmap_mode: Optional[str] = None) -> Any:
+        path = Path(path).resolve()
+        if not path.exists():
+            raise FileNotFoundError(path)
+        key = (path, mmap_mode)
+        signature = _signature(path)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.signature == signature:
+            return entry.model
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                return entry.model
+            sha256 = _file_hash(path)
+            if entry is not None and entry.sha256 == sha256:
+                # файл «тронули», но содержимое прежнее
+                self._entries[key] = _Entry(
+                    entry.model, signature, sha256, mmap_mode
+                )
+                return entry.model
+            model = _load(path, mmap_mode)
+            self._entries[key] = _Entry(model, signature, sha256, mmap_mode)
+            return model
+
+    def preload(
+        self, paths: Iterable[str | Path], *, mmap_mode: Optional[str] = None
+    ) -> None:
+        """Загружает модели заранее (например, в `post_fork` gunicorn)."""
+        for path in paths:
+            self.get(path, mmap_mode=mmap_mode)
+
+    def invalidate(self, path: str | Path | None = None) -> None:
+        """Сбрасывает кэш целиком или для одного файла."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            path = Path(path).resolve()
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+
+
+registry = ModelRegistry()
+
+
+def get_model(path: str | Path = DEFAULT_MODEL_PATH, *,
+              mmap_mode: Optional[str] = None) -> Any:
+    """Возвращает модель из общего реестра процесса."""
+    if mmap_mode is None:
+        mmap_mode = os.getenv("MODEL_MMAP_MODE") or None
+    return registry.get(path, mmap_mode=mmap_mode)
+
+
+def preload_models(
+    paths: Iterable[str | Path] = (DEFAULT_MODEL_PATH,)
+) -> None:
+    """Прогрев реестра для текущего процесса."""
+    for path in paths:
+        get_model(path)
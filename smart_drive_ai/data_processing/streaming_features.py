@@ -0,0 +1,500 @@
+"""
+Потоковое извлечение признаков поездки из CSV по частям.
+
+Память ограничена размером части (`chunksize`) независимо от длины
+поездки. Файл читается в два прохода:
+
+1. по колонкам скорости и акселерометра находятся границы обрезки
+   нестабильных краёв (`stable_bounds`) — скользящее std считается
+   с переносом хвоста окна между частями;
+2. строки внутри границ проходят через `TripFeatureAccumulator`,
+   который хранит только хвосты скользящих окон (5 и 60 отсчётов),
+   предыдущий отсчёт для рывка и накопленные суммы.
+
+Результат совпадает с `extract_trip_features` (с точностью до порядка
+суммирования чисел с плавающей точкой).
+
+`LiveTripFeatures` считает те же признаки по частям, которые приложение
+присылает во время поездки, — без первого прохода (см. его описание).
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .extract_features_single_trip import (
+    ACC_MAG_THRESHOLD, GYRO_SMOOTH_WINDOW, GYRO_THRESHOLD, HIGHWAY_LIMIT,
+    JERK_RATIO_THRESHOLD, JERK_RESET_STEPS, JERK_THRESHOLD,
+    MIN_SPEED_FOR_RATIO, SENSOR_COLS, SPEED_CONTEXT_WINDOW, STD_THRESH,
+    STD_WINDOW, TRIM_PADDING, URBAN_LIMIT, URBAN_THRESHOLD, _magnitude,
+    _window_sums, parse_timestamps, rolling_mean,
+)
+from .track import TrackBuilder
+
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# сколько отсчётов до и после строки нужно для её скользящих окон
+_CONTEXT = SPEED_CONTEXT_WINDOW // 2
+
+# биты `instant` в буфере строк
+_ANY, _BRAKE, _ACCEL = 1, 2, 4
+
+
+def _to_ns(ts) -> tuple[np.ndarray, np.ndarray] | None:
+    if ts is None:
+        return None
+    ticks, nat, pps = ts
+    return ticks * (10**9 // pps), nat
+
+
+class StabilityScanner:
+    """Первый проход: границы обрезки как в `stable_bounds`.
+
+    При std_window > 1 и std_thresh > 0 крайние окна неполные и считаются
+    стабильными, поэтому границы зависят только от числа строк: значения
+    тогда не нужны (`needs_values`), достаточно `skip`.
+    """
+
+    def __init__(self, std_window=STD_WINDOW, std_thresh=STD_THRESH,
+                 padding=TRIM_PADDING) -> None:
+        self.std_window = std_window
+        self.std_thresh = std_thresh
+        self.padding = padding
+        self.n = 0
+        self._tail = np.empty(0)
+        self._first: Optional[int] = None
+        self._last: Optional[int] = None
+
+    def _mark(self, idx: np.ndarray) -> None:
+        if len(idx):
+            if self._first is None:
+                self._first = int(idx[0])
+            self._last = int(idx[-1])
+
+    @property
+    def needs_values(self) -> bool:
+        return not (self.std_window > 1 and self.std_thresh > 0)
+
+    def skip(self, m: int) -> None:
+        """Учёт `m` строк без расчёта std."""
+        self.n += m
+
+    def push(self, acc_mag: np.ndarray) -> None:
+        if not self.needs_values:
+            self.skip(len(acc_mag))
+            return
+        w = self.std_window
+        buf = np.concatenate((self._tail, acc_mag))
+        base = self.n - len(self._tail)     # глобальный индекс buf[0]
+        self.n += len(acc_mag)
+        if len(buf) >= w:
+            # хвост прошлой части короче окна, поэтому все окна здесь новые
+            finite = buf[~np.isnan(buf)]
+            xc = buf - (finite.mean() if len(finite) else 0.0)
+            s1, nans = _window_sums(xc, w)
+            s2, _ = _window_sums(xc * xc, w)
+            std = np.sqrt(np.maximum((s2 - s1 * s1 / w) / (w - 1), 0.0))
+            std[nans > 0] = 0.0             # fillna(0)
+            # окно, начинающееся в buf[j], центрировано на base + j + w//2
+            self._mark(base + w // 2 + np.flatnonzero(std < self.std_thresh))
+        self._tail = buf[len(buf) - (w - 1):] if w > 1 else np.empty(0)
+
+    def bounds(self) -> tuple[int, int]:
+        """Границы [start, end) после обработки всех частей."""
+        n = self.n
+        # у краёв окно неполное → std NaN → fillna(0) → стабильно
+        if n and not self.needs_values:
+            self._first, self._last = 0, n - 1
+        if self._first is None:
+            return 0, n
+        start, end, _ = slice(
+            self._first + self.padding, self._last - self.padding
+        ).indices(n)
+        return start, max(end, start)
+
+
+class TripFeatureAccumulator:
+    """Второй проход: онлайн-счётчики событий по обрезанным строкам."""
+
+    def __init__(self, with_timestamps: bool = True) -> None:
+        self.with_timestamps = with_timestamps
+        self.n = 0                      # строк принято
+        self._done = 0                  # строк учтено в суммах
+        self._reset_jerk = False
+        self._prev_speed_ms: Optional[float] = None
+        self._prev_tick: Optional[int] = None
+        self._prev_nat = True
+        self._first_tick: Optional[int] = None
+        self._first_nat = True
+        self._last_tick: Optional[int] = None
+        self._last_nat = True
+        # буфер строк: контекст окон + ещё не учтённые строки
+        self._buf = {
+            'speed_kmh': np.empty(0), 'gyro_mag': np.empty(0),
+            'acc_mag': np.empty(0), 'jerk': np.empty(0),
+            'delta': np.empty(0), 'instant': np.empty(0, dtype=np.uint8),
+        }
+        self.track = TrackBuilder()
+        self._buf_start = 0             # глобальный индекс начала буфера
+        self._counts = dict.fromkeys((
+            'jerk', 'jerk_accel', 'jerk_brake', 'jerk_relative', 'acc',
+            'gyro', 'speed', 'any',
+        ), 0)
+        self._sum_speed = 0.0
+        self._max_speed = -np.inf
+        self._sum_distance = 0.0
+        self._sum_delta = 0.0
+        self._sum_gyro = 0.0
+        self._n_gyro = 0
+
+    # --- приём данных -------------------------------------------------------
+
+    def push(self, speed_kmh: np.ndarray, acc_mag: np.ndarray,
+             gyro_mag: np.ndarray, ticks_ns=None) -> None:
+        """Добавляет очередную часть строк (после фильтра и обрезки).
+
+        `ticks_ns` — пара (метки в нс, маска NaT) или None.
+        """
+        m = len(speed_kmh)
+        if m == 0:
+            return
+
+        delta = np.ones(m)
+        if self.with_timestamps and ticks_ns is not None:
+            ticks, nat = ticks_ns
+            prev_ticks = np.concatenate((
+                [self._prev_tick if self._prev_tick is not None else 0],
+                ticks[:-1],
+            ))
+            prev_nat = np.concatenate(([self._prev_nat], nat[:-1]))
+            delta = (ticks - prev_ticks) / 10**9
+            delta[nat | prev_nat] = 1.0
+            if self.n == 0:
+                delta[0] = 1.0
+                self._first_tick, self._first_nat = int(ticks[0]), bool(nat[0])
+            self._prev_tick, self._prev_nat = int(ticks[-1]), bool(nat[-1])
+            self._last_tick, self._last_nat = self._prev_tick, self._prev_nat
+
+        speed_ms = speed_kmh / 3.6
+        prev_speed = np.concatenate((
+            [self._prev_speed_ms if self._prev_speed_ms is not None
+             else speed_ms[0]],
+            speed_ms[:-1],
+        ))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            jerk = (speed_ms - prev_speed) / delta
+        abs_jerk = np.abs(jerk)
+        jerk_ratio = abs_jerk / (speed_ms + 0.1)
+        if self.n == 0:
+            self._reset_jerk = speed_ms[0] > MIN_SPEED_FOR_RATIO
+        if self._reset_jerk and self.n < JERK_RESET_STEPS:
+            k = JERK_RESET_STEPS - self.n
+            jerk[:k] = 0
+            abs_jerk[:k] = 0
+            jerk_ratio[:k] = 0
+        self._prev_speed_ms = float(speed_ms[-1])
+
+        event_acc = acc_mag > ACC_MAG_THRESHOLD
+        event_jerk = abs_jerk > JERK_THRESHOLD
+        event_jerk_accel = jerk > JERK_THRESHOLD
+        event_jerk_brake = jerk < -JERK_THRESHOLD
+        event_jerk_relative = (
+            (jerk_ratio > JERK_RATIO_THRESHOLD)
+            & (speed_ms > MIN_SPEED_FOR_RATIO)
+        )
+        counts = self._counts
+        counts['acc'] += int(event_acc.sum())
+        counts['jerk'] += int(event_jerk.sum())
+        counts['jerk_accel'] += int(event_jerk_accel.sum())
+        counts['jerk_brake'] += int(event_jerk_brake.sum())
+        counts['jerk_relative'] += int(event_jerk_relative.sum())
+
+        self._sum_speed += speed_kmh.sum()
+        self._max_speed = max(self._max_speed, speed_kmh.max())
+        self._sum_distance += np.nansum(speed_kmh * delta)
+        self._sum_delta += delta.sum()
+        gyro_ok = ~np.isnan(gyro_mag)
+        self._sum_gyro += gyro_mag[gyro_ok].sum()
+        self._n_gyro += int(gyro_ok.sum())
+
+        # события, зависящие от окон, считаются с задержкой
+        instant = (
+            (event_acc | event_jerk | event_jerk_relative) * _ANY
+            | event_jerk_brake * _BRAKE | event_jerk_accel * _ACCEL
+        ).astype(np.uint8)
+        rows = {
+            'speed_kmh': speed_kmh, 'gyro_mag': gyro_mag, 'acc_mag': acc_mag,
+            'jerk': jerk, 'delta': delta, 'instant': instant,
+        }
+        buf = self._buf
+        for key, values in rows.items():
+            buf[key] = np.concatenate((buf[key], values))
+        self.n += m
+        self._drain(final=False)
+
+    def _drain(self, final: bool) -> None:
+        buf = self._buf
+        size = len(buf['speed_kmh'])
+        upto = size if final else size - _CONTEXT
+        lo = self._done - self._buf_start
+        if upto <= lo:
+            return
+
+        gyro_smooth = rolling_mean(
+            buf['gyro_mag'], GYRO_SMOOTH_WINDOW
+        )[lo:upto]
+        mean_speed = rolling_mean(
+            buf['speed_kmh'], SPEED_CONTEXT_WINDOW
+        )[lo:upto]
+        speed = buf['speed_kmh'][lo:upto]
+        threshold = np.where(
+            mean_speed > URBAN_THRESHOLD, HIGHWAY_LIMIT, URBAN_LIMIT
+        )
+        event_gyro = gyro_smooth > GYRO_THRESHOLD
+        event_speed = speed > threshold
+        instant = buf['instant'][lo:upto]
+        event_any = event_gyro | event_speed | (instant & _ANY).astype(bool)
+        self._counts['gyro'] += int(event_gyro.sum())
+        self._counts['speed'] += int(event_speed.sum())
+        self._counts['any'] += int(event_any.sum())
+        self._done = self._buf_start + upto
+        self.track.push(
+            buf['delta'][lo:upto],
+            {name: buf[name][lo:upto]
+             for name in ('speed_kmh', 'jerk', 'acc_mag', 'gyro_mag')},
+            {'hard_brakes': (instant & _BRAKE) > 0,
+             'hard_accels': (instant & _ACCEL) > 0, 'sharp_turns': event_gyro},
+        )
+
+        # оставляем контекст окна перед первой неучтённой строкой
+        keep_from = max(upto - _CONTEXT, 0)
+        for key in buf:
+            buf[key] = buf[key][keep_from:].copy()
+        self._buf_start += keep_from
+
+    # --- итог ---------------------------------------------------------------
+
+    def progress(self) -> dict:
+        """Промежуточные показатели поездки.
+
+        Резкие манёвры (сглаженное окно гироскопа) учитываются с задержкой
+        в полокна контекста скорости.
+        """
+        return {
+            'samples': self.n,
+            'avg_speed': self._sum_speed / self.n if self.n else 0.0,
+            'distance': self._sum_distance / 3600,
+            'hard_brakes': self._counts['jerk_brake'],
+            'hard_accels': self._counts['jerk_accel'],
+            'sharp_turns': self._counts['gyro'],
+        }
+
+    def finalize(self, filename: str = "trip.csv",
+                 track: bytes = b'') -> tuple[dict, dict]:
+        """Признаки поездки; `track` — см. `TrackBuilder.build`."""
+        if self.n == 0:
+            raise ValueError("Некорректный файл: нет данных после фильтрации")
+        self._drain(final=True)
+        n = self.n
+        if not self.with_timestamps:
+            trip_duration_sec = self._sum_delta
+        elif self._first_nat or self._last_nat:
+            trip_duration_sec = float('nan')
+        else:
+            trip_duration_sec = pd.Timedelta(
+                self._last_tick - self._first_tick, unit='ns'
+            ).total_seconds()
+
+        counts = self._counts
+        mean_speed = np.float64(self._sum_speed / n)
+        avg_gyro_mag = (
+            np.float64(self._sum_gyro / self._n_gyro) if self._n_gyro
+            else np.nan
+        )
+        user_stats = {
+            'avg_speed': mean_speed,
+            'distance': np.float64(self._sum_distance / 3600),
+            'hard_brakes': counts['jerk_brake'],
+            'hard_accels': counts['jerk_accel'],
+            'sharp_turns': counts['gyro'],
+            'avg_gyro_mag': avg_gyro_mag,
+            'trip_duration': trip_duration_sec
+        }
+        stats = {'file': filename}
+        for key in ('jerk', 'jerk_accel', 'jerk_brake', 'jerk_relative',
+                    'acc', 'gyro', 'speed', 'any'):
+            stats[f'pct_event_{key}'] = np.float64(counts[key] / n)
+        stats.update({
+            'mean_speed_kmh': mean_speed,
+            'max_speed_kmh': np.float64(self._max_speed),
+            'trip_duration_sec': trip_duration_sec,
+            'samples': n,
+            'track': self.track.build(track),
+        })
+        return stats, user_stats
+
+
+class LiveTripFeatures:
+    """Признаки поездки, данные которой приходят частями во время езды.
+
+    При STD_WINDOW > 1 края ряда std в `stable_bounds` неполные (NaN → 0)
+    и всегда «стабильны», поэтому обрезка сводится к отступам: первые
+    `padding` строк отбрасываются сразу, последние `padding + 1` строк
+    придерживаются до следующей части и отбрасываются при завершении.
+    Остальное считает `TripFeatureAccumulator`; в памяти — только хвосты
+    окон, состояние можно сохранять между запросами через pickle.
+    """
+
+    def __init__(self, with_timestamps: bool,
+                 padding: int = TRIM_PADDING) -> None:
+        self.with_timestamps = with_timestamps
+        self.padding = padding
+        self.rows = 0                   # строк после фильтра скорости
+        self.accumulator = TripFeatureAccumulator(with_timestamps)
+        self._held: dict[str, np.ndarray] = {}
+
+    def push(self, frame: pd.DataFrame) -> None:
+        """Очередная часть строк: колонки SENSOR_COLS (и `timestamp`)."""
+        speed, keep = _filtered(frame)
+
+        def column(name):
+            return frame[name].to_numpy(dtype=np.float64)[keep]
+
+        parts = {
+            'speed': speed,
+            'acc': _magnitude(column('acc_x'), column('acc_y'),
+                              column('acc_z')),
+            'gyro': _magnitude(column('gyro_x'), column('gyro_y'),
+                               column('gyro_z')),
+        }
+        if self.with_timestamps:
+            ts = _to_ns(parse_timestamps(frame['timestamp'].iloc[keep]))
+            if ts is None:
+                raise ValueError('Некорректные метки времени')
+            parts['ticks'], parts['nat'] = ts
+
+        skip = max(self.padding - self.rows, 0)
+        self.rows += len(keep)
+        for key, values in parts.items():
+            values = values[skip:]
+            if key in self._held:
+                values = np.concatenate((self._held[key], values))
+            parts[key] = values
+        ready = max(len(parts['speed']) - (self.padding + 1), 0)
+        self._held = {key: values[ready:] for key, values in parts.items()}
+        if ready:
+            self.accumulator.push(
+                parts['speed'][:ready], parts['acc'][:ready],
+                parts['gyro'][:ready],
+                (parts['ticks'][:ready], parts['nat'][:ready])
+                if self.with_timestamps else None,
+            )
+
+    def progress(self) -> dict:
+        return self.accumulator.progress()
+
+    def flush_track(self) -> bytes:
+        """Завершённые секундные корзины ряда для графиков.
+
+        Вызывающий хранит их сам и передаёт в `finalize`: иначе они
+        копились бы в состоянии, сохраняемом после каждой части.
+        """
+        return self.accumulator.track.flush()
+
+    def finalize(self, filename: str = "trip.csv",
+                 track: bytes = b'') -> tuple[dict, dict]:
+        """Признаки завершённой поездки (придержанные строки отбрасываются).
+
+        `track` — склеенные результаты `flush_track`.
+        """
+        return self.accumulator.finalize(filename, track)
+
+
+# === Чтение CSV по частям ===
+
+def _chunks(source, usecols, chunksize: int) -> Iterable[pd.DataFrame]:
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return pd.read_csv(
+        source, chunksize=chunksize,
+        usecols=lambda c: c in usecols,
+    )
+
+
+def _filtered(chunk: pd.DataFrame):
+    if 'speed_kmh' not in chunk.columns:
+        raise ValueError("Некорректный файл: отсутствует колонка 'speed_kmh'")
+    speed = chunk['speed_kmh'].to_numpy(dtype=np.float64)
+    keep = np.flatnonzero(speed >= 0)
+    return speed[keep], keep
+
+
+def extract_trip_features_streaming(
+    source, filename: str = "trip.csv", chunksize: int = DEFAULT_CHUNKSIZE
+) -> tuple[dict, dict]:
+    """Признаки поездки из CSV (путь или файл с `seek`).
+
+    Память ограничена размером части `chunksize`.
+    """
+
+    # --- проход 1: границы обрезки и проверка меток времени ----------------
+    scanner = StabilityScanner()
+    has_timestamps = True
+    timestamps_ok = True
+    columns = ('speed_kmh', 'timestamp')
+    if scanner.needs_values:
+        columns += ('acc_x', 'acc_y', 'acc_z')
+    empty = True
+    for chunk in _chunks(source, columns, chunksize):
+        empty = empty and chunk.empty
+        has_timestamps = 'timestamp' in chunk.columns
+        _, keep = _filtered(chunk)
+        if scanner.needs_values:
+            scanner.push(_magnitude(*(
+                chunk[c].to_numpy(dtype=np.float64)[keep]
+                for c in ('acc_x', 'acc_y', 'acc_z')
+            )))
+        else:
+            scanner.skip(len(keep))
+        if has_timestamps and timestamps_ok and len(keep):
+            timestamps_ok = parse_timestamps(
+                chunk['timestamp'].iloc[keep]
+            ) is not None
+    if empty:
+        raise ValueError("Некорректный файл: отсутствует колонка 'speed_kmh'")
+    start, end = scanner.bounds()
+
+    # --- проход 2: признаки по строкам [start, end) --------------------------
+    use_ts = has_timestamps and timestamps_ok
+    acc = TripFeatureAccumulator(with_timestamps=use_ts)
+    offset = 0                          # глобальный индекс после фильтра
+    for chunk in _chunks(source, SENSOR_COLS + ('timestamp',), chunksize):
+        speed, keep = _filtered(chunk)
+        lo = min(max(start - offset, 0), len(keep))
+        hi = min(max(end - offset, 0), len(keep))
+        offset += len(keep)
+        if lo >= hi:
+            if offset >= end:
+                break
+            continue
+        rows = keep[lo:hi]
+
+        def column(name):
+            return chunk[name].to_numpy(dtype=np.float64)[rows]
+
+        ticks = None
+        if use_ts:
+            ticks = _to_ns(parse_timestamps(chunk['timestamp'].iloc[rows]))
+        acc.push(
+            speed[lo:hi],
+            _magnitude(column('acc_x'), column('acc_y'), column('acc_z')),
+            _magnitude(column('gyro_x'), column('gyro_y'), column('gyro_z')),
+            ticks,
+        )
+        if offset >= end:
+            break
+    return acc.finalize(filename)
@@ -0,0 +1,66 @@
+"""
+Синтетическая телеметрия поездок для бенчмарков.
+
+Формат совпадает с CSV, который принимает `extract_trip_features`:
+`timestamp, speed_kmh, acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z`.
+Ускорение — линейное (без силы тяжести), как в данных приложения.
+Данные воспроизводимы при одинаковом `seed`.
+"""
+
+from __future__ import annotations
+
+import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+START = datetime.datetime(2025, 1, 1, 8, 0)
+UNSTABLE_SECONDS = 3            # «тряска» в начале и в конце записи
+
+
+def generate_trip(
+    duration_s: float, rate_hz: float = 10.0, seed: int = 0
+) -> pd.DataFrame:
+    """Поездка длительностью `duration_s` с частотой `rate_hz`."""
+    rng = np.random.default_rng(seed)
+    n = max(int(duration_s * rate_hz), 2)
+    dt = 1.0 / rate_hz
+
+    # скорость: случайное блуждание ускорения с ограничениями
+    accel = np.cumsum(rng.normal(0.0, 0.05, n)) * dt
+    window = min(50, n)
+    trend = np.convolve(accel, np.ones(window) / window, 'same')
+    accel = np.clip(accel - trend, -4, 4)
+    speed = np.clip(np.cumsum(accel * dt * 3.6) + 40.0, 0.0, 140.0)
+
+    # линейное ускорение без силы тяжести: на него рассчитан
+    # ACC_MAG_THRESHOLD, иначе событием была бы каждая строка
+    acc = rng.normal(0.0, 0.2, (n, 3))
+    gyro = rng.normal(0.0, 3.0, (n, 3))
+    # редкие манёвры: всплески угловой скорости и ускорения
+    events = rng.random(n) < 0.002
+    gyro[events] += rng.normal(0.0, 40.0, (events.sum(), 3))
+    acc[events] += rng.normal(0.0, 2.0, (events.sum(), 3))
+
+    edge = min(int(UNSTABLE_SECONDS * rate_hz), n // 4)
+    if edge:
+        acc[:edge] += rng.normal(0.0, 2.0, (edge, 3))
+        acc[-edge:] += rng.normal(0.0, 2.0, (edge, 3))
+
+    timestamps = pd.date_range(START, periods=n, freq=pd.Timedelta(seconds=dt))
+    return pd.DataFrame({
+        'timestamp': timestamps.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3],
+        'speed_kmh': speed,
+        'acc_x': acc[:, 0], 'acc_y': acc[:, 1], 'acc_z': acc[:, 2],
+        'gyro_x': gyro[:, 0], 'gyro_y': gyro[:, 1], 'gyro_z': gyro[:, 2],
+    })
+
+
+def write_trip_csv(
+    path: str | Path, duration_s: float, rate_hz: float = 10.0, seed: int = 0
+) -> Path:
+    path = Path(path)
+    generate_trip(duration_s, rate_hz, seed).to_csv(path, index=False)
+    return path
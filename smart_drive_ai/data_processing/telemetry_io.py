@@ -0,0 +1,220 @@
+"""
+Чтение телеметрии поездки в бинарных форматах.
+
+Поддерживаются:
+
+* `.npy` — структурированный массив NumPy (см. TELEMETRY_DTYPE),
+  отображается в память через `np.load(mmap_mode='r')` без копирования;
+* `.bin` — те же записи TELEMETRY_DTYPE без заголовка (`np.memmap`
+  или `np.frombuffer` для байтов в памяти);
+* `.npz` — архив с отдельным массивом на каждую колонку;
+* `.parquet` — если установлен pyarrow.
+
+Колонки: `timestamp` (нс от эпохи, int64 или datetime64[ns]),
+`speed_kmh`, `acc_*`, `gyro_*`.
+
+CSV может храниться сжатым gzip (`.csv.gz`): pandas распаковывает
+такой файл по расширению, в том числе при чтении по частям. Файл,
+дописываемый частями, состоит из нескольких членов gzip (см.
+`compress_part`).
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+from pathlib import Path
+from typing import Mapping, Optional
+
+import numpy as np
+
+from .extract_features_single_trip import SENSOR_COLS, compute_trip_features
+
+
+TELEMETRY_DTYPE = np.dtype(
+    [('timestamp', '<i8')] + [(name, '<f4') for name in SENSOR_COLS]
+)
+
+FORMAT_CSV = 'csv'
+FORMAT_NPY = 'npy'
+FORMAT_RAW = 'bin'
+FORMAT_NPZ = 'npz'
+FORMAT_PARQUET = 'parquet'
+
+FORMATS_BY_EXTENSION = {
+    '.csv': FORMAT_CSV,
+    '.npy': FORMAT_NPY,
+    '.bin': FORMAT_RAW,
+    '.npz': FORMAT_NPZ,
+    '.parquet': FORMAT_PARQUET,
+}
+
+GZIP_SUFFIX = '.gz'
+
+# подполе FEXTRA (RFC 1952) первого члена файла из нескольких членов:
+# идентификатор 'SD', данных нет
+_PARTS_EXTRA = b'SD\x00\x00'
+_FEXTRA = 0x04
+
+FORMATS_BY_CONTENT_TYPE = {
+    'text/csv': FORMAT_CSV,
+    'application/csv': FORMAT_CSV,
+    'application/x-npy': FORMAT_NPY,
+    'application/vnd.smartdrive.telemetry': FORMAT_RAW,
+    'application/x-npz': FORMAT_NPZ,
+    'application/vnd.apache.parquet': FORMAT_PARQUET,
+    'application/x-parquet': FORMAT_PARQUET,
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def detect_format(
+    name: str, content_type: Optional[str] = None
+) -> Optional[str]:
+    """Формат файла по расширению, а при его отсутствии — по content type.
+
+    Суффикс сжатия не учитывается: `trip.csv.gz` — это CSV.
+    """
+    name = str(name)
+    if is_compressed(name):
+        name = name[:-len(GZIP_SUFFIX)]
+    fmt = FORMATS_BY_EXTENSION.get(Path(name).suffix.lower())
+    if fmt is None and content_type:
+        fmt = FORMATS_BY_CONTENT_TYPE.get(
+            content_type.split(';')[0].strip().lower()
+        )
+    return fmt
+
+
+def is_compressed(name) -> bool:
+    return str(name).lower().endswith(GZIP_SUFFIX)
+
+
+def compress_part(data: bytes, compresslevel: int = 9) -> bytes:
+    """Член gzip для файла, который дописывается частями.
+
+    ISIZE такого файла — размер только последней части, поэтому
+    в заголовок добавляется подполе, по которому `uncompressed_size`
+    узнаёт файл; при распаковке оно пропускается.
+    """
+    member = gzip.compress(data, compresslevel=compresslevel, mtime=0)
+    extra = len(_PARTS_EXTRA).to_bytes(2, 'little') + _PARTS_EXTRA
+    return b''.join((
+        member[:3], bytes([member[3] | _FEXTRA]), member[4:10],
+        extra, member[10:],
+    ))
+
+
+def uncompressed_size(path) -> Optional[int]:
+    """Оценка снизу размера данных файла для выбора потокового чтения.
+
+    Для gzip — поле ISIZE, но не меньше размера файла: ISIZE хранится
+    по модулю 4 ГиБ, и большой файл иначе выглядел бы маленьким.
+    Для файла из `compress_part` размер неизвестен — None.
+    """
+    size = os.path.getsize(path)
+    if not is_compressed(path) or size < 18:
+        return size
+    with open(path, 'rb') as fh:
+        header = fh.read(12 + len(_PARTS_EXTRA))
+        if header[3] & _FEXTRA and header[12:] == _PARTS_EXTRA:
+            return None
+        fh.seek(-4, os.SEEK_END)
+        return max(size, int.from_bytes(fh.read(4), 'little'))
+
+
+def should_stream(path, min_bytes: int) -> bool:
+    """Читать ли CSV по частям: данных больше `min_bytes` или неизвестно."""
+    size = uncompressed_size(path)
+    return size is None or size > min_bytes
+
+
+def _check_columns(names) -> None:
+    missing = [c for c in SENSOR_COLS if c not in names]
+    if missing:
+        raise ValueError(f"Некорректный файл: отсутствуют колонки {missing}")
+
+
+def _timestamps(values: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    if values is None:
+        return None
+    if values.dtype.kind == 'M':
+        return values
+    # int64 нс → datetime64[ns] без копирования
+    return values.astype('<i8', copy=False).view('datetime64[ns]')
+
+
+def _from_records(records: np.ndarray):
+    names = records.dtype.names or ()
+    _check_columns(names)
+    columns = {name: records[name] for name in SENSOR_COLS}
+    timestamps = records['timestamp'] if 'timestamp' in names else None
+    return columns, _timestamps(timestamps)
+
+
+def load_telemetry(source, fmt: str):
+    """Колонки датчиков и метки времени из бинарного файла.
+
+    `source` — путь или байты (для `bin`). Возвращает пару
+    (columns, timestamps) для `compute_trip_features`.
+    """
+    if fmt == FORMAT_NPY:
+        return _from_records(np.load(source, mmap_mode='r'))
+    if fmt == FORMAT_RAW:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            records = np.frombuffer(source, dtype=TELEMETRY_DTYPE)
+        else:
+            records = np.memmap(source, dtype=TELEMETRY_DTYPE, mode='r')
+        return _from_records(records)
+    if fmt == FORMAT_NPZ:
+        with np.load(source) as archive:
+            _check_columns(archive.files)
+            columns = {name: archive[name] for name in SENSOR_COLS}
+            timestamps = (
+                archive['timestamp'] if 'timestamp' in archive.files else None
+            )
+        return columns, _timestamps(timestamps)
+    if fmt == FORMAT_PARQUET:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(source, memory_map=True)
+        _check_columns(table.column_names)
+        columns = {
+            name: table.column(name).to_numpy() for name in SENSOR_COLS
+        }
+        timestamps = None
+        if 'timestamp' in table.column_names:
+            timestamps = table.column('timestamp').to_numpy()
+        return columns, _timestamps(timestamps)
+    raise ValueError(f"Неподдерживаемый формат телеметрии: {fmt}")
+
+
+def extract_features_binary(
+    source, fmt: str, filename: str = "trip.npy"
+) -> tuple[dict, dict]:
+    """Признаки поездки из бинарного файла телеметрии."""
+    columns, timestamps = load_telemetry(source, fmt)
+    if not len(columns['speed_kmh']):
+        raise ValueError("Некорректный файл: нет данных")
+    return compute_trip_features(columns, timestamps, filename)
+
+
+def write_telemetry(
+    path, columns: Mapping[str, np.ndarray], timestamps
+) -> None:
+    """Запись телеметрии в `.npy` с TELEMETRY_DTYPE."""
+    n = len(columns['speed_kmh'])
+    records = np.empty(n, dtype=TELEMETRY_DTYPE)
+    records['timestamp'] = np.asarray(
+        timestamps, dtype='datetime64[ns]'
+    ).view('<i8')
+    for name in SENSOR_COLS:
+        records[name] = columns[name]
+    np.save(path, records)
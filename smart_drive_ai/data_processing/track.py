@@ -0,0 +1,218 @@
+"""
+Прореженный ряд показателей поездки для графиков.
+
+Отсчёты (после фильтра и обрезки краёв) собираются в корзины по 1 с:
+min/max/mean скорости, рывка, модуля ускорения и угловой скорости и
+число отсчётов с резким торможением, ускорением и манёвром (их суммы по
+корзинам равны показателям анализа). Корзины 10 и 60 с собираются из
+секундных. Каждое разрешение хранится как массив записей TRACK_DTYPE
+(little-endian); пустые корзины (паузы в метках времени) не хранятся,
+`bucket` — номер корзины от первого отсчёта.
+
+Живая поездка сохраняет состояние после каждой части, поэтому
+завершённые секундные корзины забираются из него через
+`TrackBuilder.flush` и возвращаются в `build`.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+TRACK_RESOLUTIONS = (1, 10, 60)          # секунды; первое — базовое
+TRACK_CHANNELS = ('speed_kmh', 'jerk', 'acc_mag', 'gyro_mag')
+TRACK_EVENTS = ('hard_brakes', 'hard_accels', 'sharp_turns')
+
+TRACK_DTYPE = np.dtype(
+    [('bucket', '<u4')]
+    + [
+        (f'{channel}_{stat}', '<f4')
+        for channel in TRACK_CHANNELS for stat in ('min', 'max', 'mean')
+    ]
+    + [(event, '<u2') for event in TRACK_EVENTS]
+)
+
+# завершённые секундные корзины до прореживания (см. TrackBuilder.flush)
+_AGG_DTYPE = np.dtype(
+    [('bucket', '<i8')]
+    + [
+        (f'{channel}_{stat}', '<f8')
+        for channel in TRACK_CHANNELS for stat in ('min', 'max', 'sum')
+    ]
+    + [(f'{channel}_n', '<i4') for channel in TRACK_CHANNELS]
+    + [(event, '<i4') for event in TRACK_EVENTS]
+)
+
+# частей до склейки: состояние живой поездки сохраняется после каждой
+_MAX_PARTS = 32
+
+# время копится в целых микросекундах: номер корзины не зависит от того,
+# какими частями пришли отсчёты
+_US = 10**6
+
+
+def _runs(bucket: np.ndarray) -> np.ndarray:
+    """Начала участков с одинаковым номером корзины."""
+    return np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+
+
+def _coarsen(agg: dict, factor: int) -> dict:
+    """Объединение корзин (номера не убывают) в корзины по `factor`."""
+    bucket = agg['bucket'] // factor
+    starts = _runs(bucket)
+    out = {'bucket': bucket[starts]}
+    for key, values in agg.items():
+        if key == 'bucket':
+            continue
+        if key.endswith('_min'):
+            ufunc = np.fmin
+        elif key.endswith('_max'):
+            ufunc = np.fmax
+        else:
+            ufunc = np.add
+        out[key] = ufunc.reduceat(values, starts)
+    return out
+
+
+def _merge(parts: list[dict]) -> list[dict]:
+    if len(parts) <= 1:
+        return parts
+    # корзина на границе частей склеивается
+    return [_coarsen({
+        key: np.concatenate([part[key] for part in parts])
+        for key in parts[0]
+    }, 1)]
+
+
+class TrackBuilder:
+    """Секундные корзины по мере поступления отсчётов."""
+
+    def __init__(self) -> None:
+        self._parts: list[dict] = []
+        self._elapsed_us: int | None = None
+
+    def push(self, delta: np.ndarray, channels, events) -> None:
+        """Очередные отсчёты.
+
+        `delta` — секунды от предыдущего отсчёта (для первого отсчёта
+        поездки не учитывается, отрицательные — как 0), `channels` и
+        `events` — массивы по TRACK_CHANNELS и TRACK_EVENTS. Нечисловые
+        значения каналов (NaN, inf) не учитываются.
+        """
+        if not len(delta):
+            return
+        steps = np.rint(np.maximum(delta, 0.0) * _US).astype(np.int64)
+        if self._elapsed_us is None:
+            steps[0] = 0
+            self._elapsed_us = 0
+        elapsed = self._elapsed_us + np.cumsum(steps)
+        self._elapsed_us = int(elapsed[-1])
+        bucket = elapsed // _US
+        starts = _runs(bucket)
+        part = {'bucket': bucket[starts]}
+        for name in TRACK_CHANNELS:
+            values = np.asarray(channels[name], dtype=np.float64)
+            ok = np.isfinite(values)
+            masked = np.where(ok, values, np.nan)
+            part[f'{name}_min'] = np.fmin.reduceat(masked, starts)
+            part[f'{name}_max'] = np.fmax.reduceat(masked, starts)
+            part[f'{name}_sum'] = np.add.reduceat(
+                np.where(ok, values, 0.0), starts
+            )
+            part[f'{name}_n'] = np.add.reduceat(ok.astype(np.int32), starts)
+        for name in TRACK_EVENTS:
+            part[name] = np.add.reduceat(
+                np.asarray(events[name], dtype=np.int32), starts
+            )
+        self._parts.append(part)
+        if len(self._parts) > _MAX_PARTS:
+            self._compact()
+
+    def _compact(self) -> None:
+        self._parts = _merge(self._parts)
+
+    def __getstate__(self):
+        self._compact()
+        return self.__dict__
+
+    def flush(self) -> bytes:
+        """Завершённые корзины (все, кроме последней) для `build`.
+
+        В состоянии остаётся только последняя корзина: её могут
+        дополнить следующие отсчёты.
+        """
+        self._compact()
+        if not self._parts:
+            return b''
+        agg = self._parts[0]
+        done = len(agg['bucket']) - 1
+        if done <= 0:
+            return b''
+        records = np.empty(done, dtype=_AGG_DTYPE)
+        for key, values in agg.items():
+            records[key] = values[:done]
+        self._parts = [{key: values[done:] for key, values in agg.items()}]
+        return records.tobytes()
+
+    def build(self, flushed: bytes = b'') -> dict[int, bytes]:
+        """Записи TRACK_DTYPE по каждому разрешению из TRACK_RESOLUTIONS.
+
+        `flushed` — склеенные результаты `flush` в порядке вызовов.
+        """
+        parts = self._parts
+        if flushed:
+            records = np.frombuffer(flushed, dtype=_AGG_DTYPE)
+            parts = [
+                {key: records[key] for key in _AGG_DTYPE.names}
+            ] + parts
+        parts = _merge(parts)
+        if not parts:
+            return {}
+        return {
+            resolution: _encode(_coarsen(parts[0], resolution))
+            for resolution in TRACK_RESOLUTIONS
+        }
+
+
+def _encode(agg: dict) -> bytes:
+    records = np.empty(len(agg['bucket']), dtype=TRACK_DTYPE)
+    records['bucket'] = agg['bucket']
+    for name in TRACK_CHANNELS:
+        records[f'{name}_min'] = agg[f'{name}_min']
+        records[f'{name}_max'] = agg[f'{name}_max']
+        n = agg[f'{name}_n']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            records[f'{name}_mean'] = np.where(
+                n > 0, agg[f'{name}_sum'] / n, np.nan
+            )
+    for name in TRACK_EVENTS:
+        records[name] = np.minimum(agg[name], np.iinfo('<u2').max)
+    return records.tobytes()
+
+
+def decode_track(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=TRACK_DTYPE)
+
+
+def _floats(values: np.ndarray) -> list:
+    # NaN не допускается в строгом JSON
+    return [None if value != value else value for value in values.tolist()]
+
+
+def track_columns(records: np.ndarray, resolution: int) -> dict:
+    """Ряд по колонкам для JSON: время начала корзины в секундах от
+    первого отсчёта, min/max/mean по каналам и число событий.
+    """
+    columns = {
+        'resolution': resolution,
+        'time': (records['bucket'].astype(np.int64) * resolution).tolist(),
+    }
+    for name in TRACK_CHANNELS:
+        columns[name] = {
+            stat: _floats(records[f'{name}_{stat}'])
+            for stat in ('min', 'max', 'mean')
+        }
+    columns['events'] = {
+        name: records[name].tolist() for name in TRACK_EVENTS
+    }
+    return columns
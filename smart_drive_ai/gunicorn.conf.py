@@ -0,0 +1,38 @@
+"""Конфигурация gunicorn (подхватывается из рабочей директории)."""
+
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+if os.getenv('ASGI_MODE', 'False') == 'True':
+    # один воркер держит много медленных загрузок одновременно
+    wsgi_app = 'smart_drive_ai.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'smart_drive_ai.wsgi:application'
+    # >1 — gthread-воркер: запросы процесса идут параллельно
+    threads = int(os.getenv('GUNICORN_THREADS', '1'))
+preload_models = os.getenv('PRELOAD_MODELS', 'True') == 'True'
+feature_pool_size = int(os.getenv('FEATURE_POOL_SIZE', '0'))
+feature_task_timeout = float(os.getenv('FEATURE_TASK_TIMEOUT', '300'))
+
+
+def post_fork(server, worker):
+    """Загрузка моделей и запуск пула расчёта признаков до первого запроса."""
+    if preload_models:
+        from data_processing.model_registry import preload_models as preload
+        preload()
+        server.log.info('Worker %s: models preloaded', worker.pid)
+    if feature_pool_size > 0:
+        from data_processing.feature_pool import get_executor
+        get_executor(feature_pool_size, feature_task_timeout).warm()
+        server.log.info(
+            'Worker %s: feature pool started (%s processes)',
+            worker.pid, feature_pool_size,
+        )
+
+
+def worker_exit(server, worker):
+    """Остановка пула расчёта признаков вместе с воркером."""
+    from data_processing.feature_pool import shutdown_executor
+    shutdown_executor()
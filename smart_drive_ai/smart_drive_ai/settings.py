@@ -47,6 +47,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'trips.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'smart_drive_ai.urls'
@@ -68,6 +69,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'smart_drive_ai.wsgi.application'
 
+# Запуск под ASGI (uvicorn): загрузка, список поездок и профиль
+# обслуживаются асинхронными представлениями
+ASGI_MODE = os.getenv('ASGI_MODE', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -79,16 +84,39 @@ WSGI_APPLICATION = 'smart_drive_ai.wsgi.application'
 #     }
 # }
 
+# Соединения с PostgreSQL:
+# 'none' — новое соединение на каждый запрос;
+# 'persistent' — соединение потока живёт DB_CONN_MAX_AGE секунд и
+#   проверяется перед запросом (для WSGI);
+# 'pool' — пул psycopg на процесс (для ASGI, где у каждого запроса свой
+#   поток). Всего соединений: воркеры gunicorn × DB_POOL_MAX_SIZE.
+DB_CONNECTION_MODE = os.getenv('DB_CONNECTION_MODE') or (
+    'pool' if ASGI_MODE else 'persistent'
+)
+
 DATABASES = {
     'default': {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        # бэкенд postgresql с метриками получения соединения
+        "ENGINE": "trips.backends.postgresql",
         "NAME": os.getenv("POSTGRES_DB", 'postgres'),
         "HOST": os.getenv("POSTGRES_HOST", ''),
         "PORT": os.getenv("POSTGRES_PORT", 5432),
         "USER": os.getenv("POSTGRES_USER", 'postgres'),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", ''),
+        "CONN_HEALTH_CHECKS": DB_CONNECTION_MODE != 'none',
+        "OPTIONS": {},
     }
 }
+if DB_CONNECTION_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('DB_CONN_MAX_AGE', 600)
+    )
+elif DB_CONNECTION_MODE == 'pool':
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    }
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,6 +158,13 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Стандартные обработчики загрузки, которые заодно считают SHA-256
+# файла по мере приёма (повторные загрузки поездок, trips.uploads)
+FILE_UPLOAD_HANDLERS = [
+    'trips.uploads.HashingMemoryFileUploadHandler',
+    'trips.uploads.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -137,6 +172,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'trips.User'
 
+# Кэш ответов профиля и деталей поездки. Файловый бэкенд общий для
+# воркеров gunicorn и очереди, которые сбрасывают его после обработки.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', BASE_DIR / 'cache'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 24 * 60 * 60)),
+    }
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -150,6 +198,70 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Обработка загруженных поездок: 'sync' — в запросе,
+# 'queue' — через очередь в БД (manage.py process_trips)
+TRIP_PROCESSING_MODE = os.getenv('TRIP_PROCESSING_MODE', 'sync')
+TRIP_JOB_MAX_ATTEMPTS = int(os.getenv('TRIP_JOB_MAX_ATTEMPTS', 3))
+# Поездка без задачи в очереди, обрабатываемая дольше (секунды), считается
+# прерванной: повтор загрузки запускает обработку заново
+TRIP_PROCESSING_LEASE = float(os.getenv('TRIP_PROCESSING_LEASE', 900))
+
+# Файлы датчиков больше порога обрабатываются потоково, по частям
+FEATURE_STREAMING_MIN_BYTES = int(
+    os.getenv('FEATURE_STREAMING_MIN_BYTES', 50 * 1024 * 1024)
+)
+FEATURE_STREAMING_CHUNKSIZE = int(
+    os.getenv('FEATURE_STREAMING_CHUNKSIZE', 100_000)
+)
+
+# Сжатие CSV с датчиков при сохранении: gzip или none. Со сжатием
+# ссылка sensor_data_file в ответах API ведёт на файл .csv.gz
+SENSOR_DATA_COMPRESSION = os.getenv('SENSOR_DATA_COMPRESSION', 'none')
+SENSOR_DATA_COMPRESSION_LEVEL = int(
+    os.getenv('SENSOR_DATA_COMPRESSION_LEVEL', 6)
+)
+
+# Пул процессов для расчёта признаков (0 — расчёт в текущем процессе)
+FEATURE_POOL_SIZE = int(os.getenv('FEATURE_POOL_SIZE', 0))
+FEATURE_TASK_TIMEOUT = float(os.getenv('FEATURE_TASK_TIMEOUT', 300))
+
+# Потоков в синхронном воркере gunicorn (>1 — gthread-воркер)
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 1))
+
+# Классификация с микробатчингом: параллельные запросы процесса
+# собираются в одну пачку (до размера или таймаута в мс). Работает только
+# под ASGI или в gthread-воркерах: в синхронном воркере запрос в процессе
+# один, и пачка лишь добавляет ожидание
+INFERENCE_BATCHING = (
+    os.getenv('INFERENCE_BATCHING', 'False') == 'True'
+    and (ASGI_MODE or GUNICORN_THREADS > 1)
+)
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 64))
+INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', 5))
+
+# Токен доступа к метрикам (X-Metrics-Token или Authorization: Bearer);
+# пусто — выключено
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Сэмплирующий профилировщик запросов по заголовку X-Profile
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', 5))
+PROFILE_DIR = os.getenv('PROFILE_DIR') or BASE_DIR / 'profiles'
+
+# Пакетная загрузка поездок (upload/batch/)
+TRIP_BATCH_MAX_FILES = int(os.getenv('TRIP_BATCH_MAX_FILES', 100))
+TRIP_BATCH_WORKERS = int(os.getenv('TRIP_BATCH_WORKERS', 4))
+
+# Передача поездки частями во время езды (trips/live/): отсчётов
+# в одной части; сессия без частей дольше таймаута завершается
+# командой finish_live_trips
+LIVE_TRIP_MAX_ROWS = int(os.getenv('LIVE_TRIP_MAX_ROWS', 5000))
+LIVE_TRIP_IDLE_MINUTES = float(os.getenv('LIVE_TRIP_IDLE_MINUTES', 30))
+
+# Размер страницы списка поездок (курсорная пагинация)
+TRIP_PAGE_SIZE = int(os.getenv('TRIP_PAGE_SIZE', 20))
+TRIP_MAX_PAGE_SIZE = int(os.getenv('TRIP_MAX_PAGE_SIZE', 100))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Smart Drive AI API',
     'VERSION': '1.0.0',
@@ -0,0 +1,126 @@
+"""
+Асинхронные представления для запуска под ASGI (ASGI_MODE).
+
+Под ASGI тело запроса принимается сервером асинхронно, поэтому
+медленная загрузка с телефона не занимает поток. Синхронные части
+(аутентификация, разбор multipart, постраничная выборка) выполняются
+в потоке запроса, сохранение и обработка поездки — в общем пуле потоков
+(расчёт признаков оттуда уходит в пул процессов при FEATURE_POOL_SIZE > 0).
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404
+from rest_framework import permissions
+from rest_framework.generics import ListAPIView
+from rest_framework.response import Response
+
+from .cache import aget_or_build, cached_response, profile_key
+from .metrics import stage
+from .models import UserDrivingProfile
+from .pagination import TripCursorPagination
+from .serializers import TripListSerializer
+from .views import (
+    TripUploadAPIView, UserDrivingProfileAPIView, trip_list_queryset,
+    upload_status,
+)
+
+
+def _in_worker(fn, *args, **kwargs):
+    """Вызов в потоке пула: со своим соединением с БД."""
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+class AsyncAPIView:
+    """Примесь к APIView: `dispatch` и обработчики — корутины.
+
+    Повторяет APIView.dispatch; `initial` (аутентификация, права,
+    ограничения) может обращаться к БД и выполняется через sync_to_async.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+
+class AsyncTripUploadAPIView(AsyncAPIView, TripUploadAPIView):
+    """Загрузка телеметрических данных поездки (ASGI)."""
+
+    async def post(self, request, *args, **kwargs):
+        with stage('upload', count_queries=False):
+            # тело уже принято сервером; разбор и проверка файла — в потоке
+            serializer = self.get_serializer(
+                data=await sync_to_async(lambda: request.data)()
+            )
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+            # создание и обработка — как в синхронном представлении
+            await sync_to_async(_in_worker, thread_sensitive=False)(
+                self.perform_create, serializer
+            )
+        return Response(serializer.data, status=upload_status(
+            serializer.instance.status, self.created
+        ))
+
+
+class AsyncTripListAPIView(AsyncAPIView, ListAPIView):
+    """Список поездок пользователя с фильтрами (ASGI)."""
+
+    serializer_class = TripListSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = TripCursorPagination
+
+    def get_queryset(self):
+        return trip_list_queryset(self.request)
+
+    async def get(self, request, *args, **kwargs):
+        page = await sync_to_async(self.paginate_queryset)(
+            self.get_queryset()
+        )
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+
+
+class AsyncUserDrivingProfileAPIView(AsyncAPIView, UserDrivingProfileAPIView):
+    """Получение агрегированных показателей (ASGI)."""
+
+    async def get(self, request, *args, **kwargs):
+        async def build():
+            try:
+                profile = await UserDrivingProfile.objects.aget(
+                    user_id=request.user.id
+                )
+            except UserDrivingProfile.DoesNotExist:
+                raise Http404
+            return self.get_serializer(profile).data
+
+        entry = await aget_or_build(profile_key(request.user.id), build)
+        return cached_response(request, entry)
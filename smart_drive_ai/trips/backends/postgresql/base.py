@@ -0,0 +1,25 @@
+"""
+Бэкенд PostgreSQL с замером получения соединения.
+
+Время `get_new_connection` попадает в `trip_db_connection_acquire_seconds`:
+без пула это установка соединения (метка mode="connect"), с пулом
+(OPTIONS['pool']) — ожидание соединения из пула (mode="pool").
+"""
+
+import time
+
+from django.db.backends.postgresql import base
+
+from trips.metrics import DB_ACQUIRE_SECONDS
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        DB_ACQUIRE_SECONDS.observe(
+            time.perf_counter() - started,
+            mode='pool' if self.pool else 'connect',
+        )
+        return connection
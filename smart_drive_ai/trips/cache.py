@@ -0,0 +1,124 @@
+"""Кэш ответов профиля и деталей поездки по пользователю.
+
+Данные меняются только при обработке поездки, поэтому ответы хранятся
+в кэше до явной инвалидации из конвейера обработки. Запись кэша —
+словарь с данными ответа, ETag и временем формирования.
+
+У каждого ключа есть версия (`version:<ключ>`), и запись хранится под
+`<ключ>:<версия>`. Инвалидация увеличивает версию, а не удаляет запись:
+запрос, который прочитал версию и данные до коммита обработки, запишет
+устаревший ответ под старой версией, и его больше никто не прочитает.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def profile_key(user_id):
+    return f'profile:{user_id}'
+
+
+def trip_key(user_id, trip_id):
+    return f'trip:{user_id}:{trip_id}'
+
+
+def _etag(data):
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return f'"{hashlib.md5(payload, usedforsecurity=False).hexdigest()}"'
+
+
+def _entry(data):
+    return {
+        'data': data,
+        'etag': _etag(data),
+        'last_modified': int(timezone.now().timestamp()),
+    }
+
+
+def _version_key(key):
+    return f'version:{key}'
+
+
+def _new_version():
+    # после вытеснения ключа версии новая не совпадёт с прежними
+    return time.time_ns()
+
+
+def _versioned(key):
+    """Ключ записи текущей версии; версия читается до построения данных."""
+    version_key = _version_key(key)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, _new_version(), timeout=None)
+        version = cache.get(version_key, _new_version())
+    return f'{key}:{version}'
+
+
+async def _aversioned(key):
+    version_key = _version_key(key)
+    version = await cache.aget(version_key)
+    if version is None:
+        await cache.aadd(version_key, _new_version(), timeout=None)
+        version = await cache.aget(version_key, _new_version())
+    return f'{key}:{version}'
+
+
+def get_or_build(key, build):
+    """Запись кэша по ключу; при промахе данные строит `build()`."""
+    key = _versioned(key)
+    entry = cache.get(key)
+    if entry is None:
+        entry = _entry(build())
+        cache.set(key, entry)
+    return entry
+
+
+async def aget_or_build(key, build):
+    """Асинхронный `get_or_build`: `build` — корутина."""
+    key = await _aversioned(key)
+    entry = await cache.aget(key)
+    if entry is None:
+        entry = _entry(await build())
+        await cache.aset(key, entry)
+    return entry
+
+
+def cached_response(request, entry):
+    """Ответ с ETag/Last-Modified; 304, если клиент уже видел эту версию."""
+    response = Response(entry['data'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    # ответ зависит от пользователя — промежуточным кэшам его не хранить
+    response['Cache-Control'] = 'private, no-cache'
+    return get_conditional_response(
+        request,
+        etag=entry['etag'],
+        last_modified=entry['last_modified'],
+        response=response,
+    )
+
+
+def invalidate_user(user_id, trip_ids=()):
+    """Сброс кэша профиля и деталей поездок пользователя.
+
+    Выполняется после коммита транзакции, чтобы параллельный запрос
+    не закэшировал данные, которые ещё не видны.
+    """
+    keys = [profile_key(user_id)]
+    keys += [trip_key(user_id, trip_id) for trip_id in trip_ids]
+    transaction.on_commit(lambda: _bump_versions(keys))
+
+
+def _bump_versions(keys):
+    for key in keys:
+        try:
+            cache.incr(_version_key(key))
+        except ValueError:
+            cache.set(_version_key(key), _new_version(), timeout=None)
@@ -0,0 +1,202 @@
+"""
+Приём телеметрии во время поездки.
+
+Приложение открывает сессию и присылает отсчёты частями с номерами
+`seq` = 0, 1, 2, ... Каждая часть под блокировкой строки сессии:
+
+- дописывается в файл датчиков отдельным членом gzip (или строками CSV
+  без сжатия) — файл читается так же, как загруженный целиком, и
+  поездку можно переобработать;
+- проходит через `LiveTripFeatures`, состояние которого сохраняется
+  в сессии; завершённые корзины ряда для графиков дописываются в файл
+  рядом с файлом датчиков, чтобы состояние не росло с длиной поездки.
+
+Повтор уже принятой части ничего не меняет, пропуск номера отклоняется.
+Перед записью файлы обрезаются до сохранённого в сессии размера: если
+транзакция прошлой попытки откатилась, её строки не задвоятся.
+При завершении поездка создаётся сразу с анализом — файл заново не
+читается.
+"""
+
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from data_processing.extract_features_single_trip import SENSOR_COLS
+from data_processing.streaming_features import LiveTripFeatures
+from data_processing.telemetry_io import GZIP_SUFFIX, compress_part
+from .cache import invalidate_user
+from .metrics import observe_samples
+from .models import (
+    STATUS_FAILED, LiveTripSession, Trip, sensor_data_path
+)
+from .services import TRIP_RESULT_FIELDS, save_trip_analysis
+
+
+logger = logging.getLogger(__name__)
+
+# завершённые сессии хранятся для ответа на повтор завершения
+FINISHED_RETENTION = timedelta(days=1)
+
+
+class LiveTripError(Exception):
+    """Часть или завершение не согласуются с состоянием сессии."""
+
+
+def _storage():
+    return Trip._meta.get_field('sensor_data_file').storage
+
+
+def start_session(user_id, start_date_time):
+    """Новая сессия и имя её файла датчиков."""
+    session = LiveTripSession(
+        user_id=user_id, start_date_time=start_date_time
+    )
+    name = f'live_{uuid.uuid4().hex}.csv'
+    if _storage().should_compress(name):
+        name = f'{name}{GZIP_SUFFIX}'
+    session.sensor_data_file = sensor_data_path(session, name)
+    session.save()
+    return session
+
+
+def _track_name(session):
+    return f'{session.sensor_data_file}.track'
+
+
+def _write(name, size, data):
+    """Запись `data` в файл хранилища после первых `size` байт."""
+    path = _storage().path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as output:
+        output.truncate(size)
+        output.write(data)
+    return size + len(data)
+
+
+def _append(session, frame, columns):
+    data = frame.to_csv(
+        index=False, header=session.file_size == 0, columns=columns
+    ).encode()
+    if session.sensor_data_file.endswith(GZIP_SUFFIX):
+        data = compress_part(data, _storage().compression_level)
+    return _write(session.sensor_data_file, session.file_size, data)
+
+
+def push_samples(session, seq, frame):
+    """Приём части `seq`; сессия заблокирована через select_for_update.
+
+    Возвращает False, если часть уже была принята.
+    """
+    if session.trip_id is not None:
+        raise LiveTripError('Поездка уже завершена.')
+    if seq < session.next_seq:
+        return False
+    if seq > session.next_seq:
+        raise LiveTripError(f'Ожидается часть {session.next_seq}.')
+
+    features = session.get_features()
+    with_timestamps = 'timestamp' in frame.columns
+    if features is None:
+        features = LiveTripFeatures(with_timestamps)
+    elif features.with_timestamps != with_timestamps:
+        raise ValueError(
+            'Колонка timestamp должна быть во всех частях или ни в одной.'
+        )
+    features.push(frame)
+
+    columns = list(SENSOR_COLS)
+    if with_timestamps:
+        columns.insert(0, 'timestamp')
+    session.file_size = _append(session, frame, columns)
+    session.track_size = _write(
+        _track_name(session), session.track_size, features.flush_track()
+    )
+    session.set_features(features)
+    session.next_seq += 1
+    session.save()
+    return True
+
+
+def finish_session(session, end_date_time):
+    """Поездка с анализом по накопленным признакам.
+
+    Если после обрезки краёв не осталось строк, поездка сохраняется
+    со статусом `failed`, как при загрузке некорректного файла.
+    """
+    if session.trip_id is not None:
+        return session.trip
+    features = session.get_features()
+    if features is None:
+        raise LiveTripError('Не передано ни одной части.')
+
+    trip = Trip.objects.create(
+        user_id=session.user_id,
+        start_date_time=session.start_date_time,
+        end_date_time=end_date_time,
+        sensor_data_file=session.sensor_data_file,
+    )
+    track = b''
+    if session.track_size:
+        with _storage().open(_track_name(session)) as source:
+            track = source.read(session.track_size)
+    try:
+        stats, user_stats = features.finalize(
+            session.sensor_data_file, track
+        )
+    except ValueError as error:
+        trip.status = STATUS_FAILED
+        trip.processing_error = str(error)
+        trip.save(update_fields=TRIP_RESULT_FIELDS)
+        invalidate_user(trip.user_id, [trip.pk])
+    else:
+        observe_samples(stats)
+        save_trip_analysis(trip, stats, user_stats)
+
+    session.trip = trip
+    session.set_features(None)
+    session.save(update_fields=('trip', 'state', 'updated_at'))
+    # ряд уже в TripTrack; файл нужен, пока транзакция может откатиться
+    name = _track_name(session)
+    transaction.on_commit(lambda: _storage().delete(name))
+    return trip
+
+
+def finish_idle_sessions(idle):
+    """Завершение сессий без новых частей дольше `idle`.
+
+    Время окончания — время последней части. Сессии без данных и
+    завершённые старше FINISHED_RETENTION удаляются. Возвращает число
+    завершённых поездок.
+    """
+    now = timezone.now()
+    LiveTripSession.objects.filter(
+        trip__isnull=False, updated_at__lt=now - FINISHED_RETENTION
+    ).delete()
+
+    finished = 0
+    idle_ids = list(LiveTripSession.objects.filter(
+        trip__isnull=True, updated_at__lt=now - idle
+    ).values_list('id', flat=True))
+    for session_id in idle_ids:
+        with transaction.atomic():
+            session = LiveTripSession.objects.select_for_update(
+                skip_locked=True
+            ).filter(pk=session_id, trip__isnull=True).first()
+            if session is None:
+                continue
+            if session.next_seq == 0:
+                session.delete()
+                continue
+            try:
+                with transaction.atomic():
+                    finish_session(session, session.updated_at)
+            except Exception:
+                logger.exception('Live trip %s finishing failed', session.pk)
+            else:
+                finished += 1
+    return finished
@@ -0,0 +1,324 @@
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from data_processing.classify_trip import classify_trip
+from data_processing.dsi_algorithm import (
+    Trip as DSITrip, TripClass, compute_driver_style
+)
+from data_processing.dsi_batch import compute_driver_styles
+from data_processing.extract_features_single_trip import (
+    extract_trip_features, trim_instability
+)
+from data_processing.feature_pool import extract_features_file
+from data_processing.model_registry import DEFAULT_MODEL_PATH, get_model
+from data_processing.synthetic import write_trip_csv
+from trips.models import DrivingStyle, Trip, TripAnalysis, User
+from trips.services import (
+    CATEGORIES, analysis_values, apply_trip_to_profile, rebuild_user_profile
+)
+
+
+SCHEMA_VERSION = 1
+
+
+def _measure(fn, repeat, per=1):
+    """Время вызова `fn` (с), `repeat` повторов; `per` — делитель на объект."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) / per)
+    return {
+        'median': statistics.median(runs),
+        'min': min(runs),
+        'mean': statistics.fmean(runs),
+        'runs': runs,
+    }
+
+
+def _version(package):
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'), capture_output=True, text=True,
+            check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк обработки поездок по этапам на синтетических данных. '
+        'Результат — JSON; при --baseline регрессии сравниваются '
+        'с сохранённым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--durations', type=int, nargs='+', default=[60, 600, 3600, 10800],
+            help='Длительности поездок (с): от минуты до трёх часов.'
+        )
+        parser.add_argument(
+            '--rates', type=float, nargs='+', default=[1.0, 10.0],
+            help='Частоты дискретизации (Гц).'
+        )
+        parser.add_argument(
+            '--dsi-sizes', type=int, nargs='+',
+            default=[10, 100, 1000, 10_000, 100_000],
+            help='Число оценок поездок для расчёта DSI.'
+        )
+        parser.add_argument(
+            '--db-trips', type=int, default=100,
+            help='Число поездок для этапов записи в БД (0 — пропустить).'
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл для JSON (по умолчанию — stdout).'
+        )
+        parser.add_argument(
+            '--baseline', default=None,
+            help='JSON предыдущего прогона для сравнения.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимое замедление медианы (доля), иначе — регрессия.'
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой при найденных регрессиях.'
+        )
+
+    def _log(self, message):
+        self.stderr.write(message, style_func=lambda text: text)
+
+    def _record(self, results, key, measurement, **params):
+        results[key] = {**measurement, 'params': params}
+        self._log(f'{key:<48} {measurement["median"] * 1e3:10.3f} мс')
+
+    def _trip_stages(self, results, durations, rates, repeat, seed, workdir):
+        features = []
+        streaming_min_bytes = settings.FEATURE_STREAMING_MIN_BYTES
+        for rate in rates:
+            for duration in durations:
+                path = write_trip_csv(
+                    Path(workdir) / f'trip_{duration}s_{rate:g}hz.csv',
+                    duration, rate, seed,
+                )
+                case = f'{duration}s@{rate:g}hz'
+                params = {
+                    'duration_s': duration, 'rate_hz': rate,
+                    'rows': int(duration * rate),
+                    'bytes': path.stat().st_size,
+                }
+                df = pd.read_csv(path)
+                self._record(
+                    results, f'csv_parse/{case}',
+                    _measure(lambda: pd.read_csv(path), repeat), **params
+                )
+                self._record(
+                    results, f'trim_instability/{case}',
+                    _measure(lambda: trim_instability(df), repeat), **params
+                )
+                self._record(
+                    results, f'feature_extraction/{case}',
+                    _measure(lambda: extract_trip_features(df), repeat),
+                    **params
+                )
+                self._record(
+                    results, f'end_to_end/{case}',
+                    _measure(lambda: extract_features_file(
+                        str(path),
+                        streaming_min_bytes=streaming_min_bytes,
+                        chunksize=settings.FEATURE_STREAMING_CHUNKSIZE,
+                    ), repeat),
+                    **params
+                )
+                features.append(extract_trip_features(df))
+
+        get_model(DEFAULT_MODEL_PATH)   # загрузка модели не входит в замер
+        self._record(
+            results, 'classify_trip',
+            _measure(
+                lambda: [classify_trip(stats) for stats, _ in features],
+                repeat, per=len(features),
+            ),
+            model=str(DEFAULT_MODEL_PATH),
+        )
+        return features
+
+    def _db_stages(self, results, features, n_trips, repeat):
+        now = timezone.now()
+
+        def write_trips(user):
+            rows = []
+            for i in range(n_trips):
+                stats, user_stats = features[i % len(features)]
+                trip = Trip.objects.create(
+                    user=user, start_date_time=now, end_date_time=now,
+                    sensor_data_file='sensor_data/benchmark.csv',
+                )
+                analysis = TripAnalysis.objects.create(
+                    trip=trip, **analysis_values(stats, user_stats)
+                )
+                style = DrivingStyle(
+                    analysis=analysis,
+                    category=CATEGORIES[classify_trip(stats)],
+                    timestamp=now - datetime.timedelta(days=i % 300),
+                )
+                style.add_recommendations(save=False)
+                style.save()
+                rows.append((analysis, style))
+            return rows
+
+        writes, updates, rebuilds = [], [], []
+        for _ in range(repeat):
+            # всё в откатываемой транзакции: база не меняется
+            with transaction.atomic():
+                user = User.objects.create(email='benchmark@example.invalid')
+                started = time.perf_counter()
+                rows = write_trips(user)
+                writes.append((time.perf_counter() - started) / n_trips)
+                started = time.perf_counter()
+                for analysis, style in rows:
+                    apply_trip_to_profile(user, analysis, style)
+                updates.append((time.perf_counter() - started) / n_trips)
+                started = time.perf_counter()
+                rebuild_user_profile(user, save=False)
+                rebuilds.append(time.perf_counter() - started)
+                transaction.set_rollback(True)
+
+        def summary(runs):
+            return {
+                'median': statistics.median(runs), 'min': min(runs),
+                'mean': statistics.fmean(runs), 'runs': runs,
+            }
+
+        self._record(
+            results, 'db_writes_per_trip', summary(writes), trips=n_trips
+        )
+        self._record(
+            results, 'profile_update_per_trip', summary(updates),
+            trips=n_trips,
+        )
+        self._record(
+            results, 'profile_rebuild', summary(rebuilds), trips=n_trips
+        )
+
+    def _dsi_stages(self, results, sizes, repeat, seed):
+        rng = np.random.default_rng(seed)
+        now = datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc)
+        for size in sizes:
+            ages = rng.uniform(0, 400, size)
+            timestamps = [
+                now - datetime.timedelta(days=float(age)) for age in ages
+            ]
+            codes = rng.integers(0, 3, size)
+            trips = [
+                DSITrip(ts, TripClass(int(code)))
+                for ts, code in zip(timestamps, codes)
+            ]
+            self._record(
+                results, f'compute_driver_style/{size}',
+                _measure(
+                    lambda: compute_driver_style(trips, now=now), repeat
+                ),
+                trips=size,
+            )
+            users = rng.integers(0, max(size // 50, 1), size)
+            self._record(
+                results, f'compute_driver_styles_batch/{size}',
+                _measure(
+                    lambda: compute_driver_styles(
+                        users, timestamps, codes, now=now
+                    ),
+                    repeat,
+                ),
+                trips=size, users=int(len(np.unique(users))),
+            )
+
+    def _compare(self, results, baseline, threshold):
+        regressions = []
+        for key, current in results.items():
+            previous = baseline.get('results', {}).get(key)
+            if not previous or not previous['median']:
+                continue
+            ratio = current['median'] / previous['median']
+            current['baseline_ratio'] = ratio
+            if ratio > 1 + threshold:
+                regressions.append(key)
+                self._log(f'РЕГРЕССИЯ {key}: x{ratio:.2f}')
+            elif ratio < 1 - threshold:
+                self._log(f'ускорение {key}: x{ratio:.2f}')
+        return regressions
+
+    def handle(self, *args, durations, rates, dsi_sizes, db_trips, repeat,
+               seed, output, baseline, threshold, fail_on_regression,
+               **options):
+        results = {}
+        with tempfile.TemporaryDirectory(prefix='benchmark-') as workdir:
+            features = self._trip_stages(
+                results, durations, rates, repeat, seed, workdir
+            )
+        if db_trips > 0:
+            self._db_stages(results, features, db_trips, repeat)
+        self._dsi_stages(results, dsi_sizes, repeat, seed)
+
+        report = {
+            'schema_version': SCHEMA_VERSION,
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'git_commit': _git_commit(),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'packages': {
+                    name: _version(name)
+                    for name in ('numpy', 'pandas', 'scikit-learn', 'Django')
+                },
+                'model': str(DEFAULT_MODEL_PATH),
+                'repeat': repeat,
+                'seed': seed,
+            },
+            'results': results,
+        }
+
+        regressions = []
+        if baseline:
+            regressions = self._compare(
+                results, json.loads(Path(baseline).read_text()), threshold
+            )
+            report['regressions'] = regressions
+
+        payload = json.dumps(report, indent=2, ensure_ascii=False)
+        if output:
+            Path(output).write_text(payload)
+        else:
+            self.stdout.write(payload)
+
+        if regressions and fail_on_regression:
+            raise CommandError(f'Регрессии: {", ".join(regressions)}')
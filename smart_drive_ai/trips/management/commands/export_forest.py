@@ -0,0 +1,128 @@
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from data_processing.classify_trip import FEATURE_COLS
+from data_processing.extract_features_single_trip import (
+    FEATURE_EXTRACTOR_VERSION
+)
+from data_processing.forest_predictor import ForestPredictor, export_forest
+from trips.models import TripAnalysis
+
+
+def _rejects(model, X):
+    try:
+        model.predict_proba(X)
+    except ValueError:
+        return True
+    return False
+
+
+def _latency(model, X, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        model.predict_proba(X)
+    return (time.perf_counter() - started) / repeat
+
+
+class Command(BaseCommand):
+    help = (
+        'Компиляция sklearn-модели (.joblib) в массивы узлов (.npz) для '
+        'предсказания без scikit-learn, со сверкой результатов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', default='data_processing/rf_v1.joblib',
+            help='Исходный Pipeline(StandardScaler, RandomForestClassifier).'
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл результата (по умолчанию — рядом с моделью, .npz).'
+        )
+        parser.add_argument(
+            '--recorded', type=int, default=100_000,
+            help='Сколько сохранённых векторов признаков поездок сверить.'
+        )
+        parser.add_argument(
+            '--synthetic', type=int, default=10_000,
+            help='Сколько случайных векторов признаков сверить.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=1e-9,
+            help='Допустимое расхождение вероятностей.'
+        )
+
+    def _recorded_vectors(self, limit):
+        vectors = TripAnalysis.objects.filter(
+            feature_version=FEATURE_EXTRACTOR_VERSION
+        ).values_list('feature_vector', flat=True)[:limit]
+        return np.frombuffer(
+            b''.join(bytes(vector) for vector in vectors), dtype='<f8'
+        ).reshape(-1, len(FEATURE_COLS))
+
+    def handle(self, *args, model, output, recorded, synthetic, tolerance,
+               **options):
+        source = Path(model)
+        target = Path(output) if output else source.with_suffix('.npz')
+        pipeline = joblib.load(source)
+        tmp = target.with_name(f'{target.stem}.tmp.npz')
+        export_forest(pipeline, tmp, FEATURE_COLS)
+        compiled = ForestPredictor.load(tmp)
+
+        # сверка на записанных поездках и на случайных точках вокруг
+        # среднего обучающей выборки, в том числе с пропусками (NaN
+        # в trip_duration_sec, если крайняя метка времени пуста)
+        scaler = pipeline[0]
+        rng = np.random.default_rng(0)
+        points = scaler.mean_ + scaler.scale_ * 2 * rng.standard_normal(
+            (synthetic, len(FEATURE_COLS))
+        )
+        points[rng.random(points.shape) < 0.05] = np.nan
+        X = np.vstack([self._recorded_vectors(recorded), points])
+        df = pd.DataFrame(X, columns=FEATURE_COLS)
+
+        # бесконечность отклоняют и StandardScaler, и компилированный лес
+        infinite = np.isinf(X).any(axis=1)
+        if infinite.any() and not (
+            _rejects(pipeline, df[infinite])
+            and _rejects(compiled, df[infinite])
+        ):
+            tmp.unlink()
+            raise CommandError('Расхождение с sklearn на бесконечностях')
+        df = df[~infinite]
+        expected = pipeline.predict_proba(df)
+        actual = compiled.predict_proba(df)
+        diff = float(np.abs(expected - actual).max()) if len(df) else 0.0
+        labels_differ = int((
+            pipeline.classes_.take(expected.argmax(axis=1))
+            != compiled.classes_.take(actual.argmax(axis=1))
+        ).sum())
+        if diff > tolerance or labels_differ:
+            tmp.unlink()
+            raise CommandError(
+                f'Расхождение с sklearn: {labels_differ} меток, '
+                f'max |Δp| = {diff:.3g}'
+            )
+        tmp.replace(target)
+
+        row = df.iloc[:1]
+        self.stdout.write(
+            f'Деревьев: {len(compiled.roots)}, '
+            f'узлов: {len(compiled.feature)}, '
+            f'размер: {target.stat().st_size / 1024:.0f} КБ'
+        )
+        sklearn_ms = _latency(pipeline, row, 20) * 1e3
+        compiled_ms = _latency(compiled, row, 200) * 1e3
+        self.stdout.write(
+            f'Одна строка: sklearn {sklearn_ms:.2f} мс, '
+            f'массивы {compiled_ms:.2f} мс'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Сверено векторов: {len(X)}, max |Δp| = {diff:.3g}. '
+            f'Модель сохранена в {target}'
+        ))
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from trips.live import finish_idle_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        'Завершение поездок, переданных частями, от которых давно нет '
+        'новых данных (например, приложение закрыто до конца поездки). '
+        'Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--idle-minutes', type=float,
+            default=settings.LIVE_TRIP_IDLE_MINUTES,
+            help='Сколько минут без новых частей считать поездку завершённой.'
+        )
+
+    def handle(self, *args, idle_minutes, **options):
+        finished = finish_idle_sessions(timedelta(minutes=idle_minutes))
+        self.stdout.write(self.style.SUCCESS(
+            f'Завершено поездок: {finished}'
+        ))
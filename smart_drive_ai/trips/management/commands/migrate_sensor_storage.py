@@ -0,0 +1,105 @@
+import posixpath
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from data_processing.telemetry_io import GZIP_SUFFIX, is_compressed
+from trips.cache import invalidate_user
+from trips.models import Trip
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос файлов датчиков в каталоги по шардам '
+        '(sensor_data/<шард>/<пользователь>/<ГГГГ>/<ММ>/) со сжатием CSV. '
+        'Перенесённые поездки пропускаются, поэтому команду можно '
+        'перезапускать.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Число поездок в одной транзакции.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только подсчитать файлы для переноса.'
+        )
+        parser.add_argument(
+            '--keep-old', action='store_true',
+            help='Не удалять исходные файлы после переноса.'
+        )
+
+    def _target(self, field, trip):
+        name = posixpath.basename(trip.sensor_data_file.name)
+        if is_compressed(name):
+            name = name[:-len(GZIP_SUFFIX)]
+        return field.generate_filename(trip, name)
+
+    def _in_place(self, storage, name, target):
+        return (
+            posixpath.dirname(name) == posixpath.dirname(target)
+            and not storage.should_compress(name)
+        )
+
+    def handle(self, *args, batch_size, dry_run, keep_old, **options):
+        started = time.monotonic()
+        field = Trip._meta.get_field('sensor_data_file')
+        storage = field.storage
+        trips = Trip.objects.only(
+            'id', 'user_id', 'start_date_time', 'sensor_data_file'
+        ).order_by('id')
+
+        last_id = moved = missing = total = 0
+        while True:
+            batch = list(trips.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            total += len(batch)
+
+            updated, old_names, trip_ids = [], [], {}
+            for trip in batch:
+                name = trip.sensor_data_file.name
+                target = self._target(field, trip)
+                if self._in_place(storage, name, target):
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f'Поездка {trip.pk}: нет файла {name}')
+                    continue
+                moved += 1
+                if dry_run:
+                    continue
+                # open() отдаёт распакованные данные, save() сжимает заново
+                with storage.open(name) as content:
+                    trip.sensor_data_file.name = storage.save(
+                        target, File(content, target),
+                        max_length=field.max_length,
+                    )
+                updated.append(trip)
+                old_names.append(name)
+                trip_ids.setdefault(trip.user_id, []).append(trip.pk)
+
+            # новые файлы уже записаны: при сбое до коммита они останутся
+            # без ссылок, а поездки будут перенесены при повторном запуске
+            with transaction.atomic():
+                Trip.objects.bulk_update(updated, ('sensor_data_file',))
+                for user_id, ids in trip_ids.items():
+                    invalidate_user(user_id, ids)
+            if not keep_old:
+                for name in old_names:
+                    storage.delete(name)
+
+            self.stdout.write(
+                f'Проверено: {total}, перенесено: {moved}, '
+                f'без файла: {missing}, '
+                f'{total / (time.monotonic() - started):.0f} поездок/с'
+            )
+
+        verb = 'К переносу' if dry_run else 'Перенесено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {moved} из {total}, без файла: {missing}'
+        ))
@@ -0,0 +1,74 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from data_processing.feature_pool import get_executor, shutdown_executor
+from trips.queue import run_worker
+
+
+def _run(poll_interval, stop_event=None, once=False):
+    if settings.FEATURE_POOL_SIZE > 0:
+        get_executor(
+            settings.FEATURE_POOL_SIZE, settings.FEATURE_TASK_TIMEOUT
+        ).warm()
+    try:
+        run_worker(
+            poll_interval=poll_interval, stop_event=stop_event, once=once
+        )
+    finally:
+        shutdown_executor()
+
+
+def _worker_main(poll_interval, stop_event, once):
+    # у каждого процесса своё подключение к БД
+    connections.close_all()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _run(poll_interval, stop_event, once)
+
+
+class Command(BaseCommand):
+    help = 'Запуск пула воркеров, обрабатывающих очередь загруженных поездок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1, help='Число процессов-воркеров.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди (сек).'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать текущую очередь и завершиться.'
+        )
+
+    def handle(self, *args, workers, poll_interval, once, **options):
+        if workers <= 1:
+            _run(poll_interval, once=once)
+            return
+
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop_event = context.Event()
+        processes = [
+            context.Process(
+                target=_worker_main,
+                args=(poll_interval, stop_event, once),
+                daemon=True,
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        def _stop(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Воркеры остановлены.'))
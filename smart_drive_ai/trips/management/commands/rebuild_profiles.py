@@ -0,0 +1,76 @@
+import math
+
+from django.core.management.base import BaseCommand
+
+from trips.models import User, UserDrivingProfile
+from trips.services import rebuild_user_profile
+
+
+def _differs(stored, expected, rel_tol=1e-6):
+    if isinstance(expected, float) or isinstance(stored, float):
+        return not math.isclose(
+            stored, expected, rel_tol=rel_tol, abs_tol=1e-9
+        )
+    return stored != expected
+
+
+class Command(BaseCommand):
+    help = (
+        'Полный пересчёт профилей вождения по всем поездкам '
+        '(сверка инкрементальных агрегатов).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='id пользователя (можно указать несколько раз).'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сравнить с сохранёнными значениями, без записи.'
+        )
+
+    def handle(self, *args, user_ids, check, **options):
+        users = User.objects.order_by('id')
+        if user_ids:
+            users = users.filter(id__in=user_ids)
+        profiles = {
+            p.user_id: p for p in UserDrivingProfile.objects.filter(
+                user__in=users
+            )
+        }
+
+        rebuilt = mismatched = 0
+        for user in users.iterator():
+            values = rebuild_user_profile(user, save=not check)
+            rebuilt += 1
+            if not check:
+                continue
+            profile = profiles.get(user.id)
+            if values is None:
+                if profile is not None:
+                    mismatched += 1
+                    self.stdout.write(f'user {user.id}: лишний профиль')
+                continue
+            if profile is None:
+                mismatched += 1
+                self.stdout.write(f'user {user.id}: профиль отсутствует')
+                continue
+            diff = {
+                field: (getattr(profile, field), expected)
+                for field, expected in values.items()
+                if field != 'dsi_state'
+                and _differs(getattr(profile, field), expected)
+            }
+            if diff:
+                mismatched += 1
+                self.stdout.write(f'user {user.id}: {diff}')
+
+        if check:
+            self.stdout.write(
+                f'Проверено профилей: {rebuilt}, расхождений: {mismatched}'
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Пересчитано профилей: {rebuilt}')
+            )
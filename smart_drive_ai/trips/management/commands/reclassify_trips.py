@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from data_processing.classify_trip import FEATURE_COLS, classify_matrix
+from data_processing.extract_features_single_trip import (
+    FEATURE_EXTRACTOR_VERSION
+)
+from data_processing.model_registry import DEFAULT_MODEL_PATH
+from trips.cache import invalidate_user
+from trips.models import DrivingStyle, Trip, TripAnalysis, User
+from trips.services import CATEGORIES, rebuild_user_profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Переоценка стиля вождения по сохранённым векторам признаков '
+        '(новая модель) без повторного чтения файлов датчиков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10_000,
+            help='Число поездок в одной матрице для predict.'
+        )
+        parser.add_argument(
+            '--model', default=DEFAULT_MODEL_PATH,
+            help='Файл модели (.joblib или скомпилированный .npz).'
+        )
+
+    def handle(self, *args, batch_size, model, **options):
+        started = time.monotonic()
+        styles = (
+            DrivingStyle.objects
+            .filter(analysis__feature_version=FEATURE_EXTRACTOR_VERSION)
+            .order_by('id')
+            .values_list(
+                'id', 'category', 'analysis__feature_vector',
+                'analysis__trip_id', 'analysis__trip__user_id',
+            )
+        )
+
+        last_id = total = changed = 0
+        user_ids = set()
+        while True:
+            rows = list(styles.filter(id__gt=last_id)[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            X = np.frombuffer(
+                b''.join(bytes(row[2]) for row in rows), dtype='<f8'
+            ).reshape(len(rows), len(FEATURE_COLS))
+            categories = [
+                CATEGORIES.get(label)
+                for label in classify_matrix(X, model_path=model)
+            ]
+
+            updated, trips, trip_ids = [], [], {}
+            for row, category in zip(rows, categories):
+                style_id, old_category, _, trip_id, user_id = row
+                if old_category == category:
+                    continue
+                style = DrivingStyle(id=style_id, category=category)
+                style.add_recommendations(save=False)
+                updated.append(style)
+                trips.append(Trip(id=trip_id, category=category))
+                trip_ids.setdefault(user_id, []).append(trip_id)
+            with transaction.atomic():
+                DrivingStyle.objects.bulk_update(
+                    updated, ('category', 'recommendations')
+                )
+                Trip.objects.bulk_update(trips, ('category',))
+                for user_id, ids in trip_ids.items():
+                    invalidate_user(user_id, ids)
+            user_ids.update(trip_ids)
+            total += len(rows)
+            changed += len(updated)
+            self.stdout.write(
+                f'Поездок: {total}, изменено оценок: {changed}, '
+                f'{total / (time.monotonic() - started):.0f} поездок/с'
+            )
+
+        for user in User.objects.filter(id__in=user_ids).iterator():
+            rebuild_user_profile(user)
+
+        stale = TripAnalysis.objects.exclude(
+            feature_version=FEATURE_EXTRACTOR_VERSION
+        ).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Переоценено поездок: {total}, изменено: {changed}, '
+            f'профилей: {len(user_ids)} '
+            f'за {time.monotonic() - started:.2f} с'
+        ))
+        if stale:
+            self.stdout.write(self.style.WARNING(
+                f'Без актуального вектора признаков: {stale} '
+                '(нужен manage.py reprocess_trips)'
+            ))
@@ -0,0 +1,97 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from trips.models import STATUS_DONE, STATUS_FAILED, Trip, User
+from trips.services import rebuild_user_profile, reprocess_trips
+
+
+class Command(BaseCommand):
+    help = (
+        'Повторная обработка сохранённых поездок (новая модель или пороги): '
+        'пересчёт анализа, оценки стиля и профилей. Прогресс сохраняется '
+        'в файл, прерванный запуск продолжается с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Число поездок в пачке.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число параллельных задач расчёта признаков.'
+        )
+        parser.add_argument(
+            '--checkpoint', default='reprocess_trips.checkpoint.json',
+            help='Файл с прогрессом обработки.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать заново, игнорируя сохранённый прогресс.'
+        )
+
+    def _load(self, path, restart):
+        if restart or not path.exists():
+            return {'last_id': 0, 'processed': 0, 'failed': 0, 'user_ids': []}
+        checkpoint = json.loads(path.read_text())
+        self.stdout.write(
+            f'Продолжение после поездки {checkpoint["last_id"]} '
+            f'(обработано {checkpoint["processed"]})'
+        )
+        return checkpoint
+
+    def _save(self, path, checkpoint):
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(checkpoint))
+        tmp.replace(path)
+
+    def handle(self, *args, batch_size, workers, checkpoint, restart,
+               **options):
+        path = Path(checkpoint)
+        state = self._load(path, restart)
+        user_ids = set(state['user_ids'])
+        trips = (
+            Trip.objects
+            .filter(status__in=(STATUS_DONE, STATUS_FAILED))
+            .select_related('tripanalysis__drivingstyle')
+            .order_by('id')
+        )
+
+        started = time.monotonic()
+        done_now = 0
+        while True:
+            batch = list(trips.filter(id__gt=state['last_id'])[:batch_size])
+            if not batch:
+                break
+            failed = reprocess_trips(batch, workers=workers)
+            user_ids.update(trip.user_id for trip in batch)
+            done_now += len(batch)
+            state.update(
+                last_id=batch[-1].id,
+                processed=state['processed'] + len(batch),
+                failed=state['failed'] + failed,
+                user_ids=sorted(user_ids),
+            )
+            # прогресс фиксируется только после коммита пачки
+            self._save(path, state)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Поездок: {state["processed"]} (ошибок {state["failed"]}), '
+                f'до id {state["last_id"]}, '
+                f'{done_now / elapsed:.1f} поездок/с'
+            )
+
+        for user in User.objects.filter(id__in=user_ids).iterator():
+            rebuild_user_profile(user)
+        path.unlink(missing_ok=True)
+
+        elapsed = time.monotonic() - started
+        rate = done_now / max(elapsed, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано поездок: {state["processed"]}, '
+            f'ошибок: {state["failed"]}, профилей: {len(user_ids)} '
+            f'за {elapsed:.1f} с ({rate:.1f} поездок/с)'
+        ))
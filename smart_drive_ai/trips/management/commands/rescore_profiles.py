@@ -0,0 +1,93 @@
+import dataclasses
+import time
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from data_processing.dsi_algorithm import (
+    DSIParams, DSIState, Trip as DSITrip, TripClass
+)
+from data_processing.dsi_batch import compute_driver_styles
+from trips.cache import invalidate_user
+from trips.models import DrivingStyle, UserDrivingProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчёт общей категории стиля (DSI) для всех профилей '
+        'одним векторизованным проходом; состояние DSI профилей '
+        'строится заново. Состояние с t_half/t_cut, отличными от '
+        'параметров приложения, перестраивается при следующей загрузке.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки для bulk_update.'
+        )
+        # параметры DSI: --t-half, --t-cut, --sigma-max, ...
+        for field in dataclasses.fields(DSIParams):
+            parser.add_argument(
+                '--' + field.name.replace('_', '-'),
+                type=type(field.default), default=field.default,
+                help=f'DSIParams.{field.name} (по умолчанию %(default)s).',
+            )
+
+    def handle(self, *args, batch_size, **options):
+        started = time.monotonic()
+        params = DSIParams(**{
+            field.name: options[field.name]
+            for field in dataclasses.fields(DSIParams)
+        })
+        now = timezone.now()
+        rows = list(DrivingStyle.objects.filter(
+            timestamp__gte=now - timedelta(days=params.t_cut)
+        ).order_by(
+            'analysis__trip__user_id', 'timestamp'
+        ).values_list(
+            'analysis__trip__user_id', 'timestamp', 'category'
+        ).iterator(chunk_size=10_000))
+        user_ids, timestamps, categories = (
+            zip(*rows) if rows else ((), (), ())
+        )
+        results = compute_driver_styles(
+            user_ids, timestamps, categories, params=params, now=now
+        )
+        states = {
+            user_id: DSIState.from_trips(
+                [
+                    DSITrip(timestamp, TripClass.from_str(category))
+                    for _, timestamp, category in group
+                ],
+                params,
+            )
+            for user_id, group in groupby(rows, key=itemgetter(0))
+        }
+
+        profiles = []
+        changed = []
+        for profile in UserDrivingProfile.objects.only(
+            'id', 'user_id', 'overall_category'
+        ).iterator():
+            result = results.get(profile.user_id)
+            category = result.profile_class.name.lower() if result else ''
+            if category != profile.overall_category:
+                profile.overall_category = category
+                changed.append(profile)
+            state = states.get(profile.user_id) or DSIState(params)
+            profile.dsi_state = state.to_dict()
+            profiles.append(profile)
+        UserDrivingProfile.objects.bulk_update(
+            profiles, ['overall_category', 'dsi_state'],
+            batch_size=batch_size,
+        )
+        for profile in changed:
+            invalidate_user(profile.user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценок: {len(user_ids)}, пользователей: {len(results)}, '
+            f'изменено профилей: {len(changed)} '
+            f'за {time.monotonic() - started:.2f} с'
+        ))
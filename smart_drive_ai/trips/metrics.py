@@ -0,0 +1,241 @@
+"""
+Метрики конвейера обработки поездок в текстовом формате Prometheus.
+
+`stage(name)` замеряет этап (чтение файла, признаки, загрузка модели,
+классификация, записи в БД, обновление профиля): длительность и число
+SQL-запросов попадают в гистограммы с меткой `stage`. Значения хранятся
+в памяти процесса — каждый воркер gunicorn отдаёт свои; этапы, которые
+выполняет воркер очереди (`process_trips`), в метриках веб-процесса
+не видны.
+
+Соединения с БД: `trip_db_connection_acquire_seconds` — время получения
+соединения (см. trips.backends.postgresql), `trip_db_pool_*` — состояние
+и счётчики пула psycopg процесса (при DB_CONNECTION_MODE=pool).
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection, connections
+
+from data_processing.inference import BATCH_SIZE_BUCKETS, batcher_metrics
+
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for name, value in pairs
+    )
+    return '{' + body + '}'
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин и метками."""
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series = {}           # значения меток -> [корзины, сумма, число]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        with self._lock:
+            series = {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self._series.items()
+            }
+        for key, (counts, total, count) in sorted(series.items()):
+            yield dict(zip(self.labelnames, key)), counts, total, count
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for labels, counts, total, count in self.collect():
+            pairs = list(labels.items())
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (float('inf'),), counts):
+                cumulative += hits
+                lines.append(
+                    f'{self.name}_bucket'
+                    f'{_labels(pairs + [("le", _format(bound))])} {cumulative}'
+                )
+            lines.append(f'{self.name}_sum{_labels(pairs)} {_format(total)}')
+            lines.append(f'{self.name}_count{_labels(pairs)} {count}')
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    'trip_stage_duration_seconds',
+    'Длительность этапа обработки поездки.',
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+     1, 2.5, 5, 10, 30, 60, 300),
+    labelnames=('stage',),
+)
+STAGE_QUERIES = Histogram(
+    'trip_stage_db_queries',
+    'Число SQL-запросов за этап обработки поездки.',
+    (0, 1, 2, 3, 5, 10, 20, 50, 100, 500),
+    labelnames=('stage',),
+)
+TRIP_SAMPLES = Histogram(
+    'trip_samples',
+    'Число отсчётов датчиков в поездке после обрезки краёв.',
+    (60, 300, 600, 1800, 3600, 10_800, 36_000, 108_000, 360_000, 1_000_000),
+)
+
+DB_ACQUIRE_SECONDS = Histogram(
+    'trip_db_connection_acquire_seconds',
+    'Получение соединения с БД: установка или ожидание в пуле.',
+    (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+     1, 2.5, 5, 10),
+    labelnames=('mode',),
+)
+
+HISTOGRAMS = (STAGE_SECONDS, STAGE_QUERIES, TRIP_SAMPLES, DB_ACQUIRE_SECONDS)
+
+# статистика psycopg_pool: (метрика, ключ, тип, множитель, описание)
+DB_POOL_STATS = (
+    ('trip_db_pool_size', 'pool_size', 'gauge', 1,
+     'Открыто соединений в пуле.'),
+    ('trip_db_pool_available', 'pool_available', 'gauge', 1,
+     'Свободных соединений в пуле.'),
+    ('trip_db_pool_requests_waiting', 'requests_waiting', 'gauge', 1,
+     'Запросов, ожидающих соединение.'),
+    ('trip_db_pool_requests_total', 'requests_num', 'counter', 1,
+     'Выдано соединений из пула.'),
+    ('trip_db_pool_requests_queued_total', 'requests_queued', 'counter', 1,
+     'Запросов, ожидавших свободное соединение.'),
+    ('trip_db_pool_requests_wait_seconds_total', 'requests_wait_ms',
+     'counter', 0.001, 'Суммарное ожидание соединения из пула.'),
+    ('trip_db_pool_requests_errors_total', 'requests_errors', 'counter', 1,
+     'Запросов без соединения (таймаут или ошибка).'),
+    ('trip_db_pool_connections_total', 'connections_num', 'counter', 1,
+     'Соединений, установленных пулом.'),
+    ('trip_db_pool_connections_seconds_total', 'connections_ms',
+     'counter', 0.001, 'Суммарное время установки соединений пулом.'),
+    ('trip_db_pool_connections_errors_total', 'connections_errors',
+     'counter', 1, 'Неудачных попыток соединения.'),
+    ('trip_db_pool_connections_lost_total', 'connections_lost', 'counter',
+     1, 'Соединений, не прошедших проверку.'),
+)
+
+
+@contextmanager
+def stage(name, count_queries=True):
+    """Замер этапа: длительность и число SQL-запросов текущего потока.
+
+    В асинхронных представлениях запросы выполняются в других потоках,
+    там `count_queries=False` — учитывается только длительность.
+    """
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        if count_queries:
+            with connection.execute_wrapper(count):
+                yield
+        else:
+            yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+        if count_queries:
+            STAGE_QUERIES.observe(queries, stage=name)
+
+
+def observe_samples(stats):
+    """Учёт размера поездки по признакам из `extract_features`."""
+    if 'samples' in stats:
+        TRIP_SAMPLES.observe(stats['samples'])
+
+
+def _inference_lines():
+    metrics = batcher_metrics()
+    if metrics is None:
+        return []
+    buckets = list(metrics['batch_size_buckets'].values())
+    lines = [
+        '# HELP trip_inference_batch_size Размер пачки классификации.',
+        '# TYPE trip_inference_batch_size histogram',
+    ]
+    cumulative = 0
+    for bound, hits in zip(BATCH_SIZE_BUCKETS + (float('inf'),), buckets):
+        cumulative += hits
+        lines.append(
+            f'trip_inference_batch_size_bucket'
+            f'{_labels([("le", _format(bound))])} {cumulative}'
+        )
+    lines += [
+        f'trip_inference_batch_size_sum {metrics["requests"]}',
+        f'trip_inference_batch_size_count {metrics["batches"]}',
+        '# HELP trip_inference_queue_wait_seconds_max '
+        'Максимальное ожидание запроса в очереди классификации.',
+        '# TYPE trip_inference_queue_wait_seconds_max gauge',
+        'trip_inference_queue_wait_seconds_max '
+        f'{_format(metrics["queue_wait_seconds_max"])}',
+        '# HELP trip_inference_failed_batches_total '
+        'Пачки классификации, завершившиеся ошибкой.',
+        '# TYPE trip_inference_failed_batches_total counter',
+        f'trip_inference_failed_batches_total {metrics["failed_batches"]}',
+    ]
+    return lines
+
+
+def _db_pool_lines():
+    pool = getattr(connections['default'], 'pool', None)
+    if pool is None:
+        return []
+    stats = pool.get_stats()
+    lines = []
+    for name, key, kind, scale, documentation in DB_POOL_STATS:
+        lines += [
+            f'# HELP {name} {documentation}',
+            f'# TYPE {name} {kind}',
+            f'{name} {_format(stats.get(key, 0) * scale)}',
+        ]
+    return lines
+
+
+def render_metrics():
+    """Все метрики процесса в текстовом формате Prometheus 0.0.4."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    lines += _inference_lines()
+    lines += _db_pool_lines()
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 02:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def set_existing_status(apps, schema_editor):
+    """Уже загруженные поездки считаются обработанными, если есть анализ."""
+    Trip = apps.get_model('trips', 'Trip')
+    Trip.objects.filter(tripanalysis__isnull=False).update(status='done')
+    Trip.objects.filter(tripanalysis__isnull=True).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0005_drivingstyle_timestamp_alter_drivingstyle_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='processing_error',
+            field=models.TextField(blank=True, verbose_name='Ошибка обработки'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='status',
+            field=models.CharField(choices=[('pending', 'в очереди'), ('done', 'обработана'), ('failed', 'ошибка обработки')], default='pending', max_length=20, verbose_name='Статус обработки'),
+        ),
+        migrations.CreateModel(
+            name='TripProcessingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Число попыток')),
+                ('run_after', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Не раньше')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата и время создания')),
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='processing_job', to='trips.trip', verbose_name='Поездка')),
+            ],
+        ),
+        migrations.RunPython(set_existing_status, migrations.RunPython.noop),
+    ]
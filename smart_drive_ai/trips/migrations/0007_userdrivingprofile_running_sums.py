@@ -0,0 +1,92 @@
+# Generated by Django 5.2 on 2026-10-17 02:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_running_sums(apps, schema_editor):
+    """Начальные суммы восстанавливаются из средних (точно — rebuild_profiles)."""
+    UserDrivingProfile = apps.get_model('trips', 'UserDrivingProfile')
+    UserDrivingProfile.objects.update(
+        sum_speed=F('avg_speed') * F('total_trips'),
+        sum_brakes=F('avg_brakes') * F('total_trips'),
+        sum_accels=F('avg_accels') * F('total_trips'),
+        sum_sharp_turns=F('avg_sharp_turns') * F('total_trips'),
+        sum_gyro_mag=F('avg_gyro_mag') * F('total_trips'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0006_trip_status_tripprocessingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdrivingprofile',
+            name='sum_accels',
+            field=models.FloatField(default=0, verbose_name='Сумма резких ускорений'),
+        ),
+        migrations.AddField(
+            model_name='userdrivingprofile',
+            name='sum_brakes',
+            field=models.FloatField(default=0, verbose_name='Сумма резких торможений'),
+        ),
+        migrations.AddField(
+            model_name='userdrivingprofile',
+            name='sum_gyro_mag',
+            field=models.FloatField(default=0, verbose_name='Сумма угловых скоростей'),
+        ),
+        migrations.AddField(
+            model_name='userdrivingprofile',
+            name='sum_sharp_turns',
+            field=models.FloatField(default=0, verbose_name='Сумма резких маневров'),
+        ),
+        migrations.AddField(
+            model_name='userdrivingprofile',
+            name='sum_speed',
+            field=models.FloatField(default=0, verbose_name='Сумма средних скоростей'),
+        ),
+        migrations.AlterField(
+            model_name='userdrivingprofile',
+            name='avg_accels',
+            field=models.FloatField(default=0, verbose_name='Среднее число резких ускорений'),
+        ),
+        migrations.AlterField(
+            model_name='userdrivingprofile',
+            name='avg_brakes',
+            field=models.FloatField(default=0, verbose_name='Среднее число резких торможений'),
+        ),
+        migrations.AlterField(
+            model_name='userdrivingprofile',
+            name='avg_gyro_mag',
+            field=models.FloatField(default=0, verbose_name='Средняя угловая скорость'),
+        ),
+        migrations.AlterField(
+            model_name='userdrivingprofile',
+            name='avg_sharp_turns',
+            field=models.FloatField(default=0, verbose_name='Среднее число резких маневров'),
+        ),
+        migrations.AlterField(
+            model_name='userdrivingprofile',
+            name='avg_speed',
+            field=models.FloatField(default=0, verbose_name='Средняя скорость (км/ч)'),
+        ),
+        migrations.AlterField(
+            model_name='userdrivingprofile',
+            name='overall_category',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Общая категория стиля'),
+        ),
+        migrations.AlterField(
+            model_name='userdrivingprofile',
+            name='total_distance',
+            field=models.FloatField(default=0, verbose_name='Пройденное расстояние (км)'),
+        ),
+        migrations.AlterField(
+            model_name='userdrivingprofile',
+            name='total_trips',
+            field=models.IntegerField(default=0, verbose_name='Общее число поездок'),
+        ),
+        migrations.RunPython(fill_running_sums, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0007_userdrivingprofile_running_sums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdrivingprofile',
+            name='dsi_state',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Инкрементальное состояние DSI'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0008_userdrivingprofile_dsi_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['user', 'start_date_time'], name='trip_user_start_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0009_trip_user_start_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripanalysis',
+            name='feature_vector',
+            field=models.BinaryField(null=True, verbose_name='Вектор признаков модели'),
+        ),
+        migrations.AddField(
+            model_name='tripanalysis',
+            name='feature_version',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='Версия алгоритма признаков'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 03:16
+
+import trips.models
+import trips.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0010_tripanalysis_feature_vector'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trip',
+            name='sensor_data_file',
+            field=models.FileField(max_length=255, storage=trips.storage.get_sensor_data_storage, upload_to=trips.models.sensor_data_path, verbose_name='Файл с данными с датчиков'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-17 03:18
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_trip_results(apps, schema_editor):
+    """Категория и расстояние копируются из анализа поездки."""
+    Trip = apps.get_model('trips', 'Trip')
+    TripAnalysis = apps.get_model('trips', 'TripAnalysis')
+    analysis = TripAnalysis.objects.filter(trip_id=OuterRef('pk'))
+    Trip.objects.filter(tripanalysis__isnull=False).update(
+        distance=Subquery(analysis.values('distance')[:1]),
+        category=Coalesce(
+            Subquery(analysis.values('drivingstyle__category')[:1]),
+            Value(''),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0011_trip_sensor_data_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='category',
+            field=models.CharField(blank=True, choices=[('smooth', 'плавный'), ('moderate', 'умеренный'), ('aggressive', 'агрессивный')], max_length=20, verbose_name='Категория стиля'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='distance',
+            field=models.FloatField(blank=True, null=True, verbose_name='Пройденное расстояние (км)'),
+        ),
+        migrations.RunPython(fill_trip_results, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['user', 'category', 'start_date_time'], name='trip_user_category_start_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-17 03:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0012_trip_category_distance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveTripSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date_time', models.DateTimeField(verbose_name='Дата и время начала')),
+                ('sensor_data_file', models.CharField(max_length=255, verbose_name='Файл с данными с датчиков')),
+                ('file_size', models.PositiveBigIntegerField(default=0, verbose_name='Записано байт')),
+                ('next_seq', models.PositiveIntegerField(default=0, verbose_name='Номер следующей части')),
+                ('state', models.BinaryField(null=True, verbose_name='Состояние расчёта признаков')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата и время создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата и время последней части')),
+                ('trip', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='live_session', to='trips.trip', verbose_name='Поездка')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='live_trips', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+    ]
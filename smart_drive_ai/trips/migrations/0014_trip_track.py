@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0013_live_trip_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveSmallIntegerField(verbose_name='Секунд в корзине')),
+                ('data', models.BinaryField(verbose_name='Корзины ряда')),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracks', to='trips.trip', verbose_name='Поездка')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trip', 'resolution'), name='trip_track_trip_resolution_uniq')],
+            },
+        ),
+    ]
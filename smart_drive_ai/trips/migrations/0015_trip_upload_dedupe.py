@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0014_trip_track'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, verbose_name='Ключ идемпотентности загрузки'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='sensor_data_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='SHA-256 загруженного файла'),
+        ),
+        migrations.AddConstraint(
+            model_name='trip',
+            constraint=models.UniqueConstraint(fields=('user', 'sensor_data_hash'), name='trip_user_sensor_data_hash_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='trip',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='trip_user_idempotency_key_uniq'),
+        ),
+    ]
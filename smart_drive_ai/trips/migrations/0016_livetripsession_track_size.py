@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0015_trip_upload_dedupe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livetripsession',
+            name='track_size',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Записано байт ряда'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 04:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0016_livetripsession_track_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='processing_started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата и время начала обработки'),
+        ),
+    ]
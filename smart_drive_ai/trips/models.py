@@ -1,8 +1,12 @@
+import pickle
+
 from django.contrib.auth.models import AbstractBaseUser, UserManager
 from django.db import models
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .storage import get_sensor_data_storage
+
 
 CATEGORIES = (
     ('smooth', 'плавный'),
@@ -10,6 +14,16 @@ CATEGORIES = (
     ('aggressive', 'агрессивный'),
 )
 
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+STATUSES = (
+    (STATUS_PENDING, 'в очереди'),
+    (STATUS_DONE, 'обработана'),
+    (STATUS_FAILED, 'ошибка обработки'),
+)
+
 RECOMMENDATIONS = {
     'smooth': (
         '• Поддерживайте плавность хода — без резких разгонов и торможений.\n'
@@ -43,6 +57,19 @@ class User(AbstractBaseUser):
     objects = UserManager()
 
 
+def sensor_data_path(trip, filename):
+    """Путь файла датчиков: sensor_data/<шард>/<пользователь>/<ГГГГ>/<ММ>/.
+
+    Шард (две hex-цифры от id пользователя) и месяц начала поездки не
+    дают одному каталогу разрастаться до миллионов файлов.
+    """
+    started = trip.start_date_time or timezone.now()
+    return (
+        f'sensor_data/{trip.user_id % 256:02x}/{trip.user_id}/'
+        f'{started:%Y}/{started:%m}/{filename}'
+    )
+
+
 class Trip(models.Model):
     """Поездка."""
     user = models.ForeignKey(
@@ -52,8 +79,121 @@ class Trip(models.Model):
     start_date_time = models.DateTimeField('Дата и время начала')
     end_date_time = models.DateTimeField('Дата и время окончания')
     sensor_data_file = models.FileField(
-        'Файл с данными с датчиков', upload_to='sensor_data'
+        'Файл с данными с датчиков', upload_to=sensor_data_path,
+        storage=get_sensor_data_storage, max_length=255
+    )
+    status = models.CharField(
+        'Статус обработки', max_length=20, choices=STATUSES,
+        default=STATUS_PENDING
+    )
+    processing_error = models.TextField('Ошибка обработки', blank=True)
+    # по нему повтор загрузки находит прерванную обработку (trips.uploads)
+    processing_started_at = models.DateTimeField(
+        'Дата и время начала обработки', default=timezone.now,
+        editable=False
+    )
+    # копии из анализа и оценки: фильтры списка поездок без JOIN
+    category = models.CharField(
+        'Категория стиля', max_length=20, choices=CATEGORIES, blank=True
+    )
+    distance = models.FloatField(
+        'Пройденное расстояние (км)', null=True, blank=True
+    )
+    # повторная загрузка возвращает сохранённую поездку (trips.uploads)
+    sensor_data_hash = models.CharField(
+        'SHA-256 загруженного файла', max_length=64, null=True, blank=True,
+        editable=False
+    )
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности загрузки', max_length=255, null=True,
+        blank=True, editable=False
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'sensor_data_hash'),
+                name='trip_user_sensor_data_hash_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=('user', 'idempotency_key'),
+                name='trip_user_idempotency_key_uniq',
+            ),
+        )
+        indexes = (
+            # постраничная выдача поездок пользователя по дате начала
+            models.Index(
+                fields=('user', 'start_date_time'),
+                name='trip_user_start_idx',
+            ),
+            # та же выдача с фильтром по категории стиля
+            models.Index(
+                fields=('user', 'category', 'start_date_time'),
+                name='trip_user_category_start_idx',
+            ),
+        )
+
+
+class TripProcessingJob(models.Model):
+    """Задача на обработку поездки (очередь в таблице БД)."""
+    trip = models.OneToOneField(
+        Trip, on_delete=models.CASCADE, verbose_name='Поездка',
+        related_name='processing_job'
+    )
+    attempts = models.PositiveIntegerField('Число попыток', default=0)
+    run_after = models.DateTimeField(
+        'Не раньше', default=timezone.now, db_index=True
+    )
+    created_at = models.DateTimeField(
+        'Дата и время создания', auto_now_add=True
+    )
+
+
+class LiveTripSession(models.Model):
+    """Поездка, данные которой приложение передаёт частями во время езды.
+
+    Сырые строки дописываются в файл датчиков, признаки считаются
+    онлайн; поездка (`trip`) создаётся при завершении.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='Пользователь',
+        related_name='live_trips'
+    )
+    start_date_time = models.DateTimeField('Дата и время начала')
+    sensor_data_file = models.CharField(
+        'Файл с данными с датчиков', max_length=255
+    )
+    file_size = models.PositiveBigIntegerField('Записано байт', default=0)
+    # завершённые секундные корзины ряда для графиков (TrackBuilder.flush)
+    track_size = models.PositiveBigIntegerField(
+        'Записано байт ряда', default=0
+    )
+    next_seq = models.PositiveIntegerField(
+        'Номер следующей части', default=0
+    )
+    # LiveTripFeatures (pickle); None до первой части и после завершения
+    state = models.BinaryField(
+        'Состояние расчёта признаков', null=True, editable=False
     )
+    trip = models.OneToOneField(
+        Trip, on_delete=models.CASCADE, verbose_name='Поездка',
+        related_name='live_session', null=True, blank=True
+    )
+    created_at = models.DateTimeField(
+        'Дата и время создания', auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        'Дата и время последней части', auto_now=True, db_index=True
+    )
+
+    def get_features(self):
+        if not hasattr(self, '_features'):
+            self._features = pickle.loads(self.state) if self.state else None
+        return self._features
+
+    def set_features(self, features):
+        self._features = features
+        self.state = None if features is None else pickle.dumps(features)
 
 
 class TripAnalysis(models.Model):
@@ -68,6 +208,36 @@ class TripAnalysis(models.Model):
     sharp_turns = models.IntegerField('Число резких маневров')
     avg_gyro_mag = models.FloatField('Средняя угловая скорость')
     trip_duration = models.FloatField('Длительность поездки')
+    # Вектор признаков модели (FEATURE_COLS, float64 little-endian)
+    # для переоценки без повторного разбора файла датчиков
+    feature_vector = models.BinaryField(
+        'Вектор признаков модели', null=True, editable=False
+    )
+    feature_version = models.PositiveSmallIntegerField(
+        'Версия алгоритма признаков', null=True, editable=False
+    )
+
+
+class TripTrack(models.Model):
+    """Прореженный ряд показателей поездки для графиков.
+
+    Одна запись на разрешение (секунды в корзине); `data` — записи
+    data_processing.track.TRACK_DTYPE.
+    """
+    trip = models.ForeignKey(
+        Trip, on_delete=models.CASCADE, verbose_name='Поездка',
+        related_name='tracks'
+    )
+    resolution = models.PositiveSmallIntegerField('Секунд в корзине')
+    data = models.BinaryField('Корзины ряда', editable=False)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('trip', 'resolution'),
+                name='trip_track_trip_resolution_uniq',
+            ),
+        )
 
 
 class DrivingStyle(models.Model):
@@ -81,10 +251,11 @@ class DrivingStyle(models.Model):
         'Дата и время создания оценки', default=timezone.now
     )
 
-    def add_recommendations(self):
+    def add_recommendations(self, save=True):
         """Сохранение рекомендации исходя из категории."""
         self.recommendations = RECOMMENDATIONS.get(self.category)
-        self.save()
+        if save:
+            self.save()
 
 
 class UserDrivingProfile(models.Model):
@@ -92,11 +263,26 @@ class UserDrivingProfile(models.Model):
     user = models.OneToOneField(
         User, on_delete=models.CASCADE, verbose_name='Пользователь'
     )
-    total_trips = models.IntegerField('Общее число поездок')
-    avg_speed = models.FloatField('Средняя скорость (км/ч)')
-    total_distance = models.FloatField('Пройденное расстояние (км)')
-    avg_brakes = models.FloatField('Среднее число резких торможений')
-    avg_accels = models.FloatField('Среднее число резких ускорений')
-    avg_sharp_turns = models.FloatField('Среднее число резких маневров')
-    avg_gyro_mag = models.FloatField('Средняя угловая скорость')
-    overall_category = models.CharField('Общая категория стиля', max_length=50)
+    total_trips = models.IntegerField('Общее число поездок', default=0)
+    avg_speed = models.FloatField('Средняя скорость (км/ч)', default=0)
+    total_distance = models.FloatField('Пройденное расстояние (км)', default=0)
+    avg_brakes = models.FloatField(
+        'Среднее число резких торможений', default=0
+    )
+    avg_accels = models.FloatField('Среднее число резких ускорений', default=0)
+    avg_sharp_turns = models.FloatField(
+        'Среднее число резких маневров', default=0
+    )
+    avg_gyro_mag = models.FloatField('Средняя угловая скорость', default=0)
+    overall_category = models.CharField(
+        'Общая категория стиля', max_length=50, blank=True
+    )
+    # Накопительные суммы для инкрементального пересчёта средних
+    sum_speed = models.FloatField('Сумма средних скоростей', default=0)
+    sum_brakes = models.FloatField('Сумма резких торможений', default=0)
+    sum_accels = models.FloatField('Сумма резких ускорений', default=0)
+    sum_sharp_turns = models.FloatField('Сумма резких маневров', default=0)
+    sum_gyro_mag = models.FloatField('Сумма угловых скоростей', default=0)
+    dsi_state = models.JSONField(
+        'Инкрементальное состояние DSI', default=dict, blank=True
+    )
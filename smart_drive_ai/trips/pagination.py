@@ -0,0 +1,15 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class TripCursorPagination(CursorPagination):
+    """Курсорная пагинация поездок по дате начала (новые — первыми).
+
+    Страница выбирается по индексу (user, start_date_time), поэтому её
+    стоимость не зависит от длины истории пользователя.
+    """
+
+    ordering = ('-start_date_time', '-id')
+    page_size = settings.TRIP_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TRIP_MAX_PAGE_SIZE
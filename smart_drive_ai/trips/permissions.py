@@ -0,0 +1,31 @@
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+def has_metrics_token(request):
+    """Токен метрик в X-Metrics-Token или `Authorization: Bearer`
+    (так его передаёт Prometheus).
+    """
+    if not settings.METRICS_TOKEN:
+        return False
+    token = request.headers.get('X-Metrics-Token', '')
+    if not token:
+        scheme, _, credentials = request.headers.get(
+            'Authorization', ''
+        ).partition(' ')
+        if scheme.lower() == 'bearer':
+            token = credentials.strip()
+    # compare_digest для str допускает только ASCII, а заголовок может
+    # содержать любые символы
+    return hmac.compare_digest(
+        token.encode(), settings.METRICS_TOKEN.encode()
+    )
+
+
+class HasMetricsToken(BasePermission):
+    """Доступ к метрикам по токену из настроек."""
+
+    def has_permission(self, request, view):
+        return has_metrics_token(request)
@@ -0,0 +1,146 @@
+"""
+Сэмплирующий профилировщик отдельных запросов.
+
+Запрос с заголовком `X-Profile: 1` (и токеном метрик) выполняется под
+`StackSampler`: фоновый поток раз в PROFILING_INTERVAL_MS снимает стек
+потока запроса. Свёрнутые стеки (формат flamegraph.pl / speedscope)
+сохраняются в PROFILE_DIR, имя файла возвращается в заголовке
+`X-Profile-Id`; сам профиль отдаёт `metrics/profiles/<id>/`.
+
+Под ASGI запрос выполняется в нескольких потоках (цикл событий,
+sync_to_async), поэтому снимаются стеки всех потоков процесса, кроме
+самого сэмплера; первым кадром стека идёт имя потока.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .permissions import has_metrics_token
+
+
+PROFILE_HEADER = 'X-Profile'
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}.{code.co_qualname}:{frame.f_lineno}'
+
+
+def _stack(frame):
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame))
+        frame = frame.f_back
+    return reversed(stack)
+
+
+class StackSampler:
+    """Сбор стеков потока (или всех потоков) с заданным интервалом."""
+
+    def __init__(self, thread_id=None, interval=0.005, all_threads=False):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.all_threads = all_threads
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop, name='stack-sampler', daemon=True
+        )
+
+    def _sample_all(self, frames):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in frames.items():
+            if ident != own:
+                name = names.get(ident, str(ident))
+                self.stacks[';'.join((name, *_stack(frame)))] += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.all_threads:
+                self._sample_all(frames)
+            else:
+                frame = frames.get(self.thread_id)
+                if frame is None:
+                    continue
+                self.stacks[';'.join(_stack(frame))] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.most_common()
+        )
+
+
+def profile_path(profile_id):
+    return Path(settings.PROFILE_DIR) / f'{profile_id}.folded'
+
+
+def _requested(request):
+    return (
+        settings.PROFILING_ENABLED
+        and request.headers.get(PROFILE_HEADER)
+        and has_metrics_token(request)
+    )
+
+
+class ProfilingMiddleware:
+    """Профилирование запроса по заголовку X-Profile."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not _requested(request):
+            return self.get_response(request)
+
+        with StackSampler(
+            interval=settings.PROFILING_INTERVAL_MS / 1000
+        ) as sampler:
+            response = self.get_response(request)
+        return self._save(response, sampler)
+
+    async def __acall__(self, request):
+        if not _requested(request):
+            return await self.get_response(request)
+
+        with StackSampler(
+            interval=settings.PROFILING_INTERVAL_MS / 1000, all_threads=True
+        ) as sampler:
+            response = await self.get_response(request)
+        return self._save(response, sampler)
+
+    def _save(self, response, sampler):
+        profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        profile_path(profile_id).write_text(sampler.folded())
+        response['X-Profile-Id'] = profile_id
+        response['X-Profile-Samples'] = str(sampler.samples)
+        return response
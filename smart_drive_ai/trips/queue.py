@@ -0,0 +1,83 @@
+"""Очередь обработки поездок поверх таблицы БД (без брокера).
+
+Воркер забирает задачу через `SELECT ... FOR UPDATE SKIP LOCKED` и держит
+блокировку строки до конца обработки: если процесс упадёт, транзакция
+откатится и задачу подхватит другой воркер.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_user
+from .models import STATUS_FAILED, STATUS_PENDING, TripProcessingJob
+from .services import process_trip
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = timedelta(seconds=30)
+
+
+def enqueue(trip):
+    """Постановка поездки в очередь на обработку."""
+    trip.status = STATUS_PENDING
+    trip.save(update_fields=('status',))
+    return TripProcessingJob.objects.create(trip=trip)
+
+
+def enqueue_many(trips):
+    """Постановка пачки новых поездок в очередь одним INSERT."""
+    return TripProcessingJob.objects.bulk_create(
+        [TripProcessingJob(trip=trip) for trip in trips]
+    )
+
+
+def run_next_job():
+    """Обработка одной задачи. Возвращает False, если очередь пуста."""
+    with transaction.atomic():
+        job = (
+            TripProcessingJob.objects
+            # блокируется только задача: поездка и пользователь остаются
+            # доступны загрузкам и другим воркерам
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('trip__user')
+            .filter(run_after__lte=timezone.now())
+            .order_by('id')
+            .first()
+        )
+        if job is None:
+            return False
+
+        trip = job.trip
+        try:
+            with transaction.atomic():
+                process_trip(trip)
+        except Exception as exc:
+            logger.exception('Trip %s processing failed', trip.pk)
+            job.attempts += 1
+            if job.attempts >= settings.TRIP_JOB_MAX_ATTEMPTS:
+                trip.status = STATUS_FAILED
+                trip.processing_error = str(exc)
+                trip.save(update_fields=('status', 'processing_error'))
+                invalidate_user(trip.user_id, [trip.pk])
+                job.delete()
+            else:
+                job.run_after = timezone.now() + RETRY_DELAY * job.attempts
+                job.save(update_fields=('attempts', 'run_after'))
+        else:
+            job.delete()
+    return True
+
+
+def run_worker(poll_interval=1.0, stop_event=None, once=False):
+    """Цикл воркера: обрабатывает задачи, пока очередь не опустеет."""
+    while stop_event is None or not stop_event.is_set():
+        if run_next_job():
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
@@ -1,18 +1,26 @@
+import numpy as np
 import pandas as pd
-from django.db.models import Avg, Count, Sum
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
-from data_processing.classify_trip import classify_trip
-from data_processing.dsi_algorithm import get_overall_category
-from data_processing.extract_features_single_trip import extract_trip_features
-from .models import DrivingStyle, Trip, TripAnalysis, User, UserDrivingProfile
-
-
-CATEGORIES = {
-    'плавный': 'smooth',
-    'умеренный': 'moderate',
-    'агрессивный': 'aggressive'
-}
+from data_processing.extract_features_single_trip import SENSOR_COLS
+from data_processing.telemetry_io import (
+    FORMAT_CSV, FORMAT_PARQUET, detect_format, is_compressed,
+    parquet_available
+)
+from data_processing.track import TRACK_RESOLUTIONS
+
+from .live import start_session
+from .models import (
+    CATEGORIES, DrivingStyle, LiveTripSession, Trip, TripAnalysis, User,
+    UserDrivingProfile
+)
+from .queue import enqueue, enqueue_many
+from .services import process_trips_batch
+from .uploads import (
+    create_trip, process_uploaded_trip, retry_processing, unique_trips
+)
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -40,62 +48,78 @@ class TripUploadSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Trip
-        fields = ('start_date_time', 'end_date_time', 'sensor_data_file')
+        fields = (
+            'id', 'start_date_time', 'end_date_time', 'sensor_data_file',
+            'status',
+        )
+        read_only_fields = ('status',)
+
+    def validate_sensor_data_file(self, value):
+        """Формат файла: CSV (по умолчанию) или бинарная телеметрия
+        (npy/bin/npz/parquet) — по расширению или content type.
+        """
+        fmt = detect_format(value.name, getattr(value, 'content_type', None))
+        if is_compressed(value.name) and fmt not in (None, FORMAT_CSV):
+            raise serializers.ValidationError(
+                'Сжатие gzip поддерживается только для CSV.'
+            )
+        if fmt == FORMAT_PARQUET and not parquet_available():
+            raise serializers.ValidationError(
+                'Формат Parquet не поддерживается на сервере.'
+            )
+        if fmt not in (None, FORMAT_CSV) and detect_format(value.name) is None:
+            # формат определён по content type — фиксируем его в имени
+            value.name = f'{value.name}.{fmt}'
+        return value
 
     def create(self, validated_data):
-        # Вызов родительского метода: создание поездки
-        trip = super().create(validated_data)
-
-        # Обработка входного csv файла
-        path = trip.sensor_data_file
-        stats, user_stats = extract_trip_features(
-            df=pd.read_csv(path), filename=path
+        # Создание поездки; повтор загрузки вернёт уже сохранённую,
+        # а поездку с неудачной или прерванной обработкой обработает снова
+        trip, self.created = create_trip(
+            validated_data, validated_data.pop('idempotency_key', None)
         )
-        # Сохранение результатов обработки в TripAnalysis
-        analysis = TripAnalysis.objects.create(trip=trip, **user_stats)
+        if not self.created and not retry_processing(trip):
+            return trip
 
-        # Вызов нейронки, получение и сохранение оценки стиля вождения
-        category = classify_trip(stats)  # категория на русском
-        driving_style = DrivingStyle.objects.create(
-            analysis=analysis, category=CATEGORIES.get(category)  # сохранение категории на английском
-        )
-        # Добавление комментария
-        driving_style.add_recommendations()
-
-        # region АГРЕГАЦИЯ
-
-        # Создание агрегированных данных
-        aggregated_data = Trip.objects.filter(user=trip.user).select_related(
-            'tripanalysis'
-        ).aggregate(
-            total_trips=Count('id'),
-            avg_speed=Avg('tripanalysis__avg_speed'),
-            total_distance=Sum('tripanalysis__distance'),
-            avg_brakes=Avg('tripanalysis__hard_brakes'),
-            avg_accels=Avg('tripanalysis__hard_accels'),
-            avg_sharp_turns=Avg('tripanalysis__sharp_turns'),
-            avg_gyro_mag=Avg('tripanalysis__avg_gyro_mag'),
-        )
+        if settings.TRIP_PROCESSING_MODE == 'queue':
+            # Обработка в фоне воркером очереди
+            enqueue(trip)
+            return trip
 
-        # Сбор данных для определения агрегированной категории
-        data = Trip.objects.filter(user=trip.user).values_list(
-            'tripanalysis__drivingstyle__timestamp',
-            'tripanalysis__drivingstyle__category'
-        )
-        # Определение агрегированной категории
-        overall_category = get_overall_category(list(data))
+        return process_uploaded_trip(trip)
 
-        # Добавление агрегированной категории
-        aggregated_data['overall_category'] = overall_category
 
-        # Сохранение или обновление агрегированных данных,
-        # в профиле вождения пользователя
-        UserDrivingProfile.objects.update_or_create(
-            user=trip.user, defaults=aggregated_data
-        )
+class TripBatchUploadSerializer(serializers.Serializer):
+    """Сериализатор для пакетной загрузки поездок.
+
+    В multipart-запросе поля передаются как `trips[0]sensor_data_file`,
+    `trips[0]start_date_time` и т.д.
+    """
+
+    trips = TripUploadSerializer(many=True, allow_empty=False)
+
+    def validate_trips(self, value):
+        if len(value) > settings.TRIP_BATCH_MAX_FILES:
+            raise serializers.ValidationError(
+                f'Не более {settings.TRIP_BATCH_MAX_FILES} поездок за запрос.'
+            )
+        return value
 
-        # endregion
-        return trip
+    def create(self, validated_data):
+        user = validated_data['user']
+        with transaction.atomic():
+            # параллельные пакеты пользователя не создадут поездку дважды;
+            # блокировка держится только на время записи поездок
+            User.objects.select_for_update().get(pk=user.pk)
+            trips, new, retried = unique_trips(
+                user, validated_data['trips']
+            )
+            new = Trip.objects.bulk_create(new) + retried
+            if settings.TRIP_PROCESSING_MODE == 'queue':
+                enqueue_many(new)
+        if settings.TRIP_PROCESSING_MODE != 'queue' and new:
+            process_trips_batch(user, new)
+        return {'trips': trips}
 
 
 class DrivingStyleSerializer(serializers.ModelSerializer):
@@ -127,28 +151,141 @@ class TripRetrieveSerializer(serializers.ModelSerializer):
         model = Trip
         fields = (
             'id', 'start_date_time', 'end_date_time', 'sensor_data_file',
-            'trip_analysis', 'driving_style',
+            'status', 'trip_analysis', 'driving_style',
         )
 
 
 class TripListSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения списка поездок."""
 
-    distance = serializers.SerializerMethodField()
     driving_style = serializers.SerializerMethodField()
 
     class Meta:
         model = Trip
         fields = (
-            'id', 'start_date_time', 'end_date_time', 'distance',
+            'id', 'start_date_time', 'end_date_time', 'status', 'distance',
             'driving_style',
         )
 
-    def get_distance(self, obj):
-        return obj.tripanalysis.distance
-
     def get_driving_style(self, obj):
-        return obj.tripanalysis.drivingstyle.category
+        return obj.category or None
+
+
+class TripFilterSerializer(serializers.Serializer):
+    """Параметры фильтрации списка поездок (query string)."""
+
+    start_after = serializers.DateTimeField(required=False)
+    start_before = serializers.DateTimeField(required=False)
+    category = serializers.ChoiceField(choices=CATEGORIES, required=False)
+    min_distance = serializers.FloatField(min_value=0, required=False)
+
+    LOOKUPS = {
+        'start_after': 'start_date_time__gte',
+        'start_before': 'start_date_time__lt',
+        'category': 'category',
+        'min_distance': 'distance__gte',
+    }
+
+    def validate(self, attrs):
+        start_after = attrs.get('start_after')
+        start_before = attrs.get('start_before')
+        if start_after and start_before and start_after >= start_before:
+            raise serializers.ValidationError(
+                'start_after должен быть раньше start_before.'
+            )
+        return attrs
+
+    def filter(self, queryset):
+        return queryset.filter(**{
+            self.LOOKUPS[name]: value
+            for name, value in self.validated_data.items()
+        })
+
+
+class TripStatusSerializer(serializers.ModelSerializer):
+    """Сериализатор для отображения статуса обработки поездки."""
+
+    class Meta:
+        model = Trip
+        fields = ('id', 'status', 'processing_error')
+
+
+class TripTimeseriesSerializer(serializers.Serializer):
+    """Параметры ряда показателей поездки (query string)."""
+
+    resolution = serializers.ChoiceField(
+        choices=TRACK_RESOLUTIONS, default=10
+    )
+
+
+class LiveTripSessionSerializer(serializers.ModelSerializer):
+    """Сериализатор для передачи поездки частями во время езды."""
+
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = LiveTripSession
+        fields = ('id', 'start_date_time', 'next_seq', 'trip', 'progress')
+        read_only_fields = ('next_seq', 'trip')
+
+    def get_progress(self, obj):
+        features = obj.get_features()
+        return None if features is None else features.progress()
+
+    def create(self, validated_data):
+        return start_session(**validated_data)
+
+
+class LiveTripSamplesSerializer(serializers.Serializer):
+    """Часть отсчётов поездки.
+
+    `samples` — колонки файла датчиков (SENSOR_COLS и необязательная
+    `timestamp`) как массивы одинаковой длины.
+    """
+
+    seq = serializers.IntegerField(min_value=0)
+    samples = serializers.JSONField()
+
+    def validate_samples(self, value):
+        if not isinstance(value, dict) or not all(
+            isinstance(column, list) for column in value.values()
+        ):
+            raise serializers.ValidationError(
+                'Ожидается объект: колонка → массив значений.'
+            )
+        missing = [name for name in SENSOR_COLS if name not in value]
+        if missing:
+            raise serializers.ValidationError(
+                f'Нет колонок: {", ".join(missing)}.'
+            )
+        names = [name for name in ('timestamp',) + SENSOR_COLS
+                 if name in value]
+        lengths = {len(value[name]) for name in names}
+        if len(lengths) > 1:
+            raise serializers.ValidationError('Колонки разной длины.')
+        rows = lengths.pop()
+        if not 0 < rows <= settings.LIVE_TRIP_MAX_ROWS:
+            raise serializers.ValidationError(
+                f'От 1 до {settings.LIVE_TRIP_MAX_ROWS} отсчётов за запрос.'
+            )
+        columns = {}
+        for name in names:
+            if name == 'timestamp':
+                columns[name] = value[name]
+                continue
+            try:
+                columns[name] = np.asarray(value[name], dtype=np.float64)
+            except (TypeError, ValueError):
+                raise serializers.ValidationError(
+                    f'Нечисловые значения в колонке {name}.'
+                )
+        return pd.DataFrame(columns)
+
+
+class LiveTripFinishSerializer(serializers.Serializer):
+    """Завершение поездки, переданной частями."""
+
+    end_date_time = serializers.DateTimeField()
 
 
 class UserDrivingProfileSerializer(serializers.ModelSerializer):
@@ -156,4 +293,7 @@ class UserDrivingProfileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = UserDrivingProfile
-        exclude = ('id', 'user',)
+        exclude = (
+            'id', 'user', 'sum_speed', 'sum_brakes', 'sum_accels',
+            'sum_sharp_turns', 'sum_gyro_mag', 'dsi_state',
+        )
@@ -0,0 +1,422 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from data_processing.classify_trip import (
+    classify_trip, classify_trips, feature_vector
+)
+from data_processing.dsi_algorithm import (
+    DSIParams, DSIState, Trip as DSITrip, TripClass
+)
+from data_processing.extract_features_single_trip import (
+    FEATURE_EXTRACTOR_VERSION, extract_trip_features
+)
+from data_processing.feature_pool import get_executor
+from data_processing.inference import get_batcher
+from data_processing.model_registry import DEFAULT_MODEL_PATH, get_model
+from data_processing.streaming_features import extract_trip_features_streaming
+from data_processing.telemetry_io import (
+    FORMAT_CSV, detect_format, extract_features_binary, should_stream
+)
+from .cache import invalidate_user
+from .metrics import observe_samples, stage
+from .models import (
+    STATUS_DONE, STATUS_FAILED, DrivingStyle, Trip, TripAnalysis, TripTrack,
+    UserDrivingProfile
+)
+
+
+logger = logging.getLogger(__name__)
+
+# поля поездки, которые выставляет обработка
+TRIP_RESULT_FIELDS = ('status', 'processing_error', 'category', 'distance')
+
+ANALYSIS_FIELDS = (
+    'avg_speed', 'distance', 'hard_brakes', 'hard_accels', 'sharp_turns',
+    'avg_gyro_mag', 'trip_duration', 'feature_vector', 'feature_version',
+)
+
+CATEGORIES = {
+    'плавный': 'smooth',
+    'умеренный': 'moderate',
+    'агрессивный': 'aggressive'
+}
+
+
+def extract_features(path):
+    """Признаки поездки из файла; длинные записи читаются по частям.
+
+    Если включён пул процессов (FEATURE_POOL_SIZE), расчёт выполняется
+    в нём, а в процесс передаётся только путь к файлу.
+    """
+    with stage('extract'):
+        stats, user_stats = _extract_features(path)
+    observe_samples(stats)
+    return stats, user_stats
+
+
+def _extract_features(path):
+    if settings.FEATURE_POOL_SIZE > 0:
+        try:
+            local_path = path.path
+        except NotImplementedError:
+            local_path = None   # хранилище без локальных путей
+        if local_path is not None:
+            return get_executor(
+                settings.FEATURE_POOL_SIZE, settings.FEATURE_TASK_TIMEOUT
+            ).extract_file(
+                local_path, filename=path.name,
+                streaming_min_bytes=settings.FEATURE_STREAMING_MIN_BYTES,
+                chunksize=settings.FEATURE_STREAMING_CHUNKSIZE,
+            )
+    fmt = detect_format(path.name)
+    if fmt not in (None, FORMAT_CSV):
+        # бинарная телеметрия отображается в память без разбора текста
+        return extract_features_binary(path.path, fmt, filename=path)
+    if should_stream(path.path, settings.FEATURE_STREAMING_MIN_BYTES):
+        with path.open('rb') as source:
+            return extract_trip_features_streaming(
+                source, filename=path,
+                chunksize=settings.FEATURE_STREAMING_CHUNKSIZE,
+            )
+    with stage('read_csv'):
+        df = pd.read_csv(path)
+    with stage('features'):
+        return extract_trip_features(df=df, filename=path)
+
+
+def analysis_values(stats, user_stats):
+    """Поля TripAnalysis: показатели поездки и вектор признаков модели."""
+    return {
+        **user_stats,
+        'feature_vector': feature_vector(stats).astype('<f8').tobytes(),
+        'feature_version': FEATURE_EXTRACTOR_VERSION,
+    }
+
+
+def trip_tracks(trip, stats):
+    """Записи TripTrack по прореженному ряду из признаков."""
+    return [
+        TripTrack(trip=trip, resolution=resolution, data=data)
+        for resolution, data in stats.get('track', {}).items()
+    ]
+
+
+def classify(stats):
+    """Категория стиля (на русском) для одной поездки.
+
+    При INFERENCE_BATCHING (ASGI или gthread-воркеры) запрос объединяется
+    с параллельными запросами процесса в одну пачку.
+    """
+    with stage('model_load'):
+        # модель из реестра процесса: время заметно только при (пере)загрузке
+        get_model(DEFAULT_MODEL_PATH)
+    with stage('classify'):
+        if settings.INFERENCE_BATCHING:
+            label, _ = get_batcher(
+                settings.INFERENCE_MAX_BATCH_SIZE,
+                settings.INFERENCE_MAX_WAIT_MS / 1000,
+            ).classify(feature_vector(stats))
+            return label
+        return classify_trip(stats)
+
+
+def process_trip(trip):
+    """Полный цикл обработки поездки: признаки, оценка стиля, профиль."""
+    # Обработка входного csv файла
+    stats, user_stats = extract_features(trip.sensor_data_file)
+    return save_trip_analysis(trip, stats, user_stats)
+
+
+def save_trip_analysis(trip, stats, user_stats):
+    """Оценка стиля по готовым признакам, запись анализа и профиля."""
+    # Вызов нейронки, получение оценки стиля вождения
+    category = classify(stats)  # категория на русском
+
+    with stage('db_write'):
+        # Сохранение результатов обработки в TripAnalysis
+        analysis = TripAnalysis.objects.create(
+            trip=trip, **analysis_values(stats, user_stats)
+        )
+        # сохранение категории на английском
+        driving_style = DrivingStyle(
+            analysis=analysis, category=CATEGORIES.get(category)
+        )
+        # Добавление комментария и сохранение одним INSERT
+        driving_style.add_recommendations(save=False)
+        driving_style.save()
+        TripTrack.objects.bulk_create(trip_tracks(trip, stats))
+
+    with stage('profile_update'):
+        apply_trip_to_profile(trip.user, analysis, driving_style)
+
+    trip.status = STATUS_DONE
+    trip.processing_error = ''
+    trip.category = driving_style.category
+    trip.distance = analysis.distance
+    trip.save(update_fields=TRIP_RESULT_FIELDS)
+    invalidate_user(trip.user_id, [trip.pk])
+    return trip
+
+
+def _extract_or_error(trip):
+    try:
+        return extract_features(trip.sensor_data_file), ''
+    except Exception as error:
+        logger.exception('Trip %s processing failed', trip.pk)
+        return None, str(error)
+
+
+def extract_features_many(trips, workers=None):
+    """Признаки пачки поездок параллельно: список пар (признаки, ошибка)."""
+    workers = workers or settings.TRIP_BATCH_WORKERS
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_extract_or_error, trips))
+
+
+def process_trips_batch(user, trips):
+    """Обработка пачки поездок пользователя.
+
+    Признаки считаются параллельно, классификация — одним `predict`,
+    записи — через `bulk_create`, профиль обновляется один раз.
+    Поездки с некорректными файлами помечаются как `failed`.
+    """
+    extracted = extract_features_many(trips)
+
+    done = [
+        (trip, features) for trip, (features, _) in zip(trips, extracted)
+        if features is not None
+    ]
+    with stage('classify_batch'):
+        categories = classify_trips([stats for _, (stats, _) in done])
+
+    with transaction.atomic():
+        with stage('db_write_batch'):
+            analyses = TripAnalysis.objects.bulk_create([
+                TripAnalysis(trip=trip, **analysis_values(stats, user_stats))
+                for trip, (stats, user_stats) in done
+            ])
+            driving_styles = [
+                DrivingStyle(
+                    analysis=analysis, category=CATEGORIES.get(category)
+                )
+                for analysis, category in zip(analyses, categories)
+            ]
+            for driving_style in driving_styles:
+                driving_style.add_recommendations(save=False)
+            DrivingStyle.objects.bulk_create(driving_styles)
+            TripTrack.objects.bulk_create([
+                track for trip, (stats, _) in done
+                for track in trip_tracks(trip, stats)
+            ])
+
+            for trip, (features, error) in zip(trips, extracted):
+                trip.status = (
+                    STATUS_DONE if features is not None else STATUS_FAILED
+                )
+                trip.processing_error = error
+            for analysis, driving_style in zip(analyses, driving_styles):
+                analysis.trip.category = driving_style.category
+                analysis.trip.distance = analysis.distance
+            Trip.objects.bulk_update(trips, TRIP_RESULT_FIELDS)
+
+        if analyses:
+            with stage('profile_update_batch'):
+                apply_trips_to_profile(user, analyses, driving_styles)
+        invalidate_user(user.pk, [trip.pk for trip in trips])
+    return trips
+
+
+def reprocess_trips(trips, workers=None):
+    """Повторный расчёт анализа и оценки стиля для сохранённых поездок.
+
+    `trips` — с `select_related('tripanalysis__drivingstyle')`. Существующие
+    записи обновляются через `bulk_update` (время оценки сохраняется),
+    недостающие создаются. Профили не пересчитываются — это делает
+    `rebuild_user_profile`. Ряды для графиков записываются заново.
+    Поездки, файл которых не удалось обработать, не изменяются.
+    Возвращает число таких поездок.
+    """
+    extracted = extract_features_many(trips, workers)
+    done = [
+        (trip, features) for trip, (features, _) in zip(trips, extracted)
+        if features is not None
+    ]
+    categories = classify_trips([stats for _, (stats, _) in done])
+
+    created_analyses, updated_analyses = [], []
+    created_styles, updated_styles = [], []
+    for (trip, (stats, user_stats)), category in zip(done, categories):
+        values = analysis_values(stats, user_stats)
+        analysis = getattr(trip, 'tripanalysis', None)
+        driving_style = getattr(analysis, 'drivingstyle', None)
+        if analysis is None:
+            analysis = TripAnalysis(trip=trip, **values)
+            created_analyses.append(analysis)
+        else:
+            for field, value in values.items():
+                setattr(analysis, field, value)
+            updated_analyses.append(analysis)
+        if driving_style is None:
+            driving_style = DrivingStyle(analysis=analysis)
+            created_styles.append(driving_style)
+        else:
+            updated_styles.append(driving_style)
+        driving_style.category = CATEGORIES.get(category)
+        driving_style.add_recommendations(save=False)
+        trip.status = STATUS_DONE
+        trip.processing_error = ''
+        trip.category = driving_style.category
+        trip.distance = analysis.distance
+
+    with transaction.atomic():
+        TripAnalysis.objects.bulk_update(updated_analyses, ANALYSIS_FIELDS)
+        TripAnalysis.objects.bulk_create(created_analyses)
+        DrivingStyle.objects.bulk_update(
+            updated_styles, ('category', 'recommendations')
+        )
+        DrivingStyle.objects.bulk_create(created_styles)
+        TripTrack.objects.filter(trip__in=[trip for trip, _ in done]).delete()
+        TripTrack.objects.bulk_create([
+            track for trip, (stats, _) in done
+            for track in trip_tracks(trip, stats)
+        ])
+        Trip.objects.bulk_update(
+            [trip for trip, _ in done], TRIP_RESULT_FIELDS
+        )
+        trip_ids = {}
+        for trip, _ in done:
+            trip_ids.setdefault(trip.user_id, []).append(trip.pk)
+        for user_id, ids in trip_ids.items():
+            invalidate_user(user_id, ids)
+    return len(trips) - len(done)
+
+
+def build_dsi_state(user, params=DSIParams(), exclude=None):
+    """Состояние DSI по оценкам поездок в пределах горизонта T_cut."""
+    cutoff = timezone.now() - timedelta(days=params.t_cut)
+    styles = DrivingStyle.objects.filter(
+        analysis__trip__user=user, timestamp__gte=cutoff
+    )
+    if exclude:
+        styles = styles.exclude(pk__in=[style.pk for style in exclude])
+    return DSIState.from_trips(
+        [
+            DSITrip(timestamp, TripClass.from_str(category))
+            for timestamp, category in styles.values_list(
+                'timestamp', 'category'
+            )
+        ],
+        params,
+    )
+
+
+def _overall_category(state):
+    result = state.result()
+    return result.profile_class.name.lower() if result else ''
+
+
+def apply_trip_to_profile(user, analysis, driving_style):
+    """Учёт новой поездки в профиле за O(1): атомарный UPDATE через F()
+    и инкрементальное обновление сохранённого состояния DSI.
+    """
+    apply_trips_to_profile(user, [analysis], [driving_style])
+
+
+def apply_trips_to_profile(user, analyses, driving_styles):
+    """Учёт пачки новых поездок в профиле одним UPDATE."""
+    profile, _ = UserDrivingProfile.objects.get_or_create(user=user)
+    with transaction.atomic():
+        dsi_state = UserDrivingProfile.objects.select_for_update().values_list(
+            'dsi_state', flat=True
+        ).get(pk=profile.pk)
+        try:
+            state = DSIState.from_dict(dsi_state)
+        except (KeyError, ValueError):
+            # состояния ещё нет или параметры DSI изменились
+            state = build_dsi_state(user, exclude=driving_styles)
+        for driving_style in sorted(driving_styles, key=lambda s: s.timestamp):
+            state.update(DSITrip(
+                driving_style.timestamp,
+                TripClass.from_str(driving_style.category),
+            ))
+        _update_profile_totals(profile, analyses, state)
+
+
+def _update_profile_totals(profile, analyses, state):
+    def added(field, name):
+        return F(field) + float(sum(getattr(a, name) for a in analyses))
+
+    total = F('total_trips') + len(analyses)
+    sum_speed = added('sum_speed', 'avg_speed')
+    sum_brakes = added('sum_brakes', 'hard_brakes')
+    sum_accels = added('sum_accels', 'hard_accels')
+    sum_sharp_turns = added('sum_sharp_turns', 'sharp_turns')
+    sum_gyro_mag = added('sum_gyro_mag', 'avg_gyro_mag')
+    # в UPDATE правые части видят старые значения строки
+    UserDrivingProfile.objects.filter(pk=profile.pk).update(
+        total_trips=total,
+        total_distance=added('total_distance', 'distance'),
+        sum_speed=sum_speed,
+        sum_brakes=sum_brakes,
+        sum_accels=sum_accels,
+        sum_sharp_turns=sum_sharp_turns,
+        sum_gyro_mag=sum_gyro_mag,
+        avg_speed=sum_speed / total,
+        avg_brakes=sum_brakes / total,
+        avg_accels=sum_accels / total,
+        avg_sharp_turns=sum_sharp_turns / total,
+        avg_gyro_mag=sum_gyro_mag / total,
+        overall_category=_overall_category(state),
+        dsi_state=state.to_dict(),
+    )
+
+
+def rebuild_user_profile(user, save=True):
+    """Полный пересчёт профиля по всем обработанным поездкам пользователя.
+
+    Возвращает словарь значений профиля (None, если поездок нет).
+    """
+    totals = TripAnalysis.objects.filter(trip__user=user).aggregate(
+        total_trips=Count('id'),
+        total_distance=Sum('distance'),
+        sum_speed=Sum('avg_speed'),
+        sum_brakes=Sum('hard_brakes'),
+        sum_accels=Sum('hard_accels'),
+        sum_sharp_turns=Sum('sharp_turns'),
+        sum_gyro_mag=Sum('avg_gyro_mag'),
+    )
+    count = totals['total_trips']
+    if not count:
+        if save:
+            UserDrivingProfile.objects.filter(user=user).delete()
+            invalidate_user(user.pk)
+        return None
+
+    values = {
+        'total_trips': count,
+        'total_distance': totals['total_distance'],
+        'sum_speed': totals['sum_speed'],
+        'sum_brakes': float(totals['sum_brakes']),
+        'sum_accels': float(totals['sum_accels']),
+        'sum_sharp_turns': float(totals['sum_sharp_turns']),
+        'sum_gyro_mag': totals['sum_gyro_mag'],
+        'avg_speed': totals['sum_speed'] / count,
+        'avg_brakes': totals['sum_brakes'] / count,
+        'avg_accels': totals['sum_accels'] / count,
+        'avg_sharp_turns': totals['sum_sharp_turns'] / count,
+        'avg_gyro_mag': totals['sum_gyro_mag'] / count,
+    }
+    state = build_dsi_state(user)
+    values['overall_category'] = _overall_category(state)
+    values['dsi_state'] = state.to_dict()
+    if save:
+        UserDrivingProfile.objects.update_or_create(user=user, defaults=values)
+        invalidate_user(user.pk)
+    return values
@@ -0,0 +1,78 @@
+"""
+Хранилище файлов датчиков.
+
+При SENSOR_DATA_COMPRESSION=gzip CSV при записи сжимаются
+(`trip.csv` → `trip.csv.gz`) и прозрачно распаковываются при чтении
+через `open()`; поток gzip поддерживает `seek`, поэтому двухпроходное
+потоковое извлечение признаков работает без изменений. Бинарная
+телеметрия хранится как есть: npz и parquet уже сжаты, а npy/bin
+читаются через mmap.
+"""
+
+import gzip
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from data_processing.telemetry_io import (
+    FORMAT_CSV, GZIP_SUFFIX, detect_format, is_compressed
+)
+
+
+COMPRESSION_GZIP = 'gzip'
+
+# сжатие идёт во временный файл; в памяти — не больше этого объёма
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+class SensorDataStorage(FileSystemStorage):
+    """Файловое хранилище со сжатием CSV."""
+
+    def __init__(self, compression=None, compression_level=None, **kwargs):
+        super().__init__(**kwargs)
+        self.compression = (
+            settings.SENSOR_DATA_COMPRESSION
+            if compression is None else compression
+        )
+        self.compression_level = (
+            settings.SENSOR_DATA_COMPRESSION_LEVEL
+            if compression_level is None else compression_level
+        )
+
+    def should_compress(self, name):
+        return (
+            self.compression == COMPRESSION_GZIP
+            and not is_compressed(name)
+            and detect_format(name) in (None, FORMAT_CSV)
+        )
+
+    def _compressed(self, content):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        # mtime=0 — одинаковые данные дают одинаковый файл
+        with gzip.GzipFile(
+            fileobj=spool, mode='wb', mtime=0,
+            compresslevel=self.compression_level,
+        ) as archive:
+            for chunk in content.chunks():
+                archive.write(chunk)
+        spool.seek(0)
+        return File(spool)
+
+    def save(self, name, content, max_length=None):
+        if self.should_compress(name):
+            if not hasattr(content, 'chunks'):
+                content = File(content, name)
+            name = f'{name}{GZIP_SUFFIX}'
+            content = self._compressed(content)
+        return super().save(name, content, max_length=max_length)
+
+    def _open(self, name, mode='rb'):
+        if is_compressed(name) and 'w' not in mode:
+            return File(gzip.open(self.path(name), 'rb'), name)
+        return super()._open(name, mode)
+
+
+def get_sensor_data_storage():
+    return SensorDataStorage()
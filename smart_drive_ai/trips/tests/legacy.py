@@ -0,0 +1,201 @@
+"""
+Исходные (до оптимизации) реализации — эталон для тестов сверки.
+
+Код перенесён без изменений логики, только переносы строк.
+"""
+
+import datetime
+import math
+from datetime import timedelta
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from data_processing.dsi_algorithm import (
+    DSIParams, DSIResult, Trip, TripClass, _categorize, _exp_weight,
+)
+from data_processing.extract_features_single_trip import (
+    ACC_MAG_THRESHOLD, GYRO_THRESHOLD, HIGHWAY_LIMIT, JERK_RATIO_THRESHOLD,
+    JERK_RESET_STEPS, JERK_THRESHOLD, MIN_SPEED_FOR_RATIO, URBAN_LIMIT,
+    URBAN_THRESHOLD,
+)
+
+
+# === Признаки поездки (pandas) ===
+
+def trim_instability(
+    df: pd.DataFrame, std_window=10, std_thresh=0.15, padding=3
+) -> pd.DataFrame:
+    df = df.copy()
+    df['acc_mag'] = np.sqrt(df['acc_x']**2 + df['acc_y']**2 + df['acc_z']**2)
+    df['acc_std'] = (
+        df['acc_mag'].rolling(std_window, center=True).std().fillna(0)
+    )
+    stable_mask = df['acc_std'] < std_thresh
+    stable_idx = np.where(stable_mask)[0]
+    if len(stable_idx) == 0:
+        return df.drop(columns='acc_std')
+    start_idx = stable_idx[0] + padding
+    end_idx = stable_idx[-1] - padding
+    return (
+        df.iloc[start_idx:end_idx].reset_index(drop=True)
+        .drop(columns='acc_std')
+    )
+
+
+def extract_trip_features(
+    df: pd.DataFrame, filename: str = "trip.csv"
+) -> tuple[dict, dict]:
+    if df.empty or 'speed_kmh' not in df.columns:
+        raise ValueError("Некорректный файл: отсутствует колонка 'speed_kmh'")
+
+    df = df[df['speed_kmh'] >= 0].copy()
+    df = trim_instability(df)
+
+    if 'timestamp' in df.columns:
+        try:
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            df['delta_sec'] = (
+                df['timestamp'].diff().dt.total_seconds().fillna(1.0)
+            )
+        except Exception:
+            df['delta_sec'] = 1.0
+    else:
+        df['delta_sec'] = 1.0
+
+    df['speed_ms'] = df['speed_kmh'] / 3.6
+    df['acc_mag'] = np.sqrt(df['acc_x']**2 + df['acc_y']**2 + df['acc_z']**2)
+    df['gyro_mag'] = np.sqrt(
+        df['gyro_x']**2 + df['gyro_y']**2 + df['gyro_z']**2
+    )
+    df['jerk'] = df['speed_ms'].diff().fillna(0) / df['delta_sec']
+    df['jerk_ratio'] = df['jerk'].abs() / (df['speed_ms'] + 0.1)
+    df['gyro_mag_smooth'] = (
+        df['gyro_mag'].rolling(window=5, center=True).mean()
+    )
+
+    if df['speed_ms'].iloc[0] > MIN_SPEED_FOR_RATIO:
+        df.loc[0:JERK_RESET_STEPS - 1, ['jerk', 'jerk_ratio']] = 0
+
+    df['mean_speed_60s'] = (
+        df['speed_kmh'].rolling(window=60, center=True).mean()
+    )
+    df['context'] = np.where(
+        df['mean_speed_60s'] > URBAN_THRESHOLD, 'highway', 'urban'
+    )
+    df['speed_threshold'] = np.where(
+        df['context'] == 'highway', HIGHWAY_LIMIT, URBAN_LIMIT
+    )
+
+    df['event_gyro'] = df['gyro_mag_smooth'] > GYRO_THRESHOLD
+    df['event_acc'] = df['acc_mag'] > ACC_MAG_THRESHOLD
+    df['event_jerk'] = df['jerk'].abs() > JERK_THRESHOLD
+    df['event_jerk_accel'] = df['jerk'] > JERK_THRESHOLD
+    df['event_jerk_brake'] = df['jerk'] < -JERK_THRESHOLD
+    df['event_jerk_relative'] = (
+        (df['jerk_ratio'] > JERK_RATIO_THRESHOLD)
+        & (df['speed_ms'] > MIN_SPEED_FOR_RATIO)
+    )
+    df['event_speed'] = df['speed_kmh'] > df['speed_threshold']
+    df['event_any'] = df[[
+        'event_gyro', 'event_acc', 'event_jerk', 'event_jerk_relative',
+        'event_speed',
+    ]].any(axis=1)
+
+    if 'timestamp' in df.columns:
+        try:
+            trip_duration_sec = (
+                df['timestamp'].iloc[-1] - df['timestamp'].iloc[0]
+            ).total_seconds()
+        except Exception:
+            trip_duration_sec = df['delta_sec'].sum()
+    else:
+        trip_duration_sec = df['delta_sec'].sum()
+
+    user_stats = {
+        'avg_speed': df['speed_kmh'].mean(),
+        'distance': (df['speed_kmh'] * df['delta_sec']).sum() / 3600,
+        'hard_brakes': int(df['event_jerk_brake'].sum()),
+        'hard_accels': int(df['event_jerk_accel'].sum()),
+        'sharp_turns': int(df['event_gyro'].sum()),
+        'avg_gyro_mag': df['gyro_mag'].mean(),
+        'trip_duration': trip_duration_sec
+    }
+
+    stats = {
+        'file': filename,
+        'pct_event_jerk': df['event_jerk'].mean(),
+        'pct_event_jerk_accel': df['event_jerk_accel'].mean(),
+        'pct_event_jerk_brake': df['event_jerk_brake'].mean(),
+        'pct_event_jerk_relative': df['event_jerk_relative'].mean(),
+        'pct_event_acc': df['event_acc'].mean(),
+        'pct_event_gyro': df['event_gyro'].mean(),
+        'pct_event_speed': df['event_speed'].mean(),
+        'pct_event_any': df['event_any'].mean(),
+        'mean_speed_kmh': df['speed_kmh'].mean(),
+        'max_speed_kmh': df['speed_kmh'].max(),
+        'trip_duration_sec': trip_duration_sec
+    }
+
+    return stats, user_stats
+
+
+# === DSI (пересчёт по всем поездкам) ===
+
+def compute_driver_style(
+    trips: Sequence[Trip],
+    *,
+    previous_class: Optional[TripClass] = None,
+    params: DSIParams = DSIParams(),
+    now: Optional[datetime.datetime] = None,
+) -> Optional[DSIResult]:
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    cutoff = now - timedelta(days=params.t_cut)
+    lam = math.log(2) / params.t_half
+
+    recent: List[tuple[float, int, datetime.datetime]] = []
+
+    for trip in trips:
+        if trip.timestamp < cutoff:
+            continue
+        age = now - trip.timestamp
+        age_days = age.days + age.seconds / 86_400
+        recent.append(
+            (_exp_weight(age_days, lam), int(trip.category), trip.timestamp)
+        )
+
+    if not recent:
+        return None
+
+    sum_w = sum(w for w, _, _ in recent)
+    dsi = sum(w * c for w, c, _ in recent) / sum_w
+
+    var = sum(w * (c - dsi) ** 2 for w, c, _ in recent) / sum_w
+    sigma_c = math.sqrt(var)
+
+    M = len(recent)
+    D = min(1.0, M / params.n_ref)
+    preliminary = D < 1.0
+
+    category_by_dsi = _categorize(dsi, params)
+    final_class = category_by_dsi
+
+    if D == 1.0 and sigma_c > params.sigma_max:
+        if previous_class is None:
+            D = 0.5
+            preliminary = True
+        else:
+            D = 0.8
+            preliminary = True
+            final_class = previous_class
+
+    return DSIResult(
+        dsi=round(dsi, 3),
+        sigma=round(sigma_c, 3),
+        trust=round(D, 2),
+        profile_class=final_class,
+        trips_used=M,
+        preliminary=preliminary,
+    )
@@ -0,0 +1,152 @@
+"""Сверка DSIState и пакетного расчёта с исходным пересчётом по поездкам."""
+
+import datetime
+import json
+
+import numpy as np
+import pytest
+
+from data_processing.dsi_algorithm import DSIParams, DSIState, Trip, TripClass
+from data_processing.dsi_batch import compute_driver_styles
+
+from . import legacy
+
+
+NOW = datetime.datetime(2025, 6, 1, 12, 0, tzinfo=datetime.timezone.utc)
+DAY = 86_400
+
+
+def make_trips(seed, n, params=DSIParams(), span_days=None, bias=None,
+               nows=(NOW,)):
+    """Поездки за `span_days` до NOW.
+
+    DSIState отсекает по T_cut корзинами по суткам, поэтому поездки
+    не ближе двух суток к границе T_cut для каждого момента из `nows`.
+    """
+    rng = np.random.default_rng(seed)
+    span = (span_days or params.t_cut + 60) * DAY
+    ages = rng.uniform(0, span, n)
+    for now in nows:
+        edge = params.t_cut * DAY - (now - NOW).total_seconds()
+        ages = ages[np.abs(ages - edge) > 2 * DAY]
+    p = bias or (0.5, 0.3, 0.2)
+    categories = rng.choice(3, len(ages), p=p)
+    return [
+        Trip(NOW - datetime.timedelta(seconds=float(age)), TripClass(int(c)))
+        for age, c in zip(ages, categories)
+    ]
+
+
+def assert_same_result(actual, expected):
+    if expected is None:
+        assert actual is None
+        return
+    assert actual is not None
+    # суммы копятся в другом порядке: округление может разойтись на 0.001
+    assert actual.dsi == pytest.approx(expected.dsi, abs=1e-3)
+    assert actual.sigma == pytest.approx(expected.sigma, abs=1e-3)
+    assert actual.trust == expected.trust
+    assert actual.profile_class == expected.profile_class
+    assert actual.trips_used == expected.trips_used
+    assert actual.preliminary == expected.preliminary
+
+
+CASES = [
+    (seed, n, bias)
+    for seed in range(5)
+    for n in (0, 1, 3, 5, 40, 400)
+    for bias in (None, (1.0, 0.0, 0.0), (0.5, 0.0, 0.5))
+]
+
+
+@pytest.mark.parametrize('seed,n,bias', CASES)
+@pytest.mark.parametrize('previous', [None, TripClass.MODERATE])
+def test_state_matches_legacy(seed, n, bias, previous):
+    trips = make_trips(seed, n, bias=bias)
+    state = DSIState.from_trips(trips)
+    assert_same_result(
+        state.result(NOW, previous_class=previous),
+        legacy.compute_driver_style(
+            trips, previous_class=previous, now=NOW
+        ),
+    )
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_state_updates_in_arrival_order(seed):
+    """Поездки приходят по одной; состояние хранится в JSON между ними."""
+    # все поездки в пределах T_cut: граница не пересекается
+    trips = sorted(
+        make_trips(seed, 60, span_days=300), key=lambda trip: trip.timestamp
+    )
+    data = DSIState().to_dict()
+    for i, trip in enumerate(trips):
+        state = DSIState.from_dict(json.loads(json.dumps(data)))
+        state.update(trip)
+        data = state.to_dict()
+        now = trip.timestamp + datetime.timedelta(hours=1)
+        seen = trips[:i + 1]
+        assert_same_result(
+            state.result(now),
+            legacy.compute_driver_style(seen, now=now),
+        )
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_state_expires_old_trips(seed):
+    nows = [
+        NOW + datetime.timedelta(days=days, hours=12)
+        for days in (0, 200, 300, 400, 500)
+    ]
+    trips = make_trips(seed, 50, span_days=300, nows=nows)
+    state = DSIState.from_trips(trips)
+    for now in nows:
+        assert_same_result(
+            state.result(now), legacy.compute_driver_style(trips, now=now)
+        )
+
+
+def test_state_with_custom_params():
+    params = DSIParams(t_half=7, t_cut=90, n_ref=3)
+    trips = make_trips(0, 200, params=params)
+    state = DSIState.from_trips(trips, params)
+    assert_same_result(
+        state.result(NOW),
+        legacy.compute_driver_style(trips, params=params, now=NOW),
+    )
+    with pytest.raises(ValueError):
+        DSIState.from_dict(state.to_dict())
+
+
+# === Пакетный расчёт ===
+
+@pytest.mark.parametrize('labels', [False, True])
+def test_batch_matches_legacy(labels):
+    """Все пользователи за один вызов; у части — сохранённая категория."""
+    trips_by_user = {
+        user: make_trips(seed, n, bias=bias)
+        for user, (seed, n, bias) in enumerate(CASES)
+    }
+    previous = {
+        user: TripClass.AGGRESSIVE for user in trips_by_user if user % 2
+    }
+    user_ids, timestamps, categories = [], [], []
+    for user, trips in trips_by_user.items():
+        for trip in trips:
+            user_ids.append(user)
+            timestamps.append(trip.timestamp)
+            categories.append(
+                trip.category.name.lower() if labels else int(trip.category)
+            )
+
+    results = compute_driver_styles(
+        user_ids, timestamps, categories,
+        previous_classes=previous, now=NOW,
+    )
+    for user, trips in trips_by_user.items():
+        assert_same_result(
+            results.get(user),
+            legacy.compute_driver_style(
+                trips, previous_class=previous.get(user), now=NOW
+            ),
+        )
@@ -0,0 +1,198 @@
+"""Сверка извлечения признаков с исходной pandas-реализацией
+и потоковых вариантов — с извлечением в памяти."""
+
+import io
+import math
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing.extract_features_single_trip import (
+    extract_trip_features
+)
+from data_processing.streaming_features import (
+    LiveTripFeatures, extract_trip_features_streaming
+)
+from data_processing.synthetic import generate_trip
+from data_processing.track import TRACK_DTYPE, decode_track
+
+from . import legacy
+
+
+# 'garbage' в метках времени разбирается поэлементно
+pytestmark = pytest.mark.filterwarnings('ignore:Could not infer format')
+
+SIZES = (1, 5, 12, 70, 3000)
+
+# служебные поля, которых не было в исходной реализации
+EXTRA_KEYS = ('samples', 'track')
+
+
+def make_trip(n, seed, kind):
+    """Поездка из `n` строк; `kind` — вид особенностей данных."""
+    rng = np.random.default_rng(seed)
+    freq = ('10ms', '100ms', '1s')[seed % 3]
+    ts = pd.date_range('2025-05-20 10:00', periods=n, freq=freq)
+    df = pd.DataFrame({
+        'timestamp': ts.astype(str),
+        'speed_kmh': np.clip(60 + np.cumsum(rng.normal(0, 1.5, n)), -5, None),
+        'acc_x': rng.normal(0, 0.5, n),
+        'acc_y': rng.normal(0, 0.5, n),
+        'acc_z': rng.normal(0, 0.3, n),
+        'gyro_x': rng.normal(0, 12, n),
+        'gyro_y': rng.normal(0, 12, n),
+        'gyro_z': rng.normal(0, 12, n),
+    })
+    if kind == 'no_timestamp':
+        df = df.drop(columns='timestamp')
+    elif kind == 'nan_sensors':
+        df.loc[rng.integers(0, n, 5), 'gyro_x'] = np.nan
+        df.loc[rng.integers(0, n, 5), 'acc_y'] = np.nan
+    elif kind == 'missing_timestamps':
+        df['timestamp'] = df['timestamp'].where(rng.random(n) > 0.05, None)
+    elif kind == 'bad_timestamps':
+        df['timestamp'] = 'garbage'
+    elif kind == 'int_speed':
+        df['speed_kmh'] = np.round(df['speed_kmh']).astype(int)
+    elif kind == 'duplicate_timestamps' and n > 20:
+        df.loc[5:15, 'timestamp'] = df.loc[5, 'timestamp']
+    elif kind == 'numeric_timestamps':
+        df['timestamp'] = np.arange(n) * 1e8
+    return df
+
+
+KINDS = (
+    'plain', 'no_timestamp', 'nan_sensors', 'missing_timestamps',
+    'bad_timestamps', 'int_speed', 'duplicate_timestamps',
+    'numeric_timestamps',
+)
+
+CASES = [
+    (n, seed, kind)
+    for kind in KINDS for seed in range(3) for n in SIZES
+]
+
+
+def assert_same(actual, expected, rtol=0.0):
+    actual = {k: v for k, v in actual.items() if k not in EXTRA_KEYS}
+    expected = {k: v for k, v in expected.items() if k not in EXTRA_KEYS}
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, str):
+            assert actual[key] == value, key
+        elif isinstance(value, float) and math.isnan(value):
+            assert math.isnan(actual[key]), key
+        elif rtol:
+            assert actual[key] == pytest.approx(value, rel=rtol), key
+        else:
+            assert actual[key] == value, key
+
+
+def legacy_features(df):
+    """Эталон; None — исходная реализация падала на пустом остатке."""
+    try:
+        return legacy.extract_trip_features(df.copy())
+    except IndexError:
+        return None
+
+
+@pytest.mark.parametrize('n,seed,kind', CASES)
+def test_matches_legacy(n, seed, kind):
+    df = make_trip(n, seed, kind)
+    expected = legacy_features(df)
+    if expected is None:
+        with pytest.raises(ValueError):
+            extract_trip_features(df.copy())
+        return
+    for actual, reference in zip(extract_trip_features(df.copy()), expected):
+        assert_same(actual, reference)
+
+
+@pytest.mark.parametrize('seed,duration', [(0, 30), (1, 600), (2, 1800)])
+def test_synthetic_trip_matches_legacy(seed, duration):
+    df = generate_trip(duration, seed=seed)
+    expected = legacy.extract_trip_features(df.copy())
+    for actual, reference in zip(extract_trip_features(df.copy()), expected):
+        assert_same(actual, reference)
+
+
+def test_synthetic_trip_has_no_gravity():
+    """Пороги событий рассчитаны на ускорение без силы тяжести."""
+    stats, _ = extract_trip_features(generate_trip(600, seed=1))
+    assert stats['pct_event_acc'] < 0.05
+
+
+# === Потоковое извлечение ===
+
+def to_csv(df):
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize('chunksize', [7, 1000])
+@pytest.mark.parametrize('n,seed,kind', CASES)
+def test_streaming_matches_legacy(n, seed, kind, chunksize):
+    source = to_csv(make_trip(n, seed, kind))
+    expected = legacy_features(pd.read_csv(source))
+    if expected is None:
+        with pytest.raises(ValueError):
+            extract_trip_features_streaming(source, chunksize=chunksize)
+        return
+    actual = extract_trip_features_streaming(source, chunksize=chunksize)
+    for stats, reference in zip(actual, expected):
+        assert_same(stats, reference, rtol=1e-9)
+
+
+def push_live(df, part):
+    """Части по `part` строк; состояние живёт в pickle между частями."""
+    live = LiveTripFeatures('timestamp' in df.columns)
+    track = b''
+    for start in range(0, len(df), part):
+        live.push(df.iloc[start:start + part])
+        track += live.flush_track()
+        live = pickle.loads(pickle.dumps(live))
+    return live.finalize(track=track)
+
+
+LIVE_KINDS = tuple(kind for kind in KINDS if kind != 'bad_timestamps')
+
+
+def assert_same_track(actual, expected):
+    """Ряды для графиков; средние в float32 зависят от порядка сумм."""
+    assert actual.keys() == expected.keys()
+    for resolution, data in expected.items():
+        a, b = decode_track(actual[resolution]), decode_track(data)
+        for name in TRACK_DTYPE.names:
+            np.testing.assert_allclose(
+                a[name], b[name], rtol=1e-6, atol=1e-9
+            )
+
+
+@pytest.mark.parametrize('n,seed,kind,part', [
+    case + (part,)
+    for case in CASES if case[2] in LIVE_KINDS
+    for part in (1, 13, 500) if part > 1 or case[0] < 1000
+])
+def test_live_matches_in_memory(n, seed, kind, part):
+    df = make_trip(n, seed, kind)
+    try:
+        expected = extract_trip_features(df.copy())
+    except ValueError:
+        with pytest.raises(ValueError):
+            push_live(df, part)
+        return
+    actual = push_live(df, part)
+    for stats, reference in zip(actual, expected):
+        if 'track' in reference:
+            assert_same_track(stats['track'], reference['track'])
+        assert_same(stats, reference, rtol=1e-9)
+
+
+def test_live_rejects_bad_timestamps():
+    live = LiveTripFeatures(with_timestamps=True)
+    with pytest.raises(ValueError):
+        live.push(make_trip(70, 0, 'bad_timestamps'))
@@ -0,0 +1,86 @@
+"""Сверка ForestPredictor с исходным sklearn Pipeline."""
+
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing.classify_trip import FEATURE_COLS, feature_vector
+from data_processing.extract_features_single_trip import (
+    extract_trip_features
+)
+from data_processing.forest_predictor import ForestPredictor, export_forest
+from data_processing.synthetic import generate_trip
+
+
+MODEL_PATH = (
+    Path(__file__).resolve().parents[2] / 'data_processing' / 'rf_v1.joblib'
+)
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    return joblib.load(MODEL_PATH)
+
+
+@pytest.fixture(scope='module')
+def compiled(pipeline, tmp_path_factory):
+    path = tmp_path_factory.mktemp('forest') / 'rf.npz'
+    return ForestPredictor.load(export_forest(pipeline, path, FEATURE_COLS))
+
+
+def _recorded_vectors():
+    """Векторы признаков поездок, как их сохраняет обработка."""
+    vectors = []
+    for seed, duration in enumerate((30, 120, 600, 1800)):
+        df = generate_trip(duration, seed=seed)
+        vectors.append(feature_vector(extract_trip_features(df)[0]))
+    # пустые метки времени в конце записи: trip_duration_sec = NaN
+    df = generate_trip(300, seed=7)
+    df.loc[len(df) - 100:, 'timestamp'] = None
+    vectors.append(feature_vector(extract_trip_features(df)[0]))
+    return np.array(vectors)
+
+
+def _synthetic_vectors(pipeline, n=2000):
+    scaler = pipeline[0]
+    rng = np.random.default_rng(0)
+    X = scaler.mean_ + scaler.scale_ * 2 * rng.standard_normal(
+        (n, len(FEATURE_COLS))
+    )
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X
+
+
+def _proba(model, X):
+    with warnings.catch_warnings():
+        # модель обучена без имён признаков
+        warnings.simplefilter('ignore', UserWarning)
+        return model.predict_proba(pd.DataFrame(X, columns=FEATURE_COLS))
+
+
+def test_recorded_vectors_match_sklearn(pipeline, compiled):
+    X = _recorded_vectors()
+    assert np.isnan(X[-1, FEATURE_COLS.index('trip_duration_sec')])
+    np.testing.assert_allclose(
+        _proba(compiled, X), _proba(pipeline, X), rtol=0, atol=1e-12
+    )
+
+
+def test_synthetic_vectors_match_sklearn(pipeline, compiled):
+    X = _synthetic_vectors(pipeline)
+    assert np.isnan(X).any(axis=1).sum() > len(X) // 4
+    np.testing.assert_allclose(
+        _proba(compiled, X), _proba(pipeline, X), rtol=0, atol=1e-12
+    )
+
+
+def test_infinity_rejected_like_sklearn(pipeline, compiled):
+    X = _synthetic_vectors(pipeline, n=3)
+    X[1, 0] = np.inf
+    for model in (pipeline, compiled):
+        with pytest.raises(ValueError):
+            _proba(model, X)
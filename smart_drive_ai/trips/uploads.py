@@ -0,0 +1,224 @@
+"""
+Повторные загрузки поездок.
+
+При нестабильной сети приложение повторяет загрузку, и без проверки
+каждая попытка создавала бы новую поездку и повторно учитывалась бы
+в профиле. Поэтому у поездки хранятся:
+
+- SHA-256 файла датчиков — считается обработчиками загрузки по мере
+  приёма частей запроса, без повторного чтения файла;
+- ключ из заголовка Idempotency-Key, если приложение его передаёт.
+
+Оба уникальны в пределах пользователя. Если загрузка совпала с уже
+сохранённой поездкой по любому из них, возвращается эта поездка
+(с её статусом и анализом), признаки заново не считаются. Исключение —
+поездка со статусом `failed` или с прерванной обработкой (процесс
+погиб, не сохранив результат): повтор загрузки запускает её обработку
+снова (см. `retry_processing`).
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler, TemporaryFileUploadHandler
+)
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate_user
+from .models import STATUS_FAILED, STATUS_PENDING, Trip, TripAnalysis
+from .services import process_trip
+
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+
+
+class HashingMemoryFileUploadHandler(MemoryFileUploadHandler):
+    """Файл в памяти и его SHA-256 (атрибут `sha256`)."""
+
+    def new_file(self, *args, **kwargs):
+        self.digest = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.activated:
+            self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.digest.hexdigest()
+        return file
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Файл во временном файле на диске и его SHA-256."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.digest.hexdigest()
+        return file
+
+
+def file_sha256(file):
+    """SHA-256 загруженного файла; без обработчиков выше — по частям."""
+    digest = getattr(file, 'sha256', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        file.seek(0)
+        digest = file.sha256 = hasher.hexdigest()
+    return digest
+
+
+def idempotency_key(request):
+    """Ключ из заголовка Idempotency-Key или None."""
+    key = request.headers.get(IDEMPOTENCY_KEY_HEADER) or None
+    max_length = Trip._meta.get_field('idempotency_key').max_length
+    if key is not None and len(key) > max_length:
+        raise ValidationError({
+            IDEMPOTENCY_KEY_HEADER: f'Не более {max_length} символов.'
+        })
+    return key
+
+
+def find_duplicate(user_id, sensor_data_hash, idempotency_key=None):
+    """Сохранённая поездка с тем же ключом или файлом, иначе None.
+
+    Совпадение по ключу важнее: с ним приложение повторяет именно
+    этот запрос.
+    """
+    match = Q(sensor_data_hash=sensor_data_hash)
+    if idempotency_key:
+        match |= Q(idempotency_key=idempotency_key)
+    trips = Trip.objects.filter(match, user_id=user_id)[:2]
+    return min(
+        trips, default=None,
+        key=lambda trip: trip.idempotency_key != idempotency_key,
+    )
+
+
+def create_trip(validated_data, idempotency_key=None):
+    """Новая поездка или совпавшая с ней сохранённая.
+
+    Возвращает (поездка, создана ли). При одновременных повторах
+    вставку выполнит один запрос, остальные получат его поездку.
+    """
+    user = validated_data['user']
+    sensor_data_hash = file_sha256(validated_data['sensor_data_file'])
+    duplicate = find_duplicate(user.pk, sensor_data_hash, idempotency_key)
+    if duplicate is not None:
+        return duplicate, False
+
+    trip = Trip(
+        sensor_data_hash=sensor_data_hash, idempotency_key=idempotency_key,
+        **validated_data
+    )
+    try:
+        with transaction.atomic():
+            trip.save()
+    except IntegrityError:
+        # файл уже записан в хранилище при сохранении поля
+        trip.sensor_data_file.delete(save=False)
+        duplicate = find_duplicate(
+            user.pk, sensor_data_hash, idempotency_key
+        )
+        if duplicate is None:
+            raise
+        return duplicate, False
+    return trip, True
+
+
+def retry_processing(trip):
+    """Возврат к обработке поездки со статусом `failed` или прерванной.
+
+    Прерванная — `pending` без задачи в очереди, обработка которой
+    началась больше TRIP_PROCESSING_LEASE секунд назад. Возвращает
+    True, если обработку нужно запустить снова. Из одновременных
+    повторов поездку забирает один; остальные получают её как
+    ожидающую обработки.
+    """
+    if trip.status not in (STATUS_FAILED, STATUS_PENDING):
+        return False
+    now = timezone.now()
+    stalled = Q(status=STATUS_FAILED) | Q(
+        status=STATUS_PENDING, processing_job__isnull=True,
+        processing_started_at__lt=now - timedelta(
+            seconds=settings.TRIP_PROCESSING_LEASE
+        ),
+    )
+    claimed = Trip.objects.filter(stalled, pk=trip.pk).update(
+        status=STATUS_PENDING, processing_error='',
+        processing_started_at=now,
+    )
+    trip.refresh_from_db(
+        fields=('status', 'processing_error', 'processing_started_at')
+    )
+    if not claimed:
+        return False
+    # остатки прерванной обработки
+    TripAnalysis.objects.filter(trip=trip).delete()
+    trip.tracks.all().delete()
+    invalidate_user(trip.user_id, [trip.pk])
+    return True
+
+
+def process_uploaded_trip(trip):
+    """Обработка новой поездки в запросе.
+
+    При ошибке поездка помечается как `failed`: повтор загрузки вернёт
+    её с текстом ошибки, а не как ожидающую обработки.
+    """
+    try:
+        return process_trip(trip)
+    except Exception as error:
+        trip.status = STATUS_FAILED
+        trip.processing_error = str(error)
+        trip.save(update_fields=('status', 'processing_error'))
+        invalidate_user(trip.user_id, [trip.pk])
+        raise
+
+
+def unique_trips(user, items):
+    """Поездки пакетной загрузки без повторов.
+
+    `items` — проверенные данные TripUploadSerializer. Возвращает
+    (поездки в порядке `items`, новые поездки ещё без записи в БД,
+    совпавшие поездки, возвращённые к обработке `retry_processing`):
+    совпавшие с сохранёнными или с более ранним файлом пакета
+    заменяются найденной поездкой.
+    """
+    hashes = [file_sha256(item['sensor_data_file']) for item in items]
+    by_hash = {
+        trip.sensor_data_hash: trip
+        for trip in Trip.objects.filter(
+            user=user, sensor_data_hash__in=set(hashes)
+        )
+    }
+    retried = [
+        trip for trip in by_hash.values() if retry_processing(trip)
+    ]
+    trips, new = [], []
+    for item, sensor_data_hash in zip(items, hashes):
+        trip = by_hash.get(sensor_data_hash)
+        if trip is None:
+            trip = by_hash[sensor_data_hash] = Trip(
+                user=user, sensor_data_hash=sensor_data_hash, **item
+            )
+            new.append(trip)
+        trips.append(trip)
+    return trips, new, retried
@@ -1,21 +1,48 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from .async_views import (
+    AsyncTripListAPIView, AsyncTripUploadAPIView,
+    AsyncUserDrivingProfileAPIView
+)
 from .views import (
-    RegisterAPIView, TripViewSet, TripUploadAPIView, UserDrivingProfileAPIView
+    InferenceMetricsAPIView, LiveTripViewSet, ProfileAPIView,
+    PrometheusMetricsAPIView, RegisterAPIView, TripBatchUploadAPIView,
+    TripViewSet, TripUploadAPIView, UserDrivingProfileAPIView
 )
 
 
 router = DefaultRouter()
 
+# до trips/: иначе trips/live/ совпадёт с trips/<pk>/
+router.register(r'trips/live', LiveTripViewSet, basename='live-trips')
 router.register(r'trips', TripViewSet, basename='trips')
 
 
-urlpatterns = [
+if settings.ASGI_MODE:
+    async_urlpatterns = [
+        path('trips/', AsyncTripListAPIView.as_view()),
+    ]
+    upload_view = AsyncTripUploadAPIView
+    profile_view = AsyncUserDrivingProfileAPIView
+else:
+    async_urlpatterns = []
+    upload_view = TripUploadAPIView
+    profile_view = UserDrivingProfileAPIView
+
+
+urlpatterns = async_urlpatterns + [
     path('', include(router.urls)),
     path('auth/register/', RegisterAPIView.as_view()),
     path('auth/login/', TokenObtainPairView.as_view()),
-    path('upload/', TripUploadAPIView.as_view()),
-    path('profile/', UserDrivingProfileAPIView.as_view())
+    path('upload/', upload_view.as_view()),
+    path('upload/batch/', TripBatchUploadAPIView.as_view()),
+    path('profile/', profile_view.as_view()),
+    path('metrics/', PrometheusMetricsAPIView.as_view()),
+    path('metrics/inference/', InferenceMetricsAPIView.as_view()),
+    path(
+        'metrics/profiles/<slug:profile_id>/', ProfileAPIView.as_view()
+    ),
 ]
@@ -1,11 +1,33 @@
-from rest_framework import permissions, viewsets
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import CreateAPIView, RetrieveAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Trip, UserDrivingProfile
+from data_processing.inference import batcher_metrics
+from data_processing.track import decode_track, track_columns
+
+from .cache import cached_response, get_or_build, profile_key, trip_key
+from .live import LiveTripError, finish_session, push_samples
+from .metrics import render_metrics, stage
+from .models import (
+    STATUS_PENDING, LiveTripSession, Trip, UserDrivingProfile
+)
+from .pagination import TripCursorPagination
+from .permissions import HasMetricsToken
+from .profiling import profile_path
 from .serializers import (
-    RegisterSerializer, TripListSerializer, TripRetrieveSerializer,
-    TripUploadSerializer, UserDrivingProfileSerializer
+    LiveTripFinishSerializer, LiveTripSamplesSerializer,
+    LiveTripSessionSerializer, RegisterSerializer, TripBatchUploadSerializer,
+    TripFilterSerializer, TripListSerializer, TripRetrieveSerializer,
+    TripStatusSerializer, TripTimeseriesSerializer, TripUploadSerializer,
+    UserDrivingProfileSerializer
 )
+from .uploads import idempotency_key
 
 
 class RegisterAPIView(CreateAPIView):
@@ -15,29 +37,196 @@ class RegisterAPIView(CreateAPIView):
     permission_classes = (permissions.AllowAny,)
 
 
+def upload_status(trip_status, created):
+    """Код ответа загрузки поездки."""
+    if trip_status == STATUS_PENDING:
+        # Поездка поставлена в очередь: результат — через /status/
+        return status.HTTP_202_ACCEPTED
+    if not created:
+        # Повтор загрузки: поездка уже сохранена и обработана
+        return status.HTTP_200_OK
+    return status.HTTP_201_CREATED
+
+
 class TripUploadAPIView(CreateAPIView):
     """Загрузка телеметрических данных поездки."""
 
     serializer_class = TripUploadSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
+    def perform_create(self, serializer):
+        serializer.save(
+            user=self.request.user,
+            idempotency_key=idempotency_key(self.request),
+        )
+        self.created = serializer.created
+
+    def create(self, request, *args, **kwargs):
+        with stage('upload'):
+            response = super().create(request, *args, **kwargs)
+        response.status_code = upload_status(
+            response.data.get('status'), self.created
+        )
+        return response
+
+
+class TripBatchUploadAPIView(CreateAPIView):
+    """Пакетная загрузка поездок (например, накопленных офлайн)."""
+
+    serializer_class = TripBatchUploadSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def create(self, request, *args, **kwargs):
+        with stage('upload_batch'):
+            response = super().create(request, *args, **kwargs)
+        if any(
+            trip['status'] == STATUS_PENDING for trip in response.data['trips']
+        ):
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+
+def trip_list_queryset(request):
+    """Поездки пользователя для списка с фильтрами из query string.
+
+    Категория и расстояние скопированы в поездку: без JOIN, страница
+    берётся из индекса по (user, [category,] start_date_time).
+    """
+    filters = TripFilterSerializer(data=request.query_params)
+    filters.is_valid(raise_exception=True)
+    return filters.filter(
+        Trip.objects.filter(user_id=request.user.id)
+    ).only(
+        'id', 'start_date_time', 'end_date_time', 'status', 'distance',
+        'category',
+    )
+
 
 class TripViewSet(viewsets.ReadOnlyModelViewSet):
-    """Получение списка поездок пользователя или получение анализа поездки."""
+    """Получение списка поездок пользователя или получение анализа поездки.
+
+    Список фильтруется параметрами start_after, start_before, category
+    и min_distance (см. TripFilterSerializer).
+    """
 
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = TripCursorPagination
 
     def get_queryset(self):
-        return Trip.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            return trip_list_queryset(self.request)
+        trips = Trip.objects.filter(user_id=self.request.user.id)
+        if self.action == 'retrieve':
+            return trips.select_related('tripanalysis__drivingstyle')
+        return trips
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return TripRetrieveSerializer
+        if self.action == 'processing_status':
+            return TripStatusSerializer
         return TripListSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        # ключ кэша по числу: /trips/07/ и /trips/7/ — одна запись
+        try:
+            trip_id = int(kwargs['pk'])
+        except ValueError:
+            raise Http404
+        entry = get_or_build(
+            trip_key(request.user.id, trip_id),
+            lambda: self.get_serializer(self.get_object()).data,
+        )
+        return cached_response(request, entry)
+
+    @action(detail=True, url_path='status')
+    def processing_status(self, request, pk=None):
+        """Статус обработки поездки (для опроса после загрузки)."""
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)
+
+    @action(detail=True)
+    def timeseries(self, request, pk=None):
+        """Ряд показателей поездки для графиков по колонкам.
+
+        `resolution` — секунд в корзине (1, 10 или 60). Для поездок,
+        обработанных до появления рядов, нужен manage.py reprocess_trips.
+        """
+        params = TripTimeseriesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        resolution = params.validated_data['resolution']
+        data = self.get_object().tracks.filter(
+            resolution=resolution
+        ).values_list('data', flat=True).first()
+        if data is None:
+            raise Http404
+        return Response(track_columns(decode_track(bytes(data)), resolution))
+
+
+class LiveTripViewSet(
+    mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
+    """Передача поездки частями во время езды.
+
+    POST trips/live/ — начало, POST trips/live/<id>/samples/ — очередная
+    часть отсчётов (в ответе — промежуточные показатели),
+    POST trips/live/<id>/finish/ — завершение и анализ поездки.
+    """
+
+    serializer_class = LiveTripSessionSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return LiveTripSession.objects.filter(user_id=self.request.user.id)
+
+    def perform_create(self, serializer):
+        serializer.save(user_id=self.request.user.id)
+
+    def _locked_session(self, pk):
+        return get_object_or_404(
+            self.get_queryset().select_for_update(), pk=pk
+        )
+
+    @action(detail=True, methods=['post'])
+    def samples(self, request, pk=None):
+        serializer = LiveTripSamplesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with stage('live_samples'), transaction.atomic():
+            session = self._locked_session(pk)
+            try:
+                push_samples(
+                    session, serializer.validated_data['seq'],
+                    serializer.validated_data['samples'],
+                )
+            except LiveTripError as error:
+                return Response(
+                    {'detail': str(error), 'next_seq': session.next_seq},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            except ValueError as error:
+                raise ValidationError({'samples': [str(error)]})
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=['post'])
+    def finish(self, request, pk=None):
+        serializer = LiveTripFinishSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with stage('live_finish'), transaction.atomic():
+            session = self._locked_session(pk)
+            try:
+                trip = finish_session(
+                    session, serializer.validated_data['end_date_time']
+                )
+            except LiveTripError as error:
+                return Response(
+                    {'detail': str(error)}, status=status.HTTP_409_CONFLICT
+                )
+        return Response(TripStatusSerializer(trip).data)
+
 
 class UserDrivingProfileAPIView(RetrieveAPIView):
     """Получение агрегированных показателей."""
@@ -46,4 +235,51 @@ class UserDrivingProfileAPIView(RetrieveAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
-        return UserDrivingProfile.objects.get(user=self.request.user)
+        return get_object_or_404(
+            UserDrivingProfile, user_id=self.request.user.id
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        entry = get_or_build(
+            profile_key(request.user.id),
+            lambda: self.get_serializer(self.get_object()).data,
+        )
+        return cached_response(request, entry)
+
+
+class InferenceMetricsAPIView(APIView):
+    """Метрики микробатчинга классификации в текущем процессе."""
+
+    authentication_classes = ()
+    permission_classes = (HasMetricsToken,)
+
+    def get(self, request):
+        return Response({'inference': batcher_metrics()})
+
+
+class PrometheusMetricsAPIView(APIView):
+    """Метрики конвейера обработки поездок в формате Prometheus."""
+
+    authentication_classes = ()
+    permission_classes = (HasMetricsToken,)
+
+    def get(self, request):
+        return HttpResponse(
+            render_metrics(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
+class ProfileAPIView(APIView):
+    """Свёрнутые стеки профиля запроса (см. заголовок X-Profile)."""
+
+    authentication_classes = ()
+    permission_classes = (HasMetricsToken,)
+
+    def get(self, request, profile_id):
+        path = profile_path(profile_id)
+        if not path.exists():
+            raise Http404
+        return FileResponse(
+            path.open('rb'), content_type='text/plain; charset=utf-8'
+        )